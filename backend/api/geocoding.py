@@ -1,17 +1,31 @@
+import os
 import requests
 import hashlib
 import base64
 import azure.functions as func
 
-from typing         import TYPE_CHECKING, Optional, List
-from shared.models  import Location, Address, AutocompleteSuggestion, RouteDetails, RouteStep
-from utils.response import success_response, error_response
+from typing           import TYPE_CHECKING, Optional, List, Tuple
+from shared.cache     import LRUCache
+from shared.models    import Location, Address, AutocompleteSuggestion, RouteDetails, RouteStep
+from shared.ratelimit import RateLimiter
+from shared.telemetry import timed
+from utils.response   import success_response, error_response, compressible
 
 if TYPE_CHECKING:
     from azure.functions import FunctionApp
 
+NOMINATIM_RATE_PER_SECOND = float(os.environ.get("NOMINATIM_RATE_PER_SECOND", "1"))
+
+# overridable so tests and benchmarks can point the geo paths at a simulator
+NOMINATIM_URL        = os.environ.get("NOMINATIM_URL", "https://nominatim.openstreetmap.org").rstrip("/")
+HERE_AUTOSUGGEST_URL = os.environ.get("HERE_AUTOSUGGEST_URL", "https://autosuggest.search.hereapi.com/v1/autosuggest")
+GOOGLE_ROUTES_URL    = os.environ.get("GOOGLE_ROUTES_URL", "https://routes.googleapis.com/directions/v2:computeRoutes")
+
+_nominatim_limiter = RateLimiter(NOMINATIM_RATE_PER_SECOND)
+_geocode_cache     = LRUCache(maxsize=8192, ttl_seconds=7 * 24 * 3600)
+
 def coords_to_address(latitude: float, longitude: float) -> Optional[Location]:
-    url = "https://nominatim.openstreetmap.org/reverse"
+    url = f"{NOMINATIM_URL}/reverse"
     
     params = {
         "lat"    : latitude,
@@ -24,7 +38,8 @@ def coords_to_address(latitude: float, longitude: float) -> Optional[Location]:
     }
     
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=10)
+        with timed("upstream"):
+            response = requests.get(url, params=params, headers=headers, timeout=10)
         response.raise_for_status()
         
         data = response.json()
@@ -44,7 +59,7 @@ def coords_to_address(latitude: float, longitude: float) -> Optional[Location]:
 
 
 def address_to_coords(query: str) -> Optional[List[Location]]:
-    url = "https://nominatim.openstreetmap.org/search"
+    url = f"{NOMINATIM_URL}/search"
     
     params = {
         "q"      : query,
@@ -58,7 +73,8 @@ def address_to_coords(query: str) -> Optional[List[Location]]:
     }
     
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=10)
+        with timed("upstream"):
+            response = requests.get(url, params=params, headers=headers, timeout=10)
         response.raise_for_status()
         
         data = response.json()
@@ -82,6 +98,25 @@ def address_to_coords(query: str) -> Optional[List[Location]]:
         return None
 
 
+def geocode_address_cached(address: str) -> Optional[Tuple[float, float]]:
+    key = " ".join((address or "").lower().split())
+    if not key:
+        return None
+
+    cached = _geocode_cache.get(key)
+    if cached is not None:
+        return cached
+
+    _nominatim_limiter.acquire()
+    hits = address_to_coords(address)
+    if not hits:
+        return None
+
+    coords = (hits[0].latitude, hits[0].longitude)
+    _geocode_cache.set(key, coords)
+    return coords
+
+
 def autocomplete_address(query: str, at: str = "40.42024,-3.68755") -> Optional[List[AutocompleteSuggestion]]:
     headers = {
         'Accept': 'application/json',
@@ -108,8 +143,9 @@ def autocomplete_address(query: str, at: str = "40.42024,-3.68755") -> Optional[
     }
 
     try:
-        response = requests.get('https://autosuggest.search.hereapi.com/v1/autosuggest', 
-            params=params, headers=headers, timeout=10)
+        with timed("upstream"):
+            response = requests.get(HERE_AUTOSUGGEST_URL, 
+                params=params, headers=headers, timeout=10)
         response.raise_for_status()
         
         data = response.json()
@@ -204,8 +240,9 @@ def get_route_details(coords_from: tuple[float, float], coords_to: tuple[float,
     }
 
     try:
-        response = requests.post('https://routes.googleapis.com/directions/v2:computeRoutes', 
-            headers=headers, json=json_data, timeout=15)
+        with timed("upstream"):
+            response = requests.post(GOOGLE_ROUTES_URL, 
+                headers=headers, json=json_data, timeout=15)
         response.raise_for_status()
         
         data = response.json()
@@ -263,7 +300,7 @@ def register_routes(app: 'FunctionApp'):
             if not location:
                 return error_response("Could not find address for coordinates", 404)
             
-            return success_response(location.model_dump())
+            return success_response(location)
         
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
@@ -281,7 +318,7 @@ def register_routes(app: 'FunctionApp'):
             if not locations:
                 return error_response("No results found for query", 404)
             
-            return success_response([loc.model_dump() for loc in locations])
+            return success_response(locations)
         
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
@@ -300,12 +337,13 @@ def register_routes(app: 'FunctionApp'):
             if not suggestions:
                 return error_response("No suggestions found", 404)
             
-            return success_response([s.model_dump() for s in suggestions])
+            return success_response(suggestions)
         
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
     
     @app.route(route="geocoding/route", methods=["GET"])
+    @compressible()
     def route_directions(req: func.HttpRequest) -> func.HttpResponse:
         try:
             from_lat = req.params.get("from_lat")
@@ -327,7 +365,7 @@ def register_routes(app: 'FunctionApp'):
             if not route:
                 return error_response("Could not calculate route", 404)
             
-            return success_response(route.model_dump())
+            return success_response(route)
         
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
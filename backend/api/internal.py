@@ -0,0 +1,20 @@
+import azure.functions as func
+
+from typing           import TYPE_CHECKING
+from shared.telemetry import metrics
+
+if TYPE_CHECKING:
+    from azure.functions import FunctionApp
+
+
+def register_routes(app: "FunctionApp"):
+
+    # function-key protected; each worker exposes its own counters, so scrape every instance
+    @app.route(route="internal/metrics", methods=["GET"], auth_level=func.AuthLevel.FUNCTION)
+    def internal_metrics(req: func.HttpRequest) -> func.HttpResponse:
+        return func.HttpResponse(
+            metrics.render(),
+            status_code = 200,
+            mimetype    = "text/plain",
+            headers     = {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
@@ -1,17 +1,44 @@
+import csv
+import hashlib
+import io
 import json
+import logging
+import os
+import time
 import uuid
 
 import azure.functions as func
 
+from collections        import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime           import datetime, timezone
-from typing             import TYPE_CHECKING, Any, Dict, List, Optional
+from typing             import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
+from azure.core        import MatchConditions
+from azure.core.exceptions import ResourceModifiedError, ResourceNotFoundError
 from azure.data.tables  import UpdateMode
-from azure.storage.blob import BlobServiceClient
-from api.geocoding      import address_to_coords
-from shared.database    import get_connection_string, get_table_client
-from shared.geo         import encode_geohash
-from shared.menu        import get_menu_from_blob
-from utils.response     import error_response, success_response
+from azure.storage.blob import ContentSettings
+from api.geocoding      import geocode_address_cached
+from shared.archive     import archive_orders
+from shared.cells       import bump_listing_version, is_current_row, partition_for, rebalance_cells
+from shared.cuisine_index import cuisine_index_entities, rebuild_cuisine_index
+from shared.database    import get_blob_service_client, get_table_client
+from shared.events      import MenuChanged, RestaurantChanged, publish
+from shared.image_cache import content_type_for, invalidate_image
+from shared.images      import record_image_delete, record_image_upload, search_image_catalog, sync_image_catalog
+from shared.menu        import get_menu_from_blob, iter_menu_items
+from shared.order_index import order_index_ready, rebuild_order_index
+from shared.pagination  import TableScan, page_entities, scan_matches
+from shared.query_analyzer import allow_table_scan
+from shared.summaries   import RestaurantSummary, summary_for
+from utils.response     import (
+    JSONFragment,
+    compressible,
+    error_response,
+    ndjson_response,
+    success_fragments_response,
+    success_response,
+    wants_ndjson,
+)
 
 if TYPE_CHECKING:
     from azure.functions import FunctionApp
@@ -23,6 +50,26 @@ TABLE_MEALS = "Meals"
 TABLE_MENU_VERSIONS = "MenuVersions"
 TABLE_BASKETS = "Baskets"
 
+ORDER_ARCHIVE_SCHEDULE  = os.environ.get("ORDER_ARCHIVE_SCHEDULE", "0 30 3 * * *")
+MENU_MIGRATION_SCHEDULE = os.environ.get("MENU_MIGRATION_SCHEDULE", "0 */5 * * * *")
+IMAGE_CATALOG_SCHEDULE  = os.environ.get("IMAGE_CATALOG_SCHEDULE", "0 */15 * * * *")
+CELL_REBALANCE_SCHEDULE = os.environ.get("CELL_REBALANCE_SCHEDULE", "0 45 * * * *")
+ORDER_INDEX_SCHEDULE    = os.environ.get("ORDER_INDEX_SCHEDULE", "0 */10 * * * *")
+
+TABLE_MIGRATIONS         = "MigrationCheckpoints"
+MIGRATION_JOBS_PARTITION = "menu-migration"
+MIGRATION_PAGE_SIZE        = 50
+MIGRATION_TRANSACTION_SIZE = 100
+MIGRATION_CONCURRENCY      = int(os.environ.get("MIGRATION_CONCURRENCY", "8"))
+
+IMPORT_TRANSACTION_SIZE    = 100
+MEAL_BATCH_TRANSACTION_SIZE = 100
+MEAL_BATCH_MAX_OPS          = 1000
+IMPORT_GEOCODE_CONCURRENCY = int(os.environ.get("IMPORT_GEOCODE_CONCURRENCY", "4"))
+IMPORT_CHUNK_ROWS          = 200
+IMPORT_MAX_ROWS            = 5000
+IMPORT_TIME_BUDGET_SECONDS = float(os.environ.get("IMPORT_TIME_BUDGET_SECONDS", "180"))
+
 BLOB_CONTAINER_IMAGES = "images"
 BLOB_STORAGE_ACCOUNT = "ccmbg1bdc8"
 BLOB_BASE_URL = f"https://{BLOB_STORAGE_ACCOUNT}.blob.core.windows.net/{BLOB_CONTAINER_IMAGES}"
@@ -38,88 +85,66 @@ def _slugify(val: str) -> str:
     return out[:80]
 
 
-def _split_csv(val: Optional[str]) -> List[str]:
-    if not val:
-        return []
-    parts = [p.strip() for p in val.split(",")]
-    return [p for p in parts if p]
-
-
 def _get_image_url(image_type: str, filename: str) -> str:
     return f"{BLOB_BASE_URL}/{image_type}/{filename}"
 
 
-def _list_restaurants(limit: int, q: Optional[str]) -> List[Dict[str, Any]]:
-    client = get_table_client(TABLE_RESTAURANTS)
+def _restaurant_filter(q: Optional[str]) -> Tuple[str, Callable[[Any], bool]]:
+    # (cursor scope, row predicate), shared by the paged and the ndjson listing so their cursors interchange
+    # base-cell copies left behind by a split are skipped, so a restaurant is listed once
     q_norm = (q or "").strip().lower()
-    results: List[Dict[str, Any]] = []
+    if not q_norm:
+        return "manage-restaurants:", is_current_row
+    return f"manage-restaurants:{q_norm}", lambda ent: is_current_row(ent) and q_norm in (ent.get("name") or "").strip().lower()
+
+
+def _list_restaurants(limit: int, q: Optional[str], cursor: Optional[str] = None) -> Tuple[List[RestaurantSummary], Optional[str]]:
+    client           = get_table_client(TABLE_RESTAURANTS)
+    scope, predicate = _restaurant_filter(q)
 
     try:
-        for ent in client.list_entities(results_per_page=min(limit, 100)):
-            name = (ent.get("name") or "").strip()
-            if q_norm and q_norm not in name.lower():
-                continue
-            results.append(
-                {
-                    "id"         : ent.get("RowKey"),
-                    "name"       : name,
-                    "unique_name": ent.get("unique_name"),
-                    "city"       : ent.get("city"),
-                    "address"    : ent.get("address_first_line"),
-                    "postal_code": ent.get("postal_code"),
-                    "lat"        : ent.get("lat"),
-                    "lon"        : ent.get("lon"),
-                    "cuisines"   : ent.get("cuisines"),
-                    "tags"       : ent.get("tags"),
-                }
-            )
-            if len(results) >= limit:
-                break
+        with allow_table_scan():
+            entities, next_cursor = page_entities(client, limit, cursor, predicate=predicate, scope=scope)
+    except ValueError:
+        raise
     except Exception:
-        return []
+        return [], None
 
-    results.sort(key=lambda r: (r.get("name") or "").lower())
-    return results
+    return [summary_for(ent) for ent in entities], next_cursor
 
 
-def _upsert_cuisine_index(restaurant_id: str, cuisines_csv: Optional[str], geohash: str, lat: float, lon: float):
-    cuisines = _split_csv(cuisines_csv)
-    if not cuisines:
+def _stream_restaurants(q: Optional[str], cursor: Optional[str]) -> func.HttpResponse:
+    scope, predicate = _restaurant_filter(q)
+    scan             = TableScan(get_table_client(TABLE_RESTAURANTS), cursor, scope=scope)
+    with allow_table_scan():
+        return ndjson_response(
+            (JSONFragment(summary_for(ent).render()) for ent in scan_matches(scan, predicate)),
+            scan.cursor,
+        )
+
+
+def _upsert_cuisine_index(restaurant: Dict[str, Any]):
+    entities = cuisine_index_entities(restaurant)
+    if not entities:
         return
     c_client = get_table_client(TABLE_CUISINE_INDEX)
-    now = _now_iso()
-    for cuisine in cuisines:
-        c_client.upsert_entity(
-            {
-                "PartitionKey": cuisine.lower(),
-                "RowKey"      : restaurant_id,
-                "geohash"     : geohash,
-                "lat"         : lat,
-                "lon"         : lon,
-                "updated_at"  : now,
-            }
-        )
+    for ent in entities:
+        c_client.upsert_entity(ent)
 
 
-def _create_restaurant(payload: Dict[str, Any]) -> Dict[str, Any]:
+def _needs_geocoding(payload: Dict[str, Any]) -> bool:
+    return (payload.get("lat") is None or payload.get("lon") is None) and bool((payload.get("address") or "").strip())
+
+
+def _restaurant_entity(payload: Dict[str, Any], coords: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
     name = (payload.get("name") or "").strip()
     if not name:
         raise ValueError("Missing name")
 
-    city        = (payload.get("city") or "").strip()
-    address     = (payload.get("address") or "").strip()
-    postal_code = (payload.get("postal_code") or "").strip()
-    cuisines    = (payload.get("cuisines") or "").strip()
-    tags        = (payload.get("tags") or "").strip()
-
     lat = payload.get("lat")
     lon = payload.get("lon")
-    if lat is None or lon is None:
-        if address:
-            hits = address_to_coords(address)
-            if hits and len(hits) > 0:
-                lat = hits[0].latitude
-                lon = hits[0].longitude
+    if (lat is None or lon is None) and coords:
+        lat, lon = coords
     try:
         lat = float(lat)
         lon = float(lon)
@@ -127,17 +152,17 @@ def _create_restaurant(payload: Dict[str, Any]) -> Dict[str, Any]:
         raise ValueError("Missing/invalid lat/lon (use map pin or address search)") from e
 
     rest_id  = payload.get("id") or str(uuid.uuid4())
-    geohash  = encode_geohash(lat, lon, precision=6)
+    geohash  = partition_for(lat, lon)
     now      = _now_iso()
 
-    ent = {
+    return {
         "PartitionKey"        : geohash,
         "RowKey"              : rest_id,
         "name"                : name,
         "unique_name"         : _slugify(payload.get("unique_name") or name),
-        "city"                : city,
-        "address_first_line"  : address,
-        "postal_code"         : postal_code,
+        "city"                : (payload.get("city") or "").strip(),
+        "address_first_line"  : (payload.get("address") or "").strip(),
+        "postal_code"         : (payload.get("postal_code") or "").strip(),
         "lat"                 : lat,
         "lon"                 : lon,
         "rating_star"         : payload.get("rating_star"),
@@ -147,31 +172,177 @@ def _create_restaurant(payload: Dict[str, Any]) -> Dict[str, Any]:
         "is_open_now_delivery": bool(payload.get("is_open_now_delivery"))
         if payload.get("is_open_now_delivery") is not None
         else True,
-        "cuisines": cuisines,
-        "tags"    : tags,
+        "cuisines": (payload.get("cuisines") or "").strip(),
+        "tags"    : (payload.get("tags") or "").strip(),
         "updated_at": now,
     }
 
+
+def _restaurant_created(ent: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id"         : ent["RowKey"],
+        "name"       : ent["name"],
+        "unique_name": ent["unique_name"],
+        "city"       : ent["city"],
+        "address"    : ent["address_first_line"],
+        "postal_code": ent["postal_code"],
+        "lat"        : ent["lat"],
+        "lon"        : ent["lon"],
+        "cuisines"   : ent["cuisines"],
+        "tags"       : ent["tags"],
+    }
+
+
+def _create_restaurant(payload: Dict[str, Any]) -> Dict[str, Any]:
+    coords = geocode_address_cached(payload.get("address") or "") if _needs_geocoding(payload) else None
+    ent    = _restaurant_entity(payload, coords)
+
     r_client = get_table_client(TABLE_RESTAURANTS)
     r_client.upsert_entity(ent)
 
-    _upsert_cuisine_index(rest_id, cuisines, geohash, lat, lon)
+    _upsert_cuisine_index(ent)
+    publish(RestaurantChanged(restaurant_id=ent["RowKey"]))
+    bump_listing_version()
+
+    return _restaurant_created(ent)
+
+
+_IMPORT_BOOL_FIELDS  = ("is_delivery", "is_collection", "is_open_now_delivery")
+_IMPORT_FLOAT_FIELDS = ("lat", "lon", "rating_star")
+_IMPORT_TEXT_FIELDS  = ("id", "name", "unique_name", "address", "city", "postal_code", "cuisines", "tags")
+
+
+def _coerce_import_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+    for key, val in list(out.items()):
+        if val == "":
+            out[key] = None
+        elif key in _IMPORT_TEXT_FIELDS and val is not None and not isinstance(val, str):
+            # NDJSON rows can carry e.g. "postal_code": 28013
+            if isinstance(val, (dict, list)):
+                raise ValueError(f"Invalid {key}")
+            out[key] = str(val)
+        elif key in _IMPORT_BOOL_FIELDS and isinstance(val, str):
+            out[key] = val.lower() in ("1", "true", "yes", "y")
+        elif key in _IMPORT_FLOAT_FIELDS and isinstance(val, str):
+            out[key] = float(val)
+        elif key == "rating_count" and isinstance(val, str):
+            out[key] = int(float(val))
+    return out
+
+
+def _iter_import_rows(body: bytes, fmt: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    stream = io.StringIO(body.decode("utf-8-sig"))
+    if fmt == "csv":
+        for row_no, row in enumerate(csv.DictReader(stream), start=1):
+            try:
+                yield row_no, _coerce_import_row(row), None
+            except ValueError as e:
+                yield row_no, None, str(e)
+        return
+
+    for row_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError("Row must be a JSON object")
+            yield row_no, _coerce_import_row(row), None
+        except ValueError as e:
+            yield row_no, None, str(e)
+
+
+def _submit_partitioned(client: Any, entities: List[Tuple[int, Dict[str, Any]]], errors: Dict[int, str]):
+    partitions: Dict[str, Dict[str, Tuple[int, Dict[str, Any]]]] = defaultdict(dict)
+    for row_no, ent in entities:
+        # a transaction may only touch each row once, so the last row for a key wins
+        partitions[ent["PartitionKey"]][ent["RowKey"]] = (row_no, ent)
+
+    for rows in partitions.values():
+        items = list(rows.values())
+        for i in range(0, len(items), IMPORT_TRANSACTION_SIZE):
+            chunk = items[i:i + IMPORT_TRANSACTION_SIZE]
+            try:
+                client.submit_transaction([("upsert", ent) for _, ent in chunk])
+            except Exception as e:
+                for row_no, _ in chunk:
+                    errors.setdefault(row_no, f"Write failed: {str(e)}")
+
+
+def _import_row_id(row: Dict[str, Any]) -> str:
+    # rows without an id get one derived from name and address, so re-running an import overwrites instead of duplicating
+    key = "|".join(str(row.get(k) or "").strip().lower() for k in ("name", "address", "city", "postal_code"))
+    return "imp-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+
+def _import_chunk(rows: List[Tuple[int, Dict[str, Any]]], errors: Dict[int, str]) -> int:
+    to_geocode = sorted({(row.get("address") or "").strip() for _, row in rows if _needs_geocoding(row)})
+    coords: Dict[str, Optional[Tuple[float, float]]] = {}
+    if to_geocode:
+        with ThreadPoolExecutor(max_workers=IMPORT_GEOCODE_CONCURRENCY) as pool:
+            coords = dict(zip(to_geocode, pool.map(geocode_address_cached, to_geocode)))
+
+    restaurants : List[Tuple[int, Dict[str, Any]]] = []
+    cuisines    : List[Tuple[int, Dict[str, Any]]] = []
+    for row_no, row in rows:
+        try:
+            if not row.get("id"):
+                row = {**row, "id": _import_row_id(row)}
+            ent = _restaurant_entity(row, coords.get((row.get("address") or "").strip()))
+        except ValueError as e:
+            errors[row_no] = str(e)
+            continue
+        restaurants.append((row_no, ent))
+        for c_ent in cuisine_index_entities(ent):
+            cuisines.append((row_no, c_ent))
+
+    _submit_partitioned(get_table_client(TABLE_RESTAURANTS), restaurants, errors)
+    _submit_partitioned(get_table_client(TABLE_CUISINE_INDEX), [c for c in cuisines if c[0] not in errors], errors)
+
+    publish(*(RestaurantChanged(restaurant_id=ent["RowKey"]) for row_no, ent in restaurants if row_no not in errors))
+    imported = sum(1 for row_no, _ in restaurants if row_no not in errors)
+    if imported:
+        bump_listing_version()
+    return imported
+
+
+def _import_restaurants(body: bytes, fmt: str, start_row: int = 1, max_rows: int = IMPORT_MAX_ROWS) -> Dict[str, Any]:
+    # geocode and write chunk by chunk so a timeout keeps what was written; next_row is where to resume
+    errors   : Dict[int, str] = {}
+    chunk    : List[Tuple[int, Dict[str, Any]]] = []
+    total    = 0
+    imported = 0
+    next_row = None
+    started  = time.monotonic()
+    for row_no, row, err in _iter_import_rows(body, fmt):
+        if row_no < start_row:
+            continue
+        if total >= max_rows or time.monotonic() - started > IMPORT_TIME_BUDGET_SECONDS:
+            next_row = row_no
+            break
+        total += 1
+        if err:
+            errors[row_no] = err
+        else:
+            chunk.append((row_no, row))
+        if len(chunk) >= IMPORT_CHUNK_ROWS:
+            imported += _import_chunk(chunk, errors)
+            chunk     = []
+
+    if chunk:
+        imported += _import_chunk(chunk, errors)
 
     return {
-        "id"         : rest_id,
-        "name"       : name,
-        "unique_name": ent["unique_name"],
-        "city"       : city,
-        "address"    : address,
-        "postal_code": postal_code,
-        "lat"        : lat,
-        "lon"        : lon,
-        "cuisines"   : cuisines,
-        "tags"       : tags,
+        "total"   : total,
+        "imported": imported,
+        "failed"  : len(errors),
+        "errors"  : [{"row": row_no, "error": msg} for row_no, msg in sorted(errors.items())],
+        "next_row": next_row,
     }
 
 
-def _create_meal(restaurant_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+def _meal_entity(restaurant_id: str, payload: Dict[str, Any], now: str) -> Dict[str, Any]:
     name = (payload.get("name") or "").strip()
     if not name:
         raise ValueError("Missing meal name")
@@ -186,111 +357,223 @@ def _create_meal(restaurant_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
     except Exception as e:
         raise ValueError("Missing/invalid price") from e
 
-    meal_id = payload.get("id") or str(uuid.uuid4())
-    now     = _now_iso()
-
-    image_type     = (payload.get("image_type") or "food").strip()
-    image_filename = (payload.get("image_filename") or "").strip() or None
-
-    ent = {
+    return {
         "PartitionKey"     : restaurant_id,
-        "RowKey"           : meal_id,
+        "RowKey"           : payload.get("id") or str(uuid.uuid4()),
         "name"             : name,
         "description"      : (payload.get("description") or "").strip(),
         "prep_time_minutes": prep_time_minutes,
         "price"            : price,
-        "image_type"       : image_type,
-        "image_filename"   : image_filename,
+        "image_type"       : (payload.get("image_type") or "food").strip(),
+        "image_filename"   : (payload.get("image_filename") or "").strip() or None,
         "updated_at"       : now,
     }
 
-    client = get_table_client(TABLE_MEALS)
-    client.upsert_entity(ent)
 
-    resolved_filename = image_filename or f"{meal_id}.jpg"
+def _meal_out(restaurant_id: str, ent: Any) -> Dict[str, Any]:
+    meal_id      = ent.get("RowKey")
+    img_type     = ent.get("image_type") or "food"
+    img_filename = ent.get("image_filename") or f"{meal_id}.jpg"
     return {
         "id"               : meal_id,
         "restaurant_id"    : restaurant_id,
-        "name"             : ent["name"],
-        "description"      : ent["description"],
-        "prep_time_minutes": ent["prep_time_minutes"],
-        "price"            : ent["price"],
-        "image_filename"   : resolved_filename,
-        "image_url"        : _get_image_url(image_type, resolved_filename) if resolved_filename else None,
-        "updated_at"       : now,
+        "name"             : ent.get("name"),
+        "description"      : ent.get("description"),
+        "prep_time_minutes": ent.get("prep_time_minutes"),
+        "price"            : ent.get("price"),
+        "image_filename"   : img_filename,
+        "image_url"        : _get_image_url(img_type, img_filename) if img_filename else None,
+        "updated_at"       : ent.get("updated_at"),
     }
 
 
+def _create_meal(restaurant_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    ent = _meal_entity(restaurant_id, payload, _now_iso())
+
+    client = get_table_client(TABLE_MEALS)
+    client.upsert_entity(ent)
+    publish(MenuChanged(restaurant_id=restaurant_id))
+
+    return _meal_out(restaurant_id, ent)
+
+
+def _blob_menu_meal_entities(restaurant_id: str, blob_menu: Dict[str, Any], now: str) -> List[Dict[str, Any]]:
+    entities: Dict[str, Dict[str, Any]] = {}
+    for item in iter_menu_items(blob_menu):
+        item_id = str(item.get("id"))
+        try:
+            price = float(item.get("price"))
+        except Exception:
+            price = 0.0
+
+        payload = {
+            "id"            : item_id,
+            "name"          : item.get("name"),
+            "description"   : item.get("description"),
+            "price"         : price,
+            "image_filename": f"{restaurant_id}_{item_id}.jpg" if item.get("image") else None,
+        }
+        try:
+            entities[item_id] = _meal_entity(restaurant_id, payload, now)
+        except ValueError:
+            continue
+    return list(entities.values())
+
+
 def _list_meals(restaurant_id: str) -> List[Dict[str, Any]]:
     client = get_table_client(TABLE_MEALS)
     meals: List[Dict[str, Any]] = []
     try:
-        entities = client.query_entities(f"PartitionKey eq '{restaurant_id}'")
-        for ent in entities:
-            img_type    = ent.get("image_type") or "food"
-            meal_id     = ent.get("RowKey")
-            img_filename = ent.get("image_filename") or f"{meal_id}.jpg"
-            meals.append(
-                {
-                    "id"               : meal_id,
-                    "restaurant_id"    : restaurant_id,
-                    "name"             : ent.get("name"),
-                    "description"      : ent.get("description"),
-                    "prep_time_minutes": ent.get("prep_time_minutes"),
-                    "price"            : ent.get("price"),
-                    "image_filename"   : img_filename,
-                    "image_url"        : _get_image_url(img_type, img_filename) if img_filename else None,
-                    "updated_at"       : ent.get("updated_at"),
-                }
-            )
+        for ent in client.query_entities(f"PartitionKey eq '{restaurant_id}'"):
+            meals.append(_meal_out(restaurant_id, ent))
     except Exception:
         pass
 
-    if meals:
-        meals.sort(key=lambda m: (m.get("name") or "").lower())
-        return meals
+    if not meals:
+        # not migrated yet: show the blob menu as meals without writing anything
+        blob_menu = get_menu_from_blob(restaurant_id)
+        if blob_menu:
+            meals = [_meal_out(restaurant_id, ent) for ent in _blob_menu_meal_entities(restaurant_id, blob_menu, None)]
+
+    meals.sort(key=lambda m: (m.get("name") or "").lower())
+    return meals
+
+
+def _stream_meals(restaurant_id: str, cursor: Optional[str]) -> func.HttpResponse:
+    # table key order rather than by name, so the listing never has to be held in memory
+    scan = TableScan(
+        get_table_client(TABLE_MEALS), cursor, query_filter=f"PartitionKey eq '{restaurant_id}'", scope=f"meals-of:{restaurant_id}"
+    )
+
+    def records() -> Iterator[Dict[str, Any]]:
+        empty = True
+        for ent in scan:
+            empty = False
+            yield _meal_out(restaurant_id, ent)
+        if empty and not cursor:
+            blob_menu = get_menu_from_blob(restaurant_id)
+            if blob_menu:
+                for ent in _blob_menu_meal_entities(restaurant_id, blob_menu, None):
+                    yield _meal_out(restaurant_id, ent)
+
+    return ndjson_response(records(), scan.cursor)
+
+
+def _has_meals(client: Any, restaurant_id: str) -> bool:
+    entities = client.query_entities(
+        f"PartitionKey eq '{restaurant_id}'", select=["RowKey"], results_per_page=1
+    )
+    return next(iter(entities), None) is not None
+
+
+def _migrate_restaurant_menu(restaurant_id: str) -> Dict[str, Any]:
+    client = get_table_client(TABLE_MEALS)
+    if _has_meals(client, restaurant_id):
+        return {"status": "skipped", "meals": 0}
 
     blob_menu = get_menu_from_blob(restaurant_id)
     if not blob_menu:
-        return []
+        return {"status": "no_menu", "meals": 0}
 
-    migrated_meals = []
-    menu_structure = blob_menu.get("menu_structure") or []
-    
-    for cat in menu_structure:
-        for item in cat.get("items", []):
-            item_id = item.get("id")
-            if not item_id:
-                continue
-            
-            price = item.get("price")
-            try:
-                price = float(price)
-            except Exception:
-                price = 0.0
-            
-            payload = {
-                "id"           : item_id,
-                "name"         : item.get("name"),
-                "description"  : item.get("description"),
-                "price"        : price,
-                "image_filename": f"{restaurant_id}_{item_id}.jpg" if item.get("image") else None
-            }
-            
-            try:
-                created = _create_meal(restaurant_id, payload)
-                migrated_meals.append(created)
-            except Exception:
-                continue
+    entities = _blob_menu_meal_entities(restaurant_id, blob_menu, _now_iso())
+    for i in range(0, len(entities), MIGRATION_TRANSACTION_SIZE):
+        client.submit_transaction([("upsert", ent) for ent in entities[i:i + MIGRATION_TRANSACTION_SIZE]])
 
-    migrated_meals.sort(key=lambda m: (m.get("name") or "").lower())
-    return migrated_meals
+    publish(MenuChanged(restaurant_id=restaurant_id))
+    return {"status": "migrated", "meals": len(entities)}
 
 
-def _update_meal(restaurant_id: str, meal_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-    client = get_table_client(TABLE_MEALS)
-    now    = _now_iso()
+def _job_out(job: Any) -> Dict[str, Any]:
+    return {
+        "job_id"     : job.get("RowKey"),
+        "status"     : job.get("status"),
+        "processed"  : job.get("processed") or 0,
+        "migrated"   : job.get("migrated") or 0,
+        "meals"      : job.get("meals") or 0,
+        "failed"     : job.get("failed") or 0,
+        "started_at" : job.get("started_at"),
+        "updated_at" : job.get("updated_at"),
+    }
+
 
+def _get_migration_job(job_id: str) -> Optional[Dict[str, Any]]:
+    client = get_table_client(TABLE_MIGRATIONS)
+    try:
+        return dict(client.get_entity(partition_key=MIGRATION_JOBS_PARTITION, row_key=job_id))
+    except ResourceNotFoundError:
+        return None
+
+
+def _run_menu_migration(job_id: Optional[str], max_restaurants: int) -> Dict[str, Any]:
+    checkpoints = get_table_client(TABLE_MIGRATIONS)
+    now         = _now_iso()
+
+    job = _get_migration_job(job_id) if job_id else None
+    if job_id and job is None:
+        raise ValueError("Unknown migration job")
+    if job is None:
+        job = {
+            "PartitionKey": MIGRATION_JOBS_PARTITION,
+            "RowKey"      : str(uuid.uuid4()),
+            "status"      : "running",
+            "continuation": None,
+            "processed"   : 0,
+            "migrated"    : 0,
+            "meals"       : 0,
+            "failed"      : 0,
+            "started_at"  : now,
+            "updated_at"  : now,
+        }
+    if job.get("status") == "completed":
+        return _job_out(job)
+
+    restaurants = get_table_client(TABLE_RESTAURANTS)
+    with allow_table_scan():
+        pages = restaurants.list_entities(
+            select=["RowKey"], results_per_page=MIGRATION_PAGE_SIZE
+        ).by_page(continuation_token=json.loads(job["continuation"]) if job.get("continuation") else None)
+
+    handled = 0
+    for page in pages:
+        restaurant_ids = [ent.get("RowKey") for ent in page]
+
+        with ThreadPoolExecutor(max_workers=MIGRATION_CONCURRENCY) as pool:
+            futures = {rid: pool.submit(_migrate_restaurant_menu, rid) for rid in restaurant_ids}
+
+        rows = []
+        for rid, future in futures.items():
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"status": "failed", "meals": 0, "error": str(e)[:500]}
+            job["processed"] += 1
+            job["migrated"]  += 1 if result["status"] == "migrated" else 0
+            job["failed"]    += 1 if result["status"] == "failed" else 0
+            job["meals"]     += result["meals"]
+            rows.append({"PartitionKey": job["RowKey"], "RowKey": rid, **result, "updated_at": _now_iso()})
+
+        for i in range(0, len(rows), MIGRATION_TRANSACTION_SIZE):
+            checkpoints.submit_transaction([("upsert", row) for row in rows[i:i + MIGRATION_TRANSACTION_SIZE]])
+
+        # checkpoint after every page so an interrupted run resumes from the next page
+        next_token          = pages.continuation_token
+        job["continuation"] = json.dumps(next_token) if next_token else None
+        job["status"]       = "running" if next_token else "completed"
+        job["updated_at"]   = _now_iso()
+        checkpoints.upsert_entity(job)
+
+        handled += len(restaurant_ids)
+        if handled >= max_restaurants:
+            break
+    else:
+        job["status"]     = "completed"
+        job["updated_at"] = _now_iso()
+        checkpoints.upsert_entity(job)
+
+    return _job_out(job)
+
+
+def _meal_patch(restaurant_id: str, meal_id: str, payload: Dict[str, Any], now: str) -> Dict[str, Any]:
     patch: Dict[str, Any] = {
         "PartitionKey": restaurant_id,
         "RowKey"      : meal_id,
@@ -310,7 +593,10 @@ def _update_meal(restaurant_id: str, meal_id: str, payload: Dict[str, Any]) -> D
             patch["prep_time_minutes"] = None
     
     if "price" in payload:
-        patch["price"] = float(payload.get("price"))
+        try:
+            patch["price"] = float(payload.get("price"))
+        except Exception as e:
+            raise ValueError("Missing/invalid price") from e
     
     if "image_type" in payload:
         patch["image_type"] = (payload.get("image_type") or "food").strip()
@@ -318,113 +604,209 @@ def _update_meal(restaurant_id: str, meal_id: str, payload: Dict[str, Any]) -> D
     if "image_filename" in payload:
         patch["image_filename"] = (payload.get("image_filename") or "").strip() or None
 
-    client.update_entity(mode=UpdateMode.MERGE, entity=patch)
+    return patch
 
-    ent         = client.get_entity(partition_key=restaurant_id, row_key=meal_id)
-    img_type    = ent.get("image_type") or "food"
-    img_filename = ent.get("image_filename") or f"{meal_id}.jpg"
-    return {
-        "id"               : meal_id,
-        "restaurant_id"    : restaurant_id,
-        "name"             : ent.get("name"),
-        "description"      : ent.get("description"),
-        "prep_time_minutes": ent.get("prep_time_minutes"),
-        "price"            : ent.get("price"),
-        "image_filename"   : img_filename,
-        "image_url"        : _get_image_url(img_type, img_filename) if img_filename else None,
-        "updated_at"       : ent.get("updated_at"),
-    }
+
+def _update_meal(restaurant_id: str, meal_id: str, payload: Dict[str, Any], if_match: Optional[str] = None) -> Dict[str, Any]:
+    client     = get_table_client(TABLE_MEALS)
+    patch      = _meal_patch(restaurant_id, meal_id, payload, _now_iso())
+    conditions = {"etag": if_match, "match_condition": MatchConditions.IfNotModified} if if_match else {}
+
+    # a merge of a missing row fails with ResourceNotFoundError, so no read is needed before the write
+    client.update_entity(mode=UpdateMode.MERGE, entity=patch, **conditions)
+    publish(MenuChanged(restaurant_id=restaurant_id))
+
+    # the response is the whole merged meal, read back together with its new etag
+    ent = client.get_entity(partition_key=restaurant_id, row_key=meal_id)
+    return {**_meal_out(restaurant_id, ent), "etag": ent.metadata.get("etag")}
+
+
+def _batch_meals(restaurant_id: str, ops: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    client  = get_table_client(TABLE_MEALS)
+    now     = _now_iso()
+    results : List[Dict[str, Any]] = [{} for _ in ops]
+
+    state: Dict[str, Dict[str, Any]] = {}
+    if any(isinstance(op, dict) and str(op.get("op") or "").lower() in ("update", "delete") for op in ops):
+        for ent in client.query_entities(f"PartitionKey eq '{restaurant_id}'"):
+            state[ent.get("RowKey")] = dict(ent)
+
+    # a chunk is submitted before any later op touches one of its rows or it reaches the transaction size,
+    # so a failed chunk can be rolled back in `state` before later ops are checked against it
+    chunk      : List[Tuple[int, Tuple[Any, ...]]] = []
+    chunk_undo : Dict[str, Optional[Dict[str, Any]]] = {}
+
+    def submit_chunk():
+        if not chunk:
+            return
+        try:
+            client.submit_transaction([action for _, action in chunk])
+        except Exception as e:
+            for i, _ in chunk:
+                results[i].update({"status": 409, "data": None, "error": f"Transaction failed: {str(e)}"})
+            for key, before in chunk_undo.items():
+                if before is None:
+                    state.pop(key, None)
+                else:
+                    state[key] = before
+        del chunk[:]
+        chunk_undo.clear()
+
+    for i, op in enumerate(ops):
+        if not isinstance(op, dict) or not isinstance(op.get("meal") or {}, dict):
+            results[i] = {"index": i, "op": None, "id": None, "status": 400, "error": "Each op must be an object with an object 'meal'"}
+            continue
+        kind    = str(op.get("op") or "").strip().lower()
+        payload = op.get("meal") or {}
+        meal_id = op.get("id") or payload.get("id")
+        results[i] = {"index": i, "op": kind, "id": meal_id}
+        if kind not in ("create", "update", "delete"):
+            results[i].update({"status": 400, "error": f"Unknown op '{kind}'"})
+            continue
+        try:
+            ent = _meal_entity(restaurant_id, payload, now) if kind == "create" else None
+        except ValueError as e:
+            results[i].update({"status": 400, "error": str(e)})
+            continue
+        if ent is not None:
+            meal_id = ent["RowKey"]
+
+        if meal_id in chunk_undo or len(chunk) >= MEAL_BATCH_TRANSACTION_SIZE:
+            submit_chunk()
+
+        try:
+            if kind == "create":
+                action = ("upsert", ent)
+                after  = ent
+                results[i].update({"id": meal_id, "status": 201, "data": _meal_out(restaurant_id, ent)})
+            elif kind == "update":
+                if not meal_id or meal_id not in state:
+                    results[i].update({"status": 404, "error": "Meal not found"})
+                    continue
+                patch  = _meal_patch(restaurant_id, meal_id, payload, now)
+                action = ("update", patch, {"mode": UpdateMode.MERGE})
+                after  = {**state[meal_id], **patch}
+                results[i].update({"status": 200, "data": _meal_out(restaurant_id, after)})
+            else:
+                if not meal_id or meal_id not in state:
+                    results[i].update({"status": 404, "error": "Meal not found"})
+                    continue
+                action = ("delete", {"PartitionKey": restaurant_id, "RowKey": meal_id})
+                after  = None
+                results[i].update({"status": 200, "data": {"deleted": True}})
+        except ValueError as e:
+            results[i].update({"status": 400, "error": str(e)})
+            continue
+
+        chunk_undo[meal_id] = state.get(meal_id)
+        if after is None:
+            state.pop(meal_id)
+        else:
+            state[meal_id] = after
+        chunk.append((i, action))
+
+    submit_chunk()
+    publish(MenuChanged(restaurant_id=restaurant_id))
+    return results
 
 
 def _delete_meal(restaurant_id: str, meal_id: str):
     client = get_table_client(TABLE_MEALS)
     client.delete_entity(partition_key=restaurant_id, row_key=meal_id)
+    publish(MenuChanged(restaurant_id=restaurant_id))
 
 
-def _search_images(image_type: str, q: str, limit: int) -> List[Dict[str, str]]:
-    cs = get_connection_string()
-    if not cs:
-        return []
-    bs       = BlobServiceClient.from_connection_string(cs)
-    container = bs.get_container_client(BLOB_CONTAINER_IMAGES)
+def _search_images(image_type: str, q: str, limit: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "filename"     : filename,
+            "url"          : _get_image_url(image_type, filename),
+            "size"         : size,
+            "last_modified": last_modified,
+        }
+        for filename, size, last_modified in search_image_catalog(image_type, q, limit)
+    ]
 
-    q      = (q or "").strip()
-    prefix = f"{image_type}/" + (q if q else "")
 
-    out: List[Dict[str, str]] = []
-    try:
-        for blob in container.list_blobs(name_starts_with=prefix):
-            name = blob.name
-            if not name.startswith(f"{image_type}/"):
-                continue
-            filename = name[len(f"{image_type}/") :]
-            if not filename:
-                continue
-            out.append(
-                {
-                    "filename": filename,
-                    "url"     : _get_image_url(image_type, filename),
-                }
-            )
-            if len(out) >= limit:
-                break
-    except Exception:
-        return []
-    return out
+def _image_blob(image_type: str, filename: str) -> Any:
+    if image_type == "derived" or "/" in filename:
+        raise ValueError("Invalid image path")
+    return get_blob_service_client().get_blob_client(container=BLOB_CONTAINER_IMAGES, blob=f"{image_type}/{filename}")
+
+
+def _upload_image(image_type: str, filename: str, body: bytes, content_type: Optional[str]) -> Dict[str, Any]:
+    result = _image_blob(image_type, filename).upload_blob(
+        body, overwrite=True, content_settings=ContentSettings(content_type=content_type or content_type_for(filename))
+    )
+    invalidate_image(f"{image_type}/{filename}")
+    record_image_upload(image_type, filename, len(body), result.get("last_modified"))
+    return {
+        "filename": filename,
+        "url"     : _get_image_url(image_type, filename),
+        "size"    : len(body),
+        "etag"    : result.get("etag"),
+    }
+
 
+def _delete_image(image_type: str, filename: str):
+    _image_blob(image_type, filename).delete_blob()
+    invalidate_image(f"{image_type}/{filename}")
+    record_image_delete(image_type, filename)
 
-def _search_meals(q: str, limit: int) -> List[Dict[str, Any]]:
+
+def _meal_filter(q: str) -> Tuple[str, Callable[[Any], bool]]:
     q_norm = (q or "").strip().lower()
-    if not q_norm:
-        return []
+    return (
+        f"meals:{q_norm}",
+        lambda ent: q_norm in f"{(ent.get('name') or '').strip()}\n{(ent.get('description') or '').strip()}".lower(),
+    )
 
-    client = get_table_client(TABLE_MEALS)
-    out: List[Dict[str, Any]] = []
 
+def _meal_hit(ent: Any) -> Dict[str, Any]:
+    hit                = _meal_out(ent.get("PartitionKey"), ent)
+    hit["name"]        = (ent.get("name") or "").strip()
+    hit["description"] = (ent.get("description") or "").strip()
+    return hit
+
+
+def _search_meals(q: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    if not (q or "").strip():
+        return [], None
+
+    client           = get_table_client(TABLE_MEALS)
+    scope, predicate = _meal_filter(q)
     try:
-        for ent in client.list_entities(results_per_page=min(limit, 200)):
-            name = (ent.get("name") or "").strip()
-            desc = (ent.get("description") or "").strip()
-            hay  = f"{name}\n{desc}".lower()
-            if q_norm not in hay:
-                continue
-
-            restaurant_id = ent.get("PartitionKey")
-            meal_id       = ent.get("RowKey")
-            img_type      = ent.get("image_type") or "food"
-            img_filename  = ent.get("image_filename") or f"{meal_id}.jpg"
-
-            out.append(
-                {
-                    "id"               : meal_id,
-                    "restaurant_id"    : restaurant_id,
-                    "name"             : name,
-                    "description"      : desc,
-                    "prep_time_minutes": ent.get("prep_time_minutes"),
-                    "price"            : ent.get("price"),
-                    "image_filename"   : img_filename,
-                    "image_url"        : _get_image_url(img_type, img_filename) if img_filename else None,
-                    "updated_at"       : ent.get("updated_at"),
-                }
-            )
-            if len(out) >= limit:
-                break
+        entities, next_cursor = page_entities(client, limit, cursor, predicate=predicate, scope=scope)
+    except ValueError:
+        raise
     except Exception:
-        return []
+        return [], None
+
+    return [_meal_hit(ent) for ent in entities], next_cursor
 
-    out.sort(key=lambda m: (m.get("name") or "").lower())
-    return out
+
+def _stream_meal_search(q: str, cursor: Optional[str]) -> func.HttpResponse:
+    if not (q or "").strip():
+        return ndjson_response((), lambda: None)
+    scope, predicate = _meal_filter(q)
+    scan             = TableScan(get_table_client(TABLE_MEALS), cursor, scope=scope)
+    return ndjson_response((_meal_hit(ent) for ent in scan_matches(scan, predicate)), scan.cursor)
 
 
 def register_routes(app: "FunctionApp"):
     
     @app.route(route="manage/restaurants", methods=["GET", "POST"])
+    @compressible()
     def admin_restaurants(req: func.HttpRequest) -> func.HttpResponse:
         try:
             if req.method == "GET":
-                limit = int(req.params.get("limit", "100"))
-                q     = req.params.get("q")
-                return success_response(_list_restaurants(limit=max(1, min(limit, 500)), q=q))
+                limit  = int(req.params.get("limit", "100"))
+                q      = req.params.get("q")
+                cursor = req.params.get("cursor")
+                if wants_ndjson(req):
+                    return _stream_restaurants(q, cursor)
+                restaurants, next_cursor = _list_restaurants(limit=max(1, min(limit, 500)), q=q, cursor=cursor)
+                return success_fragments_response((r.render() for r in restaurants), meta={"next_cursor": next_cursor})
 
             payload  = req.get_json()
             created  = _create_restaurant(payload)
@@ -434,7 +816,32 @@ def register_routes(app: "FunctionApp"):
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
     
+    @app.route(route="manage/restaurants/import", methods=["POST"])
+    def admin_import_restaurants(req: func.HttpRequest) -> func.HttpResponse:
+        try:
+            fmt = (req.params.get("format") or "").strip().lower()
+            if not fmt:
+                content_type = (req.headers.get("Content-Type") or "").lower()
+                fmt          = "csv" if "csv" in content_type else "ndjson"
+            if fmt not in ("csv", "ndjson"):
+                return error_response("format must be csv or ndjson", 400)
+
+            body = req.get_body()
+            if not body:
+                return error_response("Empty body", 400)
+
+            try:
+                start_row = max(1, int(req.params.get("start_row", "1")))
+                max_rows  = max(1, min(int(req.params.get("max_rows", str(IMPORT_MAX_ROWS))), IMPORT_MAX_ROWS))
+            except ValueError:
+                return error_response("start_row and max_rows must be integers", 400)
+
+            return success_response(_import_restaurants(body, fmt, start_row, max_rows))
+        except Exception as e:
+            return error_response(f"Internal server error: {str(e)}", 500)
+    
     @app.route(route="manage/restaurants/{restaurant_id}/meals", methods=["GET", "POST"])
+    @compressible()
     def admin_restaurant_meals(req: func.HttpRequest) -> func.HttpResponse:
         try:
             restaurant_id = req.route_params.get("restaurant_id")
@@ -442,6 +849,8 @@ def register_routes(app: "FunctionApp"):
                 return error_response("Missing restaurant_id", 400)
 
             if req.method == "GET":
+                if wants_ndjson(req):
+                    return _stream_meals(restaurant_id, req.params.get("cursor"))
                 return success_response(_list_meals(restaurant_id))
 
             payload  = req.get_json()
@@ -452,6 +861,26 @@ def register_routes(app: "FunctionApp"):
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
     
+    @app.route(route="manage/restaurants/{restaurant_id}/meals/batch", methods=["POST"])
+    def admin_restaurant_meals_batch(req: func.HttpRequest) -> func.HttpResponse:
+        try:
+            restaurant_id = req.route_params.get("restaurant_id")
+            if not restaurant_id:
+                return error_response("Missing restaurant_id", 400)
+
+            payload = req.get_json()
+            ops     = payload.get("ops")
+            if not isinstance(ops, list) or not ops:
+                return error_response("Missing ops", 400)
+            if len(ops) > MEAL_BATCH_MAX_OPS:
+                return error_response(f"At most {MEAL_BATCH_MAX_OPS} ops per batch", 400)
+
+            return success_response(_batch_meals(restaurant_id, ops))
+        except ValueError as e:
+            return error_response(str(e), 400)
+        except Exception as e:
+            return error_response(f"Internal server error: {str(e)}", 500)
+    
     @app.route(route="manage/restaurants/{restaurant_id}/meals/{meal_id}", methods=["PUT", "DELETE"])
     def admin_restaurant_meal(req: func.HttpRequest) -> func.HttpResponse:
         try:
@@ -465,14 +894,22 @@ def register_routes(app: "FunctionApp"):
                 return success_response({"deleted": True})
 
             payload  = req.get_json()
-            updated  = _update_meal(restaurant_id, meal_id, payload)
-            return success_response(updated)
+            if not isinstance(payload, dict):
+                return error_response("Body must be a JSON object", 400)
+            updated  = _update_meal(restaurant_id, meal_id, payload, req.headers.get("If-Match"))
+            headers  = {"ETag": updated["etag"]} if updated.get("etag") else None
+            return success_response(updated, headers=headers)
+        except ResourceNotFoundError:
+            return error_response("Meal not found", 404)
+        except ResourceModifiedError:
+            return error_response("Meal was modified concurrently, retry", 412)
         except ValueError as e:
             return error_response(str(e), 400)
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
     
     @app.route(route="images/search", methods=["GET"])
+    @compressible()
     def image_search(req: func.HttpRequest) -> func.HttpResponse:
         try:
             image_type = (req.params.get("type") or "food").strip()
@@ -483,12 +920,161 @@ def register_routes(app: "FunctionApp"):
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
     
+    @app.route(route="manage/images/{image_type}/{filename}", methods=["PUT", "DELETE"])
+    def admin_image(req: func.HttpRequest) -> func.HttpResponse:
+        try:
+            image_type = req.route_params.get("image_type")
+            filename   = req.route_params.get("filename")
+            if req.method == "DELETE":
+                try:
+                    _delete_image(image_type, filename)
+                except ResourceNotFoundError:
+                    return error_response("Image not found", 404)
+                return success_response({"deleted": True})
+
+            body = req.get_body()
+            if not body:
+                return error_response("Empty body", 400)
+            return success_response(_upload_image(image_type, filename, body, req.headers.get("Content-Type")), 201)
+        except ValueError as e:
+            return error_response(str(e), 400)
+        except Exception as e:
+            return error_response(f"Internal server error: {str(e)}", 500)
+    
+    @app.route(route="manage/images/sync", methods=["POST"])
+    def admin_sync_image_catalog(req: func.HttpRequest) -> func.HttpResponse:
+        try:
+            return success_response(sync_image_catalog())
+        except Exception as e:
+            return error_response(f"Internal server error: {str(e)}", 500)
+    
+    @app.timer_trigger(schedule=IMAGE_CATALOG_SCHEDULE, arg_name="timer", run_on_startup=False, use_monitor=False)
+    def image_catalog_timer(timer: func.TimerRequest) -> None:
+        try:
+            result = sync_image_catalog()
+            logging.info("Image catalog synced: %s images", result.get("images"))
+        except Exception:
+            logging.exception("Image catalog sync failed")
+    
     @app.route(route="meals/search", methods=["GET"])
+    @compressible()
     def meals_search(req: func.HttpRequest) -> func.HttpResponse:
         try:
             q       = req.params.get("q", "")
             limit   = int(req.params.get("limit", "20"))
-            results = _search_meals(q=q, limit=max(1, min(limit, 100)))
-            return success_response(results)
+            cursor  = req.params.get("cursor")
+            if wants_ndjson(req):
+                return _stream_meal_search(q, cursor)
+            results, next_cursor = _search_meals(q=q, limit=max(1, min(limit, 100)), cursor=cursor)
+            return success_response(results, meta={"next_cursor": next_cursor})
+        except ValueError as e:
+            return error_response(str(e), 400)
+        except Exception as e:
+            return error_response(f"Internal server error: {str(e)}", 500)
+    
+    @app.route(route="manage/migrations/menus", methods=["POST"])
+    def admin_start_menu_migration(req: func.HttpRequest) -> func.HttpResponse:
+        try:
+            job_id          = req.params.get("job_id")
+            max_restaurants = int(req.params.get("max_restaurants", "500"))
+            result          = _run_menu_migration(job_id, max(1, min(max_restaurants, 5000)))
+            return success_response(result, 202 if result["status"] == "running" else 200)
+        except ValueError as e:
+            return error_response(str(e), 400)
+        except Exception as e:
+            return error_response(f"Internal server error: {str(e)}", 500)
+    
+    @app.route(route="manage/migrations/menus/{job_id}", methods=["GET"])
+    def admin_menu_migration_status(req: func.HttpRequest) -> func.HttpResponse:
+        try:
+            job = _get_migration_job(req.route_params.get("job_id") or "")
+            if not job:
+                return error_response("Migration job not found", 404)
+            return success_response(_job_out(job))
+        except Exception as e:
+            return error_response(f"Internal server error: {str(e)}", 500)
+    
+    @app.timer_trigger(schedule=MENU_MIGRATION_SCHEDULE, arg_name="timer", run_on_startup=False, use_monitor=False)
+    def menu_migration_timer(timer: func.TimerRequest) -> None:
+        client = get_table_client(TABLE_MIGRATIONS)
+        for job in client.query_entities(
+            f"PartitionKey eq '{MIGRATION_JOBS_PARTITION}' and status eq 'running'"
+        ):
+            try:
+                result = _run_menu_migration(job.get("RowKey"), 500)
+                logging.info("Menu migration %s: %s", result["job_id"], result)
+            except Exception:
+                logging.exception("Menu migration %s failed", job.get("RowKey"))
+    
+    @app.route(route="manage/orders/archive", methods=["POST"])
+    def admin_archive_orders(req: func.HttpRequest) -> func.HttpResponse:
+        try:
+            min_age_days = req.params.get("min_age_days")
+            limit        = int(req.params.get("limit", "5000"))
+            # orders from today may still change status, so a run never archives anything younger than a day
+            result       = archive_orders(
+                min_age_days=max(1, int(min_age_days)) if min_age_days else None,
+                limit=max(1, min(limit, 50000)),
+            )
+            return success_response(result)
+        except ValueError as e:
+            return error_response(str(e), 400)
+        except Exception as e:
+            return error_response(f"Internal server error: {str(e)}", 500)
+    
+    @app.route(route="manage/orders/reindex", methods=["POST"])
+    def admin_reindex_orders(req: func.HttpRequest) -> func.HttpResponse:
+        try:
+            with allow_table_scan():
+                return success_response(rebuild_order_index())
+        except Exception as e:
+            return error_response(f"Internal server error: {str(e)}", 500)
+    
+    @app.timer_trigger(schedule=ORDER_INDEX_SCHEDULE, arg_name="timer", run_on_startup=True, use_monitor=False)
+    def order_index_backfill_timer(timer: func.TimerRequest) -> None:
+        # runs until the first backfill has completed, then only checks the marker
+        if order_index_ready():
+            return
+        try:
+            with allow_table_scan():
+                result = rebuild_order_index()
+            logging.info("Backfilled OrdersByRecency for %s orders", result.get("orders"))
+        except Exception:
+            logging.exception("Order index backfill failed")
+    
+    @app.timer_trigger(schedule=ORDER_ARCHIVE_SCHEDULE, arg_name="timer", run_on_startup=False, use_monitor=False)
+    def archive_orders_timer(timer: func.TimerRequest) -> None:
+        try:
+            result = archive_orders()
+            logging.info("Archived %s orders into segments %s", result.get("archived"), result.get("segments"))
+        except Exception:
+            logging.exception("Order archive run failed")
+    
+    @app.route(route="manage/cuisine-index/rebuild", methods=["POST"])
+    def admin_rebuild_cuisine_index(req: func.HttpRequest) -> func.HttpResponse:
+        try:
+            with allow_table_scan():
+                restaurants = get_table_client(TABLE_RESTAURANTS).list_entities()
+                result      = rebuild_cuisine_index(restaurants)
+            bump_listing_version()
+            return success_response(result)
+        except Exception as e:
+            return error_response(f"Internal server error: {str(e)}", 500)
+    
+    @app.route(route="manage/cells/rebalance", methods=["POST"])
+    def admin_rebalance_cells(req: func.HttpRequest) -> func.HttpResponse:
+        try:
+            max_splits = int(req.params.get("max_splits", "20"))
+            return success_response(rebalance_cells(max_splits=max(0, min(max_splits, 500))))
+        except ValueError as e:
+            return error_response(str(e), 400)
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
+    
+    @app.timer_trigger(schedule=CELL_REBALANCE_SCHEDULE, arg_name="timer", run_on_startup=False, use_monitor=False)
+    def cell_rebalance_timer(timer: func.TimerRequest) -> None:
+        try:
+            result = rebalance_cells()
+            logging.info("Cell rebalance split %s, drained %s", len(result.get("split")), len(result.get("drained")))
+        except Exception:
+            logging.exception("Cell rebalance run failed")
@@ -3,20 +3,49 @@ import re
 import uuid
 
 import azure.functions as func
+from azure.core        import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
 from azure.data.tables import UpdateMode
 from datetime          import datetime, timezone
-from typing            import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from typing            import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
 from api.geocoding     import get_route_details
+from api.restaurants   import get_restaurant_detail_cached
+from shared.archive    import get_archived_order, list_archived_orders
+from shared.coalesce   import WriteCoalescer
 from shared.database   import get_table_client
 from shared.geo        import haversine_distance_meters, estimate_eta_minutes
-from utils.response    import error_response, success_response
+from shared.menu_index import get_menu_index
+from shared.order_index import (
+    index_order,
+    load_indexed_order,
+    load_indexed_orders,
+    order_index_filter,
+    order_index_ready,
+    recency_key,
+)
+from shared.order_lines import build_order_lines, decode_order_lines, encode_order_lines, hydrate_order_lines
+from shared.pagination import TableScan, decode_cursor, encode_cursor, page_entities, page_list
+from utils.response    import (
+    compressible,
+    conditional_response,
+    error_response,
+    ndjson_response,
+    success_response,
+    version_digest,
+    wants_ndjson,
+)
 
 if TYPE_CHECKING:
     from azure.functions import FunctionApp
 
-TABLE_ORDERS      = "Orders"
-TABLE_BASKETS     = "Baskets"
-TABLE_RESTAURANTS = "Restaurants"
+TABLE_ORDERS            = "Orders"
+TABLE_ORDERS_BY_RECENCY = "OrdersByRecency"
+TABLE_BASKETS           = "Baskets"
+TABLE_RESTAURANTS       = "Restaurants"
+
+BASKET_WRITE_RETRIES = 3
+
+_basket_writes = WriteCoalescer()
 
 
 def _now_iso() -> str:
@@ -92,15 +121,121 @@ def _basket_key(basket_id: str, restaurant_id: str) -> Dict[str, str]:
         "RowKey"      : restaurant_id
     }
 
+def _apply_basket_op(items: List[Dict[str, Any]], op: Dict[str, Any]) -> List[Dict[str, Any]]:
+    kind = (op.get("op") or "").strip().lower()
+
+    if kind == "clear":
+        return []
+
+    item    = op.get("item") or {}
+    item_id = op.get("id") if op.get("id") is not None else item.get("id")
+    if item_id is None:
+        raise ValueError(f"Missing item id for '{kind}' op")
+
+    existing = next((it for it in items if it.get("id") == item_id), None)
+
+    if kind == "add":
+        try:
+            qty = int(op.get("quantity", 1))
+        except Exception as e:
+            raise ValueError("Invalid quantity") from e
+        if existing:
+            existing["quantity"] = int(existing.get("quantity") or 0) + qty
+        else:
+            items.append({**item, "id": item_id, "quantity": qty})
+        return [it for it in items if int(it.get("quantity") or 0) > 0]
+
+    if kind == "remove":
+        return [it for it in items if it.get("id") != item_id]
+
+    if kind == "set_quantity":
+        try:
+            qty = int(op.get("quantity"))
+        except Exception as e:
+            raise ValueError("Invalid quantity") from e
+        if qty <= 0:
+            return [it for it in items if it.get("id") != item_id]
+        if existing:
+            existing["quantity"] = qty
+        elif item:
+            items.append({**item, "id": item_id, "quantity": qty})
+        else:
+            raise ValueError(f"Item {item_id} is not in the basket")
+        return items
+
+    raise ValueError(f"Unknown basket op '{kind}'")
+
+def _flush_basket_ops(client: Any, basket_id: str, restaurant_id: str, batch: List[Tuple[Optional[str], List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    for _ in range(BASKET_WRITE_RETRIES):
+        try:
+            ent   = client.get_entity(partition_key=basket_id, row_key=restaurant_id)
+            etag  = ent.metadata.get("etag")
+            items = json.loads(ent.get("items_json") or "[]")
+        except ResourceNotFoundError:
+            etag  = None
+            items = []
+
+        results: List[Dict[str, Any]] = []
+        current = etag
+        for if_match, ops in batch:
+            if if_match and if_match != "*" and if_match != current:
+                results.append({"status": 412, "error": "Basket was modified"})
+                continue
+            try:
+                candidate = [dict(it) for it in items]
+                for op in ops:
+                    candidate = _apply_basket_op(candidate, op)
+            except ValueError as e:
+                results.append({"status": 400, "error": str(e)})
+                continue
+            # every accepted payload is a new version, so a later If-Match on the version read above is stale
+            items   = candidate
+            current = None
+            results.append({"status": 200})
+
+        if not any(r["status"] == 200 for r in results):
+            return results
+
+        new_ent = {
+            **_basket_key(basket_id, restaurant_id),
+            "items_json": json.dumps(items),
+            "updated_at": _now_iso(),
+        }
+        try:
+            if etag:
+                meta = client.update_entity(
+                    entity=new_ent,
+                    mode=UpdateMode.REPLACE,
+                    etag=etag,
+                    match_condition=MatchConditions.IfNotModified,
+                )
+            else:
+                meta = client.create_entity(entity=new_ent)
+        except (ResourceModifiedError, ResourceExistsError):
+            continue
+
+        for r in results:
+            if r["status"] == 200:
+                r.update({"items": items, "etag": meta.get("etag"), "updated_at": new_ent["updated_at"]})
+        return results
+
+    return [{"status": 409, "error": "Basket is being modified concurrently, retry"} for _ in batch]
+
 def _escape_odata_value(val: str) -> str:
     return (val or "").replace("'", "''")
 
-def _entity_to_order(ent: Any) -> Dict[str, Any]:
-    order_id = ent.get("RowKey")
+def _entity_items(ent: Any, full: bool = True) -> List[Dict[str, Any]]:
     try:
-        items = json.loads(ent.get("items_json") or "[]")
+        lines = decode_order_lines(ent)
+        if lines is not None:
+            return hydrate_order_lines(ent.get("restaurant_id"), lines, full=full)
+        return json.loads(ent.get("items_json") or "[]")
     except Exception:
-        items = []
+        return []
+
+def _entity_to_order(ent: Any, full: bool = True) -> Dict[str, Any]:
+    order_id = ent.get("RowKey")
+    items    = _entity_items(ent, full=full)
 
     return {
         "id"           : order_id,
@@ -119,14 +254,159 @@ def _entity_to_order(ent: Any) -> Dict[str, Any]:
             "distance"        : ent.get("route_distance_text"),
             "duration"        : ent.get("route_duration_text"),
             "duration_seconds": ent.get("route_duration_seconds"),
-            "polyline"        : ent.get("route_polyline"),
+            "polyline"        : ent.get("route_polyline") if full else None,
             "eta_updated_at"  : ent.get("eta_updated_at"),
         },
     }
 
+def _orders_filter(basket_id: str, restaurant_id: str) -> str:
+    filters = ["PartitionKey eq 'order'"]
+    if basket_id:
+        filters.append(f"basket_id eq '{_escape_odata_value(basket_id)}'")
+    if restaurant_id:
+        filters.append(f"restaurant_id eq '{_escape_odata_value(restaurant_id)}'")
+    return " and ".join(filters)
+
+
+def _live_scope(basket_id: str, restaurant_id: str, cursor: Optional[str]) -> Tuple[str, bool]:
+    # OrdersByRecency only once its backfill has finished; before that live orders page from Orders in
+    # table key order, and a listing started that way keeps its mode until it ends
+    indexed = f"orders-recent:{basket_id}:{restaurant_id}"
+    legacy  = f"orders:{basket_id}:{restaurant_id}"
+    if cursor:
+        for scope in (legacy, f"{legacy}:archived"):
+            try:
+                decode_cursor(cursor, scope)
+                return legacy, False
+            except ValueError:
+                pass
+        return indexed, True
+    if order_index_ready():
+        return indexed, True
+    return legacy, False
+
+
+def _live_scan(basket_id: str, restaurant_id: str, indexed: bool, cursor: Optional[str], scope: str) -> TableScan:
+    if indexed:
+        return TableScan(
+            get_table_client(TABLE_ORDERS_BY_RECENCY), cursor, query_filter=order_index_filter(basket_id, restaurant_id), scope=scope
+        )
+    return TableScan(get_table_client(TABLE_ORDERS), cursor, query_filter=_orders_filter(basket_id, restaurant_id), scope=scope)
+
+
+def _archived_offset(cursor: Optional[str], archived_scope: str) -> Optional[int]:
+    # None while the cursor still points into the live Orders table
+    if not cursor:
+        return None
+    try:
+        return max(0, int(decode_cursor(cursor, archived_scope).get("o") or 0))
+    except (TypeError, ValueError):
+        return None
+
+
+def _sorted_archived_orders(basket_id: str, restaurant_id: str) -> List[Dict[str, Any]]:
+    try:
+        archived = list_archived_orders(basket_id, restaurant_id or None)
+    except Exception:
+        archived = []
+    archived.sort(key=lambda ent: (ent.get("created_at") or ""), reverse=True)
+    return archived
+
+
+def _list_orders(
+    basket_id: str,
+    restaurant_id: str,
+    include_archived: bool,
+    limit: int,
+    cursor: Optional[str],
+) -> Tuple[List[Any], Optional[str]]:
+    # live orders page newest first through the OrdersByRecency index (one point read per order on the page),
+    # then archived ones (basket-scoped, newest first) follow on later pages
+    scope, indexed = _live_scope(basket_id, restaurant_id, cursor)
+    archived_scope = f"{scope}:archived"
+    with_archive   = include_archived and bool(basket_id)
+    offset         = _archived_offset(cursor, archived_scope) if with_archive else None
+
+    entities    : List[Any] = []
+    next_cursor : Optional[str] = None
+    if offset is None:
+        try:
+            if indexed:
+                rows, next_cursor = page_entities(
+                    get_table_client(TABLE_ORDERS_BY_RECENCY), limit, cursor,
+                    query_filter=order_index_filter(basket_id, restaurant_id), scope=scope,
+                )
+                entities = load_indexed_orders(rows)
+            else:
+                entities, next_cursor = page_entities(
+                    get_table_client(TABLE_ORDERS), limit, cursor, query_filter=_orders_filter(basket_id, restaurant_id), scope=scope
+                )
+                entities.sort(key=lambda ent: (ent.get("created_at") or ""), reverse=True)
+        except ValueError:
+            raise
+        except Exception:
+            entities, next_cursor = [], None
+        if next_cursor or not with_archive:
+            return entities, next_cursor
+        cursor = None
+
+    remaining = limit - len(entities)
+    if remaining <= 0:
+        return entities, encode_cursor({"q": archived_scope, "o": 0})
+
+    page, next_cursor = page_list(_sorted_archived_orders(basket_id, restaurant_id), remaining, cursor, scope=archived_scope)
+    return entities + page, next_cursor
+
+
+def _stream_orders(
+    basket_id: str,
+    restaurant_id: str,
+    include_archived: bool,
+    full: bool,
+    cursor: Optional[str],
+) -> func.HttpResponse:
+    # same cursors as _list_orders, so an export can switch between the two modes mid-way
+    scope, indexed = _live_scope(basket_id, restaurant_id, cursor)
+    archived_scope = f"{scope}:archived"
+    with_archive   = include_archived and bool(basket_id)
+    offset         = _archived_offset(cursor, archived_scope) if with_archive else None
+    scan           = None
+    position       : Dict[str, int] = {}
+
+    if offset is None:
+        scan = _live_scan(basket_id, restaurant_id, indexed, cursor, scope)
+
+    def records() -> Iterator[Dict[str, Any]]:
+        if scan is not None:
+            for row in scan:
+                ent = load_indexed_order(row) if indexed else row
+                if ent is not None:
+                    yield _entity_to_order(ent, full=full)
+        if not with_archive:
+            return
+        archived             = _sorted_archived_orders(basket_id, restaurant_id)
+        position["archived"] = len(archived)
+        position["offset"]   = offset or 0
+        for i in range(offset or 0, len(archived)):
+            position["offset"] = i + 1
+            yield _entity_to_order(archived[i], full=full)
+
+    def next_cursor() -> Optional[str]:
+        if "offset" in position:
+            if position["offset"] >= position["archived"]:
+                return None
+            return encode_cursor({"q": archived_scope, "o": position["offset"]})
+        live = scan.cursor() if scan is not None else None
+        if live:
+            return live
+        return encode_cursor({"q": archived_scope, "o": 0}) if with_archive else None
+
+    return ndjson_response(records(), next_cursor)
+
+
 def register_routes(app: "FunctionApp"):
     
-    @app.route(route="baskets/{basket_id}", methods=["GET", "PUT"])
+    @app.route(route="baskets/{basket_id}", methods=["GET", "PUT", "PATCH"])
     def baskets(req: func.HttpRequest) -> func.HttpResponse:
         try:
             basket_id = req.route_params.get("basket_id")
@@ -142,14 +422,50 @@ def register_routes(app: "FunctionApp"):
                 except Exception:
                     return success_response(None)
 
-                items_json = ent.get("items_json") or "[]"
+                etag = ent.metadata.get("etag")
+                return conditional_response(
+                    req,
+                    etag,
+                    lambda: success_response(
+                        {
+                            "basket_id"    : basket_id,
+                            "restaurant_id": restaurant_id,
+                            "items"        : json.loads(ent.get("items_json") or "[]"),
+                            "updated_at"   : ent.get("updated_at"),
+                            "etag"         : etag,
+                        },
+                        headers={"ETag": etag} if etag else None,
+                    ),
+                )
+
+            if req.method == "PATCH":
+                try:
+                    payload = req.get_json()
+                except ValueError:
+                    payload = None
+                if not isinstance(payload, dict):
+                    return error_response("Body must be a JSON object", 400)
+                ops = payload.get("ops")
+                if not isinstance(ops, list) or not ops:
+                    return error_response("Missing ops", 400)
+
+                result = _basket_writes.submit(
+                    (basket_id, restaurant_id),
+                    (req.headers.get("If-Match"), ops),
+                    lambda batch: _flush_basket_ops(client, basket_id, restaurant_id, batch),
+                )
+                if result["status"] != 200:
+                    return error_response(result["error"], result["status"])
+
                 return success_response(
                     {
                         "basket_id"    : basket_id,
                         "restaurant_id": restaurant_id,
-                        "items"        : json.loads(items_json),
-                        "updated_at"   : ent.get("updated_at"),
-                    }
+                        "items"        : result["items"],
+                        "updated_at"   : result["updated_at"],
+                        "etag"         : result["etag"],
+                    },
+                    headers={"ETag": result["etag"]} if result["etag"] else None,
                 )
 
             payload = req.get_json()
@@ -160,13 +476,57 @@ def register_routes(app: "FunctionApp"):
                 "updated_at": _now_iso(),
             }
 
-            client.upsert_entity(ent)
-            return success_response({"basket_id": basket_id, "restaurant_id": restaurant_id, "saved": True})
+            meta = client.upsert_entity(ent)
+            etag = (meta or {}).get("etag")
+            return success_response(
+                {"basket_id": basket_id, "restaurant_id": restaurant_id, "saved": True, "etag": etag},
+                headers={"ETag": etag} if etag else None,
+            )
         
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
     
+    @app.route(route="baskets/{basket_id}/restaurants", methods=["GET"])
+    @compressible()
+    def basket_restaurants(req: func.HttpRequest) -> func.HttpResponse:
+        try:
+            basket_id = req.route_params.get("basket_id")
+            if not basket_id:
+                return error_response("Missing basket_id", 400)
+
+            hydrate = (req.params.get("hydrate") or "").lower() in ("1", "true", "yes")
+            client  = get_table_client(TABLE_BASKETS)
+            try:
+                entities = list(client.query_entities(f"PartitionKey eq '{_escape_odata_value(basket_id)}'"))
+            except Exception:
+                entities = []
+
+            out = []
+            for ent in entities:
+                restaurant_id = ent.get("RowKey")
+                items         = json.loads(ent.get("items_json") or "[]")
+                if not items:
+                    continue
+
+                basket = {
+                    "basket_id"    : basket_id,
+                    "restaurant_id": restaurant_id,
+                    "items"        : items,
+                    "updated_at"   : ent.get("updated_at"),
+                    "etag"         : ent.metadata.get("etag"),
+                }
+                if hydrate and restaurant_id != "current":
+                    basket["restaurant"] = get_restaurant_detail_cached(restaurant_id)
+                out.append(basket)
+
+            out.sort(key=lambda b: (b.get("updated_at") or ""), reverse=True)
+            return success_response(out)
+
+        except Exception as e:
+            return error_response(f"Internal server error: {str(e)}", 500)
+    
     @app.route(route="orders", methods=["GET", "POST"])
+    @compressible()
     def orders(req: func.HttpRequest) -> func.HttpResponse:
         try:
             if req.method == "GET":
@@ -178,25 +538,25 @@ def register_routes(app: "FunctionApp"):
                     limit = 50
                 limit = max(1, min(limit, 200))
 
+                full             = (req.params.get("full") or "true").lower() in ("1", "true", "yes")
+                include_archived = (req.params.get("include_archived") or "").lower() in ("1", "true", "yes")
+
                 if not basket_id and not restaurant_id:
                     return error_response("Provide basket_id or restaurant_id", 400)
 
-                filters = ["PartitionKey eq 'order'"]
-                if basket_id:
-                    filters.append(f"basket_id eq '{_escape_odata_value(basket_id)}'")
-                if restaurant_id:
-                    filters.append(f"restaurant_id eq '{_escape_odata_value(restaurant_id)}'")
-                filter_str = " and ".join(filters)
-
-                client = get_table_client(TABLE_ORDERS)
                 try:
-                    entities = list(client.query_entities(filter_str))
-                except Exception:
-                    entities = []
+                    if wants_ndjson(req):
+                        return _stream_orders(basket_id, restaurant_id, include_archived, full, req.params.get("cursor"))
+                    entities, next_cursor = _list_orders(
+                        basket_id, restaurant_id, include_archived, limit, req.params.get("cursor")
+                    )
+                except ValueError as e:
+                    return error_response(str(e), 400)
 
-                orders_out = [_entity_to_order(ent) for ent in entities]
-                orders_out.sort(key=lambda o: (o.get("created_at") or ""), reverse=True)
-                return success_response(orders_out[:limit])
+                return success_response(
+                    [_entity_to_order(ent, full=full) for ent in entities],
+                    meta={"next_cursor": next_cursor},
+                )
 
             payload   = req.get_json()
             basket_id = (payload.get("basket_id") or "").strip()
@@ -222,28 +582,43 @@ def register_routes(app: "FunctionApp"):
             if not isinstance(items, list) or len(items) == 0:
                 return error_response("Missing items", 400)
 
+            menu_index = get_menu_index(restaurant_id)
+            if not menu_index:
+                return error_response("Menu not found", 404)
+
             subtotal         = 0.0
-            normalized_items: List[Dict[str, Any]] = []
+            unavailable      : List[Any] = []
+            normalized_items : List[Dict[str, Any]] = []
             for it in items:
                 try:
-                    price = float(it.get("price"))
-                    qty   = int(it.get("quantity", 1))
+                    qty = int(it.get("quantity", 1))
                     if qty < 1:
                         continue
-                    subtotal += price * qty
-                    normalized_items.append(
-                        {
-                            "id"         : it.get("id"),
-                            "name"       : it.get("name"),
-                            "price"      : price,
-                            "quantity"   : qty,
-                            "image"      : it.get("image"),
-                            "description": it.get("description"),
-                        }
-                    )
                 except Exception:
                     continue
 
+                item_id   = it.get("id")
+                menu_item = menu_index.get(item_id)
+                pricing   = menu_index.price_of(item_id)
+                if not menu_item or not pricing or not pricing.available:
+                    unavailable.append(item_id)
+                    continue
+
+                subtotal += pricing.price * qty
+                normalized_items.append(
+                    {
+                        "id"         : str(item_id),
+                        "name"       : menu_item.get("name"),
+                        "price"      : pricing.price,
+                        "quantity"   : qty,
+                        "image"      : menu_item.get("image"),
+                        "description": menu_item.get("description"),
+                    }
+                )
+
+            if unavailable:
+                return error_response("Some items are no longer available", 409, {"unavailable": unavailable})
+
             if not normalized_items:
                 return error_response("No valid items", 400)
 
@@ -256,6 +631,9 @@ def register_routes(app: "FunctionApp"):
 
             route = _compute_route(rest_coords, (delivery_lat, delivery_lon))
 
+            order_lines = build_order_lines(restaurant_id, normalized_items)
+            lines_props = encode_order_lines(order_lines, menu_index.version)
+
             now = _now_iso()
             ent = {
                 "PartitionKey"           : "order",
@@ -265,12 +643,13 @@ def register_routes(app: "FunctionApp"):
                 "status"                 : "PLACED",
                 "created_at"             : now,
                 "updated_at"             : now,
+                "recency_key"            : recency_key(now, order_id),
                 "delivery_address"       : delivery_address,
                 "delivery_lat"           : delivery_lat,
                 "delivery_lon"           : delivery_lon,
                 "restaurant_lat"         : rest_coords[0],
                 "restaurant_lon"         : rest_coords[1],
-                "items_json"             : json.dumps(normalized_items),
+                **lines_props,
                 "subtotal"               : round(subtotal, 2),
                 "delivery_fee"           : delivery_fee,
                 "total"                  : total,
@@ -283,6 +662,7 @@ def register_routes(app: "FunctionApp"):
 
             client = get_table_client(TABLE_ORDERS)
             client.upsert_entity(ent)
+            index_order(ent)
 
             return success_response(
                 {
@@ -314,6 +694,7 @@ def register_routes(app: "FunctionApp"):
             return error_response(f"Internal server error: {str(e)}", 500)
     
     @app.route(route="orders/{order_id}", methods=["GET"])
+    @compressible()
     def get_order(req: func.HttpRequest) -> func.HttpResponse:
         try:
             order_id = req.route_params.get("order_id")
@@ -322,11 +703,15 @@ def register_routes(app: "FunctionApp"):
 
             client = get_table_client(TABLE_ORDERS)
             try:
-                ent = client.get_entity(partition_key="order", row_key=order_id)
+                ent     = client.get_entity(partition_key="order", row_key=order_id)
+                version = ent.metadata.get("etag")
             except Exception:
-                return error_response("Order not found", 404)
+                ent = get_archived_order(order_id)
+                if not ent:
+                    return error_response("Order not found", 404)
+                version = version_digest("archived", order_id, ent.get("status"), ent.get("updated_at"))
 
-            return success_response(_entity_to_order(ent))
+            return conditional_response(req, version, lambda: success_response(_entity_to_order(ent)))
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
     
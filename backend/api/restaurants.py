@@ -1,30 +1,72 @@
+import os
+
 import azure.functions as func
-from azure.storage.blob import BlobServiceClient
 from typing import (
     TYPE_CHECKING,
     List,
     Optional,
+    Tuple,
+)
+from shared.cache import LRUCache
+from shared.cells import (
+    BASE_PRECISION,
+    is_current_row,
+    listing_version,
+    resolve_partitions,
+)
+from shared.cuisine_index import (
+    query_cuisine_near,
 )
 from shared.database import (
     get_table_client,
-    get_connection_string,
+)
+from shared.events import (
+    MenuChanged,
+    RestaurantChanged,
+    poll_events,
+    subscribe,
 )
 from shared.geo import (
     encode_geohash,
     geohash_neighbors,
+    distance_to_geohash_meters,
     haversine_distance_meters,
-    estimate_eta_minutes,
+)
+from shared.image_cache import (
+    get_image_meta,
+    read_image,
+)
+from shared.image_variants import (
+    get_variant_meta,
+    parse_variant,
 )
 from shared.menu import (
-    get_menu_from_blob,
-    get_image_url,
+    get_menu_blob_etag,
+    get_menu_from_blob_versioned,
+    get_meals_menu_versioned,
     get_banner_url,
     get_logo_url,
-    BLOB_CONTAINER_IMAGES,
+)
+from shared.pagination import (
+    page_entities,
+)
+from shared.summaries import (
+    RestaurantSummary,
+    summary_for,
 )
 from utils.response import (
     success_response,
+    success_fragments_response,
     error_response,
+    compressible,
+    conditional_response,
+    encode_json,
+    JSONFragment,
+    version_digest,
+    http_date,
+    if_range_matches,
+    is_not_modified,
+    parse_byte_range,
 )
 
 if TYPE_CHECKING:
@@ -34,6 +76,18 @@ TABLE_RESTAURANTS   = "Restaurants"
 TABLE_MENU_VERSIONS = "MenuVersions"
 TABLE_CUISINE_INDEX = "CuisineIndex"
 
+RESTAURANT_CACHE_TTL_SECONDS = float(os.environ.get("RESTAURANT_CACHE_TTL_SECONDS", "300"))
+MENU_CACHE_TTL_SECONDS       = float(os.environ.get("MENU_CACHE_TTL_SECONDS", "300"))
+
+RestaurantHit = Tuple[Optional[float], RestaurantSummary]
+
+_restaurant_details = LRUCache(maxsize=2048, ttl_seconds=RESTAURANT_CACHE_TTL_SECONDS)
+subscribe(RestaurantChanged, lambda event: _restaurant_details.invalidate(event.restaurant_id))
+
+# serialized menu bodies with the ETag of the menu blob (or the meal rows) they were built from
+_menus = LRUCache(maxsize=512, ttl_seconds=MENU_CACHE_TTL_SECONDS)
+subscribe(MenuChanged, lambda event: _menus.invalidate(event.restaurant_id))
+
 CUISINE_MAP = {
     "burgers" : "hamburguesas",
     "chinese" : "china",
@@ -52,14 +106,21 @@ CUISINE_MAP = {
 }
 
 
-def query_nearby(user_lat: float, user_lon: float, limit: int = 20, precision: int = 6) -> List[dict]:
+def query_nearby(user_lat: float, user_lon: float, limit: int = 20, precision: int = BASE_PRECISION) -> List[RestaurantHit]:
+    user      = (user_lat, user_lon)
     user_hash = encode_geohash(user_lat, user_lon, precision)
-    hashes    = geohash_neighbors(user_hash)
+    hashes    = resolve_partitions(geohash_neighbors(user_hash))
+    bounds    = {gh: distance_to_geohash_meters(user, gh) for gh in hashes}
     
     client    = get_table_client(TABLE_RESTAURANTS)
-    results   = []
+    results   : List[RestaurantHit] = []
     
-    for gh in hashes:
+    # nearest partitions first; stop once no unread partition can beat the current top `limit`
+    for gh in sorted(hashes, key=bounds.get):
+        if len(results) >= limit:
+            results.sort(key=lambda hit: hit[0])
+            if bounds[gh] > results[limit - 1][0]:
+                break
         try:
             entities = client.query_entities(f"PartitionKey eq '{gh}'")
             for ent in entities:
@@ -69,80 +130,37 @@ def query_nearby(user_lat: float, user_lon: float, limit: int = 20, precision: i
                 if lat is None or lon is None:
                     continue
                 
-                dist              = haversine_distance_meters((user_lat, user_lon), (lat, lon))
-                eta_low, eta_high = estimate_eta_minutes(dist)
-                rest_id           = ent.get("RowKey")
-                
-                results.append({
-                    "id"           : rest_id,
-                    "name"         : ent.get("name"),
-                    "unique_name"  : ent.get("unique_name"),
-                    "city"         : ent.get("city"),
-                    "address"      : ent.get("address_first_line"),
-                    "lat"          : lat,
-                    "lon"          : lon,
-                    "distance_m"   : round(dist),
-                    "eta_minutes"  : [eta_low, eta_high],
-                    "rating_star"  : ent.get("rating_star"),
-                    "rating_count" : ent.get("rating_count"),
-                    "is_delivery"  : ent.get("is_delivery"),
-                    "is_collection": ent.get("is_collection"),
-                    "logo_url"     : get_logo_url(rest_id),
-                    "banner_url"   : get_banner_url(rest_id),
-                    "cuisines"     : ent.get("cuisines"),
-                })
+                results.append((haversine_distance_meters(user, (lat, lon)), summary_for(ent)))
 
         except Exception:
             continue
     
-    results.sort(key=lambda r: r["distance_m"])
+    results.sort(key=lambda hit: hit[0])
     return results[:limit]
 
 
-def query_by_cuisine(cuisine: str, user_lat: Optional[float] = None, user_lon: Optional[float] = None, limit: int = 20) -> List[dict]:
+def query_by_cuisine(cuisine: str, user_lat: Optional[float] = None, user_lon: Optional[float] = None, limit: int = 20) -> List[RestaurantHit]:
     cuisine_key = CUISINE_MAP.get(cuisine.lower(), cuisine.lower())
     
+    if user_lat is not None and user_lon is not None:
+        return [(dist, summary_for(ent)) for dist, ent in query_cuisine_near(cuisine_key, user_lat, user_lon, limit)]
+    
     cuisine_client = get_table_client(TABLE_CUISINE_INDEX)
     rest_client    = get_table_client(TABLE_RESTAURANTS)
-    results        = []
+    results        : List[RestaurantHit] = []
     
     try:
-        entities       = cuisine_client.query_entities(f"PartitionKey eq '{cuisine_key}'")
-        restaurant_ids = [ent.get("RowKey") for ent in entities]
+        entities = cuisine_client.query_entities(f"PartitionKey eq '{cuisine_key}'")
         
-        for rest_id in restaurant_ids:
+        for index_ent in entities:
             try:
-                rest_entities = list(rest_client.query_entities(f"RowKey eq '{rest_id}'"))
+                rest_entities = list(rest_client.query_entities(f"RowKey eq '{index_ent.get('RowKey')}'"))
                 if not rest_entities:
                     continue
                 
-                ent  = rest_entities[0]
-                lat  = ent.get("lat")
-                lon  = ent.get("lon")
-                dist = None
-                eta  = None
-                
-                if user_lat is not None and user_lon is not None and lat and lon:
-                    dist      = haversine_distance_meters((user_lat, user_lon), (lat, lon))
-                    eta_low, eta_high = estimate_eta_minutes(dist)
-                    eta = [eta_low, eta_high]
-                
-                results.append({
-                    "id"          : rest_id,
-                    "name"        : ent.get("name"),
-                    "unique_name" : ent.get("unique_name"),
-                    "address"     : ent.get("address_first_line"),
-                    "lat"         : lat,
-                    "lon"         : lon,
-                    "distance_m"  : round(dist) if dist else None,
-                    "eta_minutes" : eta,
-                    "rating_star" : ent.get("rating_star"),
-                    "rating_count": ent.get("rating_count"),
-                    "is_delivery" : ent.get("is_delivery"),
-                    "logo_url"    : get_logo_url(rest_id),
-                    "banner_url"  : get_banner_url(rest_id),
-                    "cuisines"    : ent.get("cuisines"),
-                })
+                results.append((None, summary_for(rest_entities[0])))
+                if len(results) >= limit:
+                    break
             
             except Exception:
                 continue
@@ -150,10 +168,11 @@ def query_by_cuisine(cuisine: str, user_lat: Optional[float] = None, user_lon: O
     except Exception:
         pass
     
-    if user_lat is not None and user_lon is not None:
-        results.sort(key=lambda r: r["distance_m"] or float("inf"))
-    
-    return results[:limit]
+    return results
+
+
+def summaries_response(hits: List[RestaurantHit]) -> func.HttpResponse:
+    return success_fragments_response(summary.render_at(dist) for dist, summary in hits)
 
 
 def get_restaurant_detail(restaurant_id: str) -> Optional[dict]:
@@ -163,7 +182,8 @@ def get_restaurant_detail(restaurant_id: str) -> Optional[dict]:
         if not entities:
             return None
         
-        ent     = entities[0]
+        # mid-split a restaurant can be in the base cell and its child; prefer the copy scans would return
+        ent     = next((e for e in entities if is_current_row(e)), entities[0])
         rest_id = ent.get("RowKey")
         
         return {
@@ -190,85 +210,86 @@ def get_restaurant_detail(restaurant_id: str) -> Optional[dict]:
         return None
 
 
-def get_meals_menu_fallback(restaurant_id: str) -> Optional[dict]:
-    client = get_table_client("Meals")
-    try:
-        entities = list(client.query_entities(f"PartitionKey eq '{restaurant_id}'"))
-    except Exception:
-        return None
+def get_restaurant_detail_versioned(restaurant_id: str) -> Tuple[Optional[dict], Optional[str]]:
+    poll_events()
+    cached = _restaurant_details.get(restaurant_id)
+    if cached is None:
+        detail = get_restaurant_detail(restaurant_id)
+        if detail is None:
+            return None, None
+        cached = (detail, version_digest(*sorted(detail.items())))
+        _restaurant_details.set(restaurant_id, cached)
+    return cached
 
-    if not entities:
-        return None
 
-    menu_items = []
-    for ent in entities:
-        meal_id     = ent.get("RowKey")
-        filename    = ent.get("image_filename") or f"{meal_id}.jpg"
-        image_type  = ent.get("image_type") or "food"
-        menu_items.append(
-            {
-                "id"         : meal_id,
-                "name"       : ent.get("name"),
-                "description": ent.get("description"),
-                "price"      : ent.get("price"),
-                "image"      : get_image_url(image_type, filename) if filename else None,
-            }
-        )
+def get_restaurant_detail_cached(restaurant_id: str) -> Optional[dict]:
+    return get_restaurant_detail_versioned(restaurant_id)[0]
+
 
-    menu_items.sort(key=lambda i: (i.get("name") or "").lower())
-    return {
-        "phone_number"  : None,
-        "description"   : None,
-        "menu_structure": [{"category_name": "Meals", "items": menu_items}],
-    }
+def get_menu_cached(restaurant_id: str) -> Tuple[Optional[JSONFragment], Optional[str]]:
+    poll_events()
+    cached = _menus.get(restaurant_id)
+    if cached is None:
+        menu, version = get_menu_from_blob_versioned(restaurant_id)
+        if not menu:
+            menu, version = get_meals_menu_versioned(restaurant_id)
+        if not menu:
+            return None, None
+        cached = (JSONFragment(encode_json(menu)), version)
+        _menus.set(restaurant_id, cached)
+    return cached
+
+
+def get_menu_version(restaurant_id: str) -> Optional[str]:
+    # a cached body's version, else the blob's ETag from a properties call; None means the menu has to be read
+    poll_events()
+    cached = _menus.get(restaurant_id)
+    if cached is not None:
+        return cached[1]
+    return get_menu_blob_etag(restaurant_id)
+
+
+def listing_query_version(*params: object) -> str:
+    # known before querying: the request itself plus the shared listing version bumped by every restaurant write
+    return version_digest(listing_version(), *params)
 
 
 def register_routes(app: "FunctionApp"):
     
     @app.route(route="restaurants/search", methods=["GET"])
+    @compressible()
     def restaurants_search_text(req: func.HttpRequest) -> func.HttpResponse:
         try:
-            q     = req.params.get("q", "").strip().lower()
-            limit = int(req.params.get("limit", "20"))
-            
-            client  = get_table_client(TABLE_RESTAURANTS)
-            results = []
-            
+            q      = req.params.get("q", "").strip().lower()
+            limit  = max(1, min(int(req.params.get("limit", "20")), 100))
+            cursor = req.params.get("cursor")
+
+            def matches(ent) -> bool:
+                if not is_current_row(ent):
+                    return False
+                return not q or q in (ent.get("name") or "").lower() or q in (ent.get("cuisines") or "").lower()
+
+            client = get_table_client(TABLE_RESTAURANTS)
             try:
-                entities = client.list_entities()
-                for ent in entities:
-                    name     = (ent.get("name") or "").lower()
-                    cuisines = (ent.get("cuisines") or "").lower()
-                    
-                    if not q or q in name or q in cuisines:
-                        rest_id = ent.get("RowKey")
-                        results.append({
-                            "id"          : rest_id,
-                            "name"        : ent.get("name"),
-                            "unique_name" : ent.get("unique_name"),
-                            "city"        : ent.get("city"),
-                            "address"     : ent.get("address_first_line"),
-                            "lat"         : ent.get("lat"),
-                            "lon"         : ent.get("lon"),
-                            "distance_m"  : 0,
-                            "eta_minutes" : [20, 40],
-                            "rating_star" : ent.get("rating_star"),
-                            "rating_count": ent.get("rating_count"),
-                            "is_delivery" : ent.get("is_delivery"),
-                            "logo_url"    : get_logo_url(rest_id),
-                            "banner_url"  : get_banner_url(rest_id),
-                            "cuisines"    : ent.get("cuisines"),
-                        })
-                        if len(results) >= limit:
-                            break
+                entities, next_cursor = page_entities(
+                    client, limit, cursor, predicate=matches, scope=f"restaurants:{q}"
+                )
+            except ValueError:
+                raise
             except Exception:
-                pass
-                
-            return success_response(results)
+                entities, next_cursor = [], None
+
+            return success_fragments_response(
+                (summary_for(ent).render(0, [20, 40]) for ent in entities),
+                meta={"next_cursor": next_cursor},
+            )
+        except ValueError as e:
+            return error_response(str(e), 400)
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
     
     @app.route(route="restaurants/nearby", methods=["GET"])
+    @compressible()
     def nearby_restaurants(req: func.HttpRequest) -> func.HttpResponse:
         try:
             lat   = req.params.get("lat")
@@ -285,13 +306,16 @@ def register_routes(app: "FunctionApp"):
             except ValueError:
                 return error_response("Invalid parameter format", 400)
             
-            results = query_nearby(user_lat, user_lon, limit=limit_int)
-            return success_response(results)
+            version = listing_query_version("nearby", user_lat, user_lon, limit_int)
+            return conditional_response(
+                req, version, lambda: summaries_response(query_nearby(user_lat, user_lon, limit=limit_int))
+            )
         
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
     
     @app.route(route="restaurants/cuisine/{cuisine}", methods=["GET"])
+    @compressible()
     def search_restaurants(req: func.HttpRequest) -> func.HttpResponse:
         try:
             cuisine = req.route_params.get("cuisine")
@@ -306,13 +330,16 @@ def register_routes(app: "FunctionApp"):
             user_lon  = float(lon) if lon else None
             limit_int = int(limit)
             
-            results = query_by_cuisine(cuisine, user_lat, user_lon, limit=limit_int)
-            return success_response(results)
+            version = listing_query_version("cuisine", cuisine.lower(), user_lat, user_lon, limit_int)
+            return conditional_response(
+                req, version, lambda: summaries_response(query_by_cuisine(cuisine, user_lat, user_lon, limit=limit_int))
+            )
         
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
     
     @app.route(route="restaurants/{restaurant_id}", methods=["GET"])
+    @compressible()
     def restaurant_detail(req: func.HttpRequest) -> func.HttpResponse:
         try:
             restaurant_id = req.route_params.get("restaurant_id")
@@ -320,17 +347,18 @@ def register_routes(app: "FunctionApp"):
             if not restaurant_id:
                 return error_response("Missing restaurant_id", 400)
             
-            detail = get_restaurant_detail(restaurant_id)
+            detail, version = get_restaurant_detail_versioned(restaurant_id)
             
             if not detail:
                 return error_response("Restaurant not found", 404)
             
-            return success_response(detail)
+            return conditional_response(req, version, lambda: success_response(detail))
         
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
     
     @app.route(route="restaurants/{restaurant_id}/menu", methods=["GET"])
+    @compressible(cache=True)
     def restaurant_menu(req: func.HttpRequest) -> func.HttpResponse:
         try:
             restaurant_id = req.route_params.get("restaurant_id")
@@ -338,14 +366,19 @@ def register_routes(app: "FunctionApp"):
             if not restaurant_id:
                 return error_response("Missing restaurant_id", 400)
             
-            menu = get_menu_from_blob(restaurant_id)
-            if not menu:
-                menu = get_meals_menu_fallback(restaurant_id)
-
-            if not menu:
-                return error_response("Menu not found", 404)
+            def build() -> func.HttpResponse:
+                menu, _ = get_menu_cached(restaurant_id)
+                if not menu:
+                    return error_response("Menu not found", 404)
+                return success_response(menu)
+            
+            version = get_menu_version(restaurant_id)
+            if version is None:
+                menu, version = get_menu_cached(restaurant_id)
+                if not menu:
+                    return error_response("Menu not found", 404)
             
-            return success_response(menu)
+            return conditional_response(req, version, build)
         
         except Exception as e:
             return error_response(f"Internal server error: {str(e)}", 500)
@@ -359,28 +392,50 @@ def register_routes(app: "FunctionApp"):
             if not image_type or not filename:
                 return func.HttpResponse("Not found", status_code=404)
             
-            conn_str     = get_connection_string()
-            bs           = BlobServiceClient.from_connection_string(conn_str)
-            blob_path    = f"{image_type}/{filename}"
-            blob_client  = bs.get_blob_client(container=BLOB_CONTAINER_IMAGES, blob=blob_path)
-            
-            data         = blob_client.download_blob().readall()
-            
-            ext          = filename.split(".")[-1].lower()
-            content_type = {
-                "jpg"  : "image/jpeg",
-                "jpeg" : "image/jpeg",
-                "png"  : "image/png",
-                "gif"  : "image/gif",
-                "webp" : "image/webp"}.get(ext, "application/octet-stream")
-            
+            try:
+                variant = parse_variant(req.params)
+            except ValueError as e:
+                return func.HttpResponse(str(e), status_code=400)
+
+            path = f"{image_type}/{filename}"
+            meta = get_variant_meta(path, variant) if variant else get_image_meta(path)
+            if not meta:
+                return func.HttpResponse("Image not found", status_code=404)
+
+            headers = {
+                "Content-Type" : meta.content_type,
+                "Cache-Control": "public, max-age=31536000",
+                "Accept-Ranges": "bytes",
+                "ETag"         : meta.etag,
+            }
+            if meta.last_modified:
+                headers["Last-Modified"] = http_date(meta.last_modified)
+
+            if is_not_modified(req, meta.etag, meta.last_modified):
+                return func.HttpResponse(status_code=304, headers=headers)
+
+            byte_range = None
+            if if_range_matches(req.headers.get("If-Range"), meta.etag, meta.last_modified):
+                try:
+                    byte_range = parse_byte_range(req.headers.get("Range"), meta.size)
+                except ValueError:
+                    return func.HttpResponse(
+                        status_code = 416,
+                        headers     = {**headers, "Content-Range": f"bytes */{meta.size}"},
+                    )
+
+            if byte_range:
+                start, end = byte_range
+                return func.HttpResponse(
+                    read_image(meta, start, end),
+                    status_code = 206,
+                    headers     = {**headers, "Content-Range": f"bytes {start}-{end}/{meta.size}"},
+                )
+
             return func.HttpResponse(
-                data,
+                read_image(meta),
                 status_code = 200,
-                headers     = {
-                    "Content-Type" : content_type,
-                    "Cache-Control": "public, max-age=31536000",
-                }
+                headers     = headers,
             )
         
         except Exception:
@@ -0,0 +1,263 @@
+import io
+import json
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from azure.storage.blob import ContentSettings
+from benchmarks.client import RouteClient
+from shared.database import get_blob_service_client, get_table_client
+from shared.menu import BLOB_CONTAINER_IMAGES
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# a synthetic city: restaurants clustered around a few hotspots with a long tail of quieter streets,
+# seeded through the same handlers the admin tools and the frontend call
+
+CENTER   = (40.4168, -3.7038)
+CUISINES = (
+    "pizza", "burgers", "sushi", "chinese", "indian", "mexican", "italian", "thai", "kebab",
+    "vegan", "healthy", "breakfast", "desserts", "spanish", "tapas", "japanese", "korean", "peruvian",
+)
+DISHES   = ("Margherita", "Ramen", "Burrito", "Pad Thai", "Paella", "Tikka Masala", "Poke Bowl", "Cheeseburger",
+            "Gyoza", "Falafel Wrap", "Tortilla", "Croquetas", "Bibimbap", "Ceviche", "Tiramisu", "Churros")
+WORDS    = ("Casa", "Bar", "La", "El", "Cocina", "Taller", "Mercado", "Horno", "Jardin", "Barrio", "Rincon")
+
+IMPORT_CHUNK     = 500
+SPARE_HOSTS      = 20
+ORDER_STATUSES   = ("DELIVERED", "DELIVERED", "DELIVERED", "CANCELLED", "PLACED", "PREPARING")
+ARCHIVED_SHARE   = 0.5
+
+
+class City:
+    def __init__(self):
+        self.restaurants : List[Dict[str, Any]] = []
+        self.meals       : Dict[str, List[str]] = {}
+        self.baskets     : List[str] = []
+        self.orders      : List[str] = []
+        self.archived    : List[str] = []
+        self.images      : List[Tuple[str, str]] = []
+        self.hotspots    : List[Tuple[float, float]] = []
+        # rows the delete scenarios consume one per request, so they measure a real delete instead of a 404
+        self.spare_meals   : List[Tuple[str, str]] = []
+        self.spare_images  : List[Tuple[str, str]] = []
+        self.migration_job : Optional[str] = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "restaurants"   : len(self.restaurants),
+            "meals"         : sum(len(v) for v in self.meals.values()),
+            "baskets"       : len(self.baskets),
+            "orders"        : len(self.orders),
+            "orders_archived": len(self.archived),
+            "images"        : len(self.images),
+        }
+
+
+def _hotspots(rnd: random.Random, n: int) -> List[Tuple[Tuple[float, float], float, float]]:
+    # (centre, spread in degrees, weight); Zipf weights give a few dense districts and many sparse ones
+    spots = []
+    for rank in range(n):
+        dist  = abs(rnd.gauss(0, 0.04)) if rank else 0.0
+        angle = rnd.uniform(0, 2 * math.pi)
+        spots.append((
+            (CENTER[0] + dist * math.cos(angle), CENTER[1] + dist * math.sin(angle) * 1.3),
+            rnd.uniform(0.002, 0.008) * (1 + rank / n),
+            1.0 / (rank + 1) ** 1.1,
+        ))
+    return spots
+
+
+def restaurant_rows(rnd: random.Random, n: int, city: City) -> List[Dict[str, Any]]:
+    spots         = _hotspots(rnd, max(3, n // 150))
+    weights       = [w for _, _, w in spots]
+    city.hotspots = [c for c, _, _ in spots]
+
+    rows = []
+    for i in range(n):
+        if rnd.random() < 0.1:
+            lat, lon = CENTER[0] + rnd.uniform(-0.12, 0.12), CENTER[1] + rnd.uniform(-0.16, 0.16)
+        else:
+            (clat, clon), spread, _ = rnd.choices(spots, weights)[0]
+            lat, lon = rnd.gauss(clat, spread), rnd.gauss(clon, spread * 1.3)
+
+        cuisines = rnd.sample(CUISINES, rnd.choice((1, 1, 2, 2, 3)))
+        name     = f"{rnd.choice(WORDS)} {rnd.choice(DISHES)} {i}"
+        rows.append({
+            "id"                  : f"r{i:06d}",
+            "name"                : name,
+            "city"                : "Madrid",
+            "address"             : f"Calle {rnd.choice(WORDS)} {rnd.randint(1, 200)}",
+            "postal_code"         : f"280{rnd.randint(1, 54):02d}",
+            "lat"                 : round(lat, 6),
+            "lon"                 : round(lon, 6),
+            "rating_star"         : round(min(5.0, max(1.0, rnd.gauss(4.2, 0.4))), 1),
+            "rating_count"        : int(rnd.paretovariate(1.2) * 20),
+            "is_delivery"         : rnd.random() > 0.05,
+            "is_collection"       : rnd.random() > 0.6,
+            "is_open_now_delivery": rnd.random() > 0.2,
+            "cuisines"            : ",".join(cuisines),
+            "tags"                : rnd.choice(("", "", "promo", "new", "popular")),
+        })
+    return rows
+
+
+def meal_ops(rnd: random.Random, restaurant_id: str, n: int) -> List[Dict[str, Any]]:
+    ops = []
+    for i in range(n):
+        dish = rnd.choice(DISHES)
+        ops.append({
+            "op"  : "create",
+            "meal": {
+                "id"               : f"{restaurant_id}-m{i:03d}",
+                "name"             : f"{dish} {i}",
+                "description"      : f"House {dish.lower()} with {rnd.choice(DISHES).lower()} on the side. " * rnd.randint(1, 3),
+                "price"            : round(rnd.uniform(3.5, 24.0), 2),
+                "prep_time_minutes": rnd.randint(5, 40),
+                "image_filename"   : f"{restaurant_id}-m{i:03d}.jpg",
+            },
+        })
+    return ops
+
+
+def _image_bytes(rnd: random.Random, fmt: str, width: int, height: int) -> bytes:
+    if Image is None:
+        return bytes(rnd.getrandbits(8) for _ in range(width * height // 8))
+    img = Image.new("RGB", (width, height), tuple(rnd.randint(0, 255) for _ in range(3)))
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def _seed_images(rnd: random.Random, city: City, sample: int, spares: int):
+    # logos and banners for a sample of restaurants; the rest 404 like images that were never uploaded
+    container = get_blob_service_client().get_container_client(BLOB_CONTAINER_IMAGES)
+    try:
+        container.create_container()
+    except Exception:
+        pass
+
+    logo   = _image_bytes(rnd, "GIF", 96, 96)
+    banner = _image_bytes(rnd, "JPEG", 1280, 400)
+    food   = _image_bytes(rnd, "JPEG", 640, 480)
+    for rest in city.restaurants[:sample]:
+        rid = rest["id"]
+        for image_type, filename, body, content_type in (
+            ("logos", f"{rid}.gif", logo, "image/gif"),
+            ("banners", f"{rid}.jpg", banner, "image/jpeg"),
+            ("food", f"{rid}-m000.jpg", food, "image/jpeg"),
+        ):
+            container.get_blob_client(f"{image_type}/{filename}").upload_blob(
+                body, overwrite=True, content_settings=ContentSettings(content_type=content_type)
+            )
+            city.images.append((image_type, filename))
+
+    for i in range(spares):
+        filename = f"spare-{i:05d}.gif"
+        container.get_blob_client(f"food/{filename}").upload_blob(
+            logo, overwrite=True, content_settings=ContentSettings(content_type="image/gif")
+        )
+        city.spare_images.append(("food", filename))
+
+
+def _seed_spare_meals(rnd: random.Random, client: RouteClient, city: City, spares: int):
+    hosts = city.restaurants[:SPARE_HOSTS]
+    per   = -(-spares // max(1, len(hosts)))
+    for rest in hosts:
+        rid = rest["id"]
+        ops = [
+            {"op": "create", "meal": {**op["meal"], "id": f"{rid}-spare{i:04d}"}}
+            for i, op in enumerate(meal_ops(rnd, rid, per))
+        ]
+        for i in range(0, len(ops), 100):
+            client.data("POST", "manage/restaurants/{restaurant_id}/meals/batch", path={"restaurant_id": rid}, body={"ops": ops[i:i + 100]})
+        city.spare_meals.extend((rid, op["meal"]["id"]) for op in ops)
+    del city.spare_meals[spares:]
+
+
+def _order_payload(rnd: random.Random, city: City, basket_id: str) -> Dict[str, Any]:
+    rest  = rnd.choice(city.restaurants)
+    meals = city.meals[rest["id"]]
+    return {
+        "basket_id"    : basket_id,
+        "restaurant_id": rest["id"],
+        "delivery"     : {
+            "lat"    : rest["lat"] + rnd.gauss(0, 0.01),
+            "lon"    : rest["lon"] + rnd.gauss(0, 0.013),
+            "address": f"Calle {rnd.choice(WORDS)} {rnd.randint(1, 200)}",
+        },
+        "items"        : [{"id": m, "quantity": rnd.randint(1, 3)} for m in rnd.sample(meals, min(len(meals), rnd.randint(1, 4)))],
+    }
+
+
+def seed_city(
+    client: RouteClient,
+    restaurants: int = 2000,
+    meals_per_restaurant: int = 25,
+    orders: int = 2000,
+    seed: int = 7,
+    spares: int = 200,
+) -> City:
+    rnd  = random.Random(seed)
+    city = City()
+
+    rows = restaurant_rows(rnd, restaurants, city)
+    for i in range(0, len(rows), IMPORT_CHUNK):
+        body = "\n".join(json.dumps(row) for row in rows[i:i + IMPORT_CHUNK]).encode("utf-8")
+        client.data("POST", "manage/restaurants/import", params={"format": "ndjson"}, body=body)
+    city.restaurants = rows
+
+    # menu sizes are skewed too: most places have a short menu, a few have hundreds of dishes
+    for rest in rows:
+        n   = max(3, min(int(rnd.lognormvariate(math.log(meals_per_restaurant), 0.6)), 400))
+        ops = meal_ops(rnd, rest["id"], n)
+        client.data("POST", "manage/restaurants/{restaurant_id}/meals/batch", path={"restaurant_id": rest["id"]}, body={"ops": ops})
+        city.meals[rest["id"]] = [op["meal"]["id"] for op in ops]
+
+    job = client.data("POST", "manage/migrations/menus", params={"max_restaurants": "5000"})
+    while job["status"] == "running":
+        job = client.data("POST", "manage/migrations/menus", params={"job_id": job["job_id"], "max_restaurants": "5000"})
+    city.migration_job = job["job_id"]
+    _seed_spare_meals(rnd, client, city, spares)
+
+    client.data("POST", "manage/cells/rebalance", params={"max_splits": "500"})
+    # the one-off backfill a deployment runs; after it cuisine-near pages never fall back to the plain partition
+    client.data("POST", "manage/cuisine-index/rebuild")
+
+    _seed_images(rnd, city, min(len(rows), 200), spares)
+    client.data("POST", "manage/images/sync")
+
+    city.baskets = [f"basket-{i:05d}" for i in range(max(1, orders // 4))]
+    for basket_id in city.baskets[: len(city.baskets) // 2]:
+        payload = _order_payload(rnd, city, basket_id)
+        client.data(
+            "PUT", "baskets/{basket_id}",
+            path={"basket_id": basket_id},
+            params={"restaurant_id": payload["restaurant_id"]},
+            body={"items": payload["items"]},
+        )
+
+    orders_table = get_table_client("Orders")
+    now          = datetime.now(timezone.utc)
+    for _ in range(orders):
+        order  = client.data("POST", "orders", body=_order_payload(rnd, city, rnd.choice(city.baskets)))
+        status = rnd.choice(ORDER_STATUSES)
+        if status != "PLACED":
+            client.data("PUT", "orders/{order_id}/status", path={"order_id": order["id"]}, body={"status": status})
+
+        # order history: back-date half of the finished orders so the archive job has something to move
+        if status in ("DELIVERED", "CANCELLED") and rnd.random() < ARCHIVED_SHARE:
+            created = (now - timedelta(days=rnd.randint(2, 90), minutes=rnd.randint(0, 1440))).isoformat()
+            orders_table.update_entity({"PartitionKey": "order", "RowKey": order["id"], "created_at": created})
+            city.archived.append(order["id"])
+        else:
+            city.orders.append(order["id"])
+
+    client.data("POST", "manage/orders/archive", params={"min_age_days": "1", "limit": "50000"})
+    # what the backfill timer does after a deploy; until then the order list reads Orders directly
+    client.data("POST", "manage/orders/reindex")
+    return city
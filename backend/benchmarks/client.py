@@ -0,0 +1,68 @@
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import azure.functions as func
+
+# calls the registered HTTP handlers in-process, the way the Functions host would, without a host or a socket
+
+ROUND_TRIP_PHASES = ("table", "blob", "upstream")
+
+_TIMING_RE = re.compile(r'(\w+);dur=([\d.]+)(?:;desc="(\d+) calls")?')
+
+
+class RouteClient:
+    def __init__(self, app: func.FunctionApp):
+        self.handlers : Dict[Tuple[str, str], Callable[[func.HttpRequest], func.HttpResponse]] = {}
+        for fn in app.get_functions():
+            for binding in fn.get_bindings():
+                if binding.type != "httpTrigger":
+                    continue
+                for method in binding.methods or ():
+                    self.handlers[(binding.route, str(getattr(method, "value", method)).upper())] = fn.get_user_function()
+
+    def routes(self) -> List[Tuple[str, str]]:
+        return sorted(self.handlers)
+
+    def call(
+        self,
+        method: str,
+        route: str,
+        path: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, str]] = None,
+        body: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> func.HttpResponse:
+        handler = self.handlers.get((route, method))
+        if handler is None:
+            raise KeyError(f"No handler for {method} {route}")
+
+        path = path or {}
+        url  = "/api/" + re.sub(r"\{(\w+)\}", lambda m: str(path.get(m.group(1), "")), route)
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+        req = func.HttpRequest(
+            method       = method,
+            url          = url,
+            headers      = headers or {},
+            params       = params or {},
+            route_params = path,
+            body         = body or b"",
+        )
+        return handler(req)
+
+    def data(self, method: str, route: str, **kwargs: Any) -> Any:
+        # for seeding: the envelope's data, or an error naming the route
+        resp = self.call(method, route, **kwargs)
+        if resp.status_code >= 400:
+            raise RuntimeError(f"{method} {route} -> {resp.status_code}: {resp.get_body()[:300]!r}")
+        return json.loads(resp.get_body()).get("data")
+
+
+def round_trips(resp: func.HttpResponse) -> Dict[str, int]:
+    # network calls per phase as reported in Server-Timing, e.g. {"table": 3, "blob": 1}
+    out = {}
+    for phase, _, calls in _TIMING_RE.findall(resp.headers.get("Server-Timing") or ""):
+        if calls and phase in ROUND_TRIP_PHASES:
+            out[phase] = int(calls)
+    return out
@@ -0,0 +1,94 @@
+import json
+import random
+import sys
+import timeit
+from typing import Any, Callable, Dict, List
+
+from shared.models import Address, Location
+from shared.summaries import RestaurantSummary
+from utils.response import ENCODERS, JSONFragment, encode_json, success_fragments_response, success_response
+
+# Run from backend/:  python -m benchmarks.json_encoding [repeat]
+
+
+def _restaurant_entities(n: int) -> List[Dict[str, Any]]:
+    rnd = random.Random(7)
+    return [
+        {
+            "RowKey"            : f"rest-{i:05d}",
+            "name"              : f"Restaurante {i}",
+            "unique_name"       : f"restaurante-{i}",
+            "city"              : "Madrid",
+            "address_first_line": f"Calle Mayor {i}",
+            "postal_code"       : "28013",
+            "lat"               : 40.4 + rnd.random() / 10,
+            "lon"               : -3.7 + rnd.random() / 10,
+            "rating_star"       : round(3 + rnd.random() * 2, 1),
+            "rating_count"      : rnd.randint(0, 5000),
+            "is_delivery"       : True,
+            "is_collection"     : rnd.random() > 0.5,
+            "cuisines"          : "pizza,italiana",
+            "tags"              : "",
+            "updated_at"        : "2024-01-01T00:00:00+00:00",
+        }
+        for i in range(n)
+    ]
+
+
+def _menu(n: int) -> Dict[str, Any]:
+    return {
+        "phone_number"  : "+34 600 000 000",
+        "description"   : "Menu",
+        "menu_structure": [
+            {
+                "category_name": f"Category {c}",
+                "items"        : [
+                    {"id": f"{c}-{i}", "name": f"Dish {i}", "description": "x" * 80, "price": 9.5, "image": None}
+                    for i in range(n // 10)
+                ],
+            }
+            for c in range(10)
+        ],
+    }
+
+
+def _locations(n: int) -> List[Location]:
+    return [
+        Location(latitude=40.4, longitude=-3.7, display_name=f"Place {i}", address=Address(city="Madrid", road=f"Calle {i}"))
+        for i in range(n)
+    ]
+
+
+def _bench(name: str, fn: Callable[[], Any], repeat: int):
+    best = min(timeit.repeat(fn, number=1, repeat=repeat))
+    print(f"{name:<48} {best * 1000:8.3f} ms")
+
+
+def main(repeat: int = 50):
+    entities  = _restaurant_entities(500)
+    summaries = [RestaurantSummary(ent) for ent in entities]
+    listing   = [json.loads(s.render(120, [12, 15])) for s in summaries]
+    menu      = _menu(400)
+    locations = _locations(50)
+
+    print(f"encoders: {', '.join(ENCODERS)}")
+    for label, payload in (("listing x500", listing), ("menu x400", menu)):
+        _bench(f"{label}: json.dumps(default=str)", lambda: json.dumps({"success": True, "data": payload}, default=str), repeat)
+        for name, encoder in ENCODERS.items():
+            _bench(f"{label}: {name}", lambda: encoder({"success": True, "data": payload}), repeat)
+        _bench(f"{label}: success_response", lambda: success_response(payload), repeat)
+
+    _bench("listing x500: fragments (warm)", lambda: success_fragments_response(s.render(120, [12, 15]) for s in summaries), repeat)
+    _bench(
+        "listing x500: fragments (cold)",
+        lambda: success_fragments_response(RestaurantSummary(ent).render(120, [12, 15]) for ent in entities),
+        repeat,
+    )
+
+    _bench("locations x50: model_dump + json.dumps", lambda: json.dumps([l.model_dump() for l in locations], default=str), repeat)
+    _bench("locations x50: encode_json(models)", lambda: encode_json(locations), repeat)
+    _bench("locations x50: model_dump_json fragments", lambda: encode_json([JSONFragment(l.model_dump_json().encode()) for l in locations]), repeat)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
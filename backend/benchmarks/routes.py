@@ -0,0 +1,310 @@
+import os
+import tempfile
+
+# the benchmark runs offline against the local storage backend unless told otherwise
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("CACHE_EVENTS_TRANSPORT", "local")
+os.environ.setdefault("IMAGE_CACHE_DIR", tempfile.mkdtemp(prefix="foodflow-bench-images-"))
+os.environ["TELEMETRY_ENABLED"] = "1"
+os.environ["SERVER_TIMING"]     = "1"
+
+import argparse
+import json
+import logging
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import shared.local_storage as local_storage
+from benchmarks import upstreams
+from benchmarks.city import CUISINES, City, _image_bytes, meal_ops, restaurant_rows, seed_city
+from benchmarks.client import RouteClient, round_trips
+from benchmarks.upstream_sim import UpstreamSimulator
+
+# Run from backend/:  python -m benchmarks.routes [--restaurants N] [--save] [--check]
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "routes.json")
+
+Request  = Dict[str, Any]
+Scenario = Tuple[str, str, str, Callable[[random.Random, City], Request], float]
+
+
+def _near(rnd: random.Random, city: City) -> Tuple[float, float]:
+    lat, lon = rnd.choice(city.hotspots)
+    return lat + rnd.gauss(0, 0.004), lon + rnd.gauss(0, 0.005)
+
+
+def _rest(rnd: random.Random, city: City) -> Dict[str, Any]:
+    return rnd.choice(city.restaurants)
+
+
+def _meal(rnd: random.Random, city: City) -> Tuple[str, str]:
+    rest = _rest(rnd, city)
+    return rest["id"], rnd.choice(city.meals[rest["id"]])
+
+
+def _basket_item(rnd: random.Random, city: City) -> Dict[str, Any]:
+    rid, mid = _meal(rnd, city)
+    return {"id": mid, "name": mid, "price": 9.5, "restaurant_id": rid}
+
+
+def _new_meal(rnd: random.Random, city: City) -> Request:
+    rest = _rest(rnd, city)
+    meal = meal_ops(rnd, rest["id"], 1)[0]["meal"]
+    meal["id"] = f"{rest['id']}-bench-{rnd.getrandbits(32):08x}"
+    return {"path": {"restaurant_id": rest["id"]}, "body": meal}
+
+
+def _import_body(rnd: random.Random, city: City) -> Request:
+    rows = restaurant_rows(rnd, 50, City())
+    for row in rows:
+        row["id"] = f"bench-{rnd.getrandbits(32):08x}"
+    return {"params": {"format": "ndjson"}, "body": "\n".join(json.dumps(r) for r in rows).encode("utf-8")}
+
+
+def _order(rnd: random.Random, city: City) -> Request:
+    rest  = _rest(rnd, city)
+    meals = rnd.sample(city.meals[rest["id"]], min(3, len(city.meals[rest["id"]])))
+    return {
+        "body": {
+            "basket_id"    : rnd.choice(city.baskets),
+            "restaurant_id": rest["id"],
+            "delivery"     : {"lat": rest["lat"] + 0.01, "lon": rest["lon"] - 0.01, "address": "Calle Mayor 1"},
+            "items"        : [{"id": m, "quantity": 1} for m in meals],
+        }
+    }
+
+
+def _image(rnd: random.Random, city: City, **params: str) -> Request:
+    image_type, filename = rnd.choice(city.images)
+    return {"path": {"image_type": image_type, "filename": filename}, "params": params}
+
+
+def _image_upload(rnd: random.Random, city: City) -> Request:
+    # uploads go to fresh names so the seeded images the read scenarios hit stay in place
+    return {
+        "path"   : {"image_type": "food", "filename": f"bench-{rnd.getrandbits(32):08x}.gif"},
+        "headers": {"Content-Type": "image/gif"},
+        "body"   : _image_bytes(rnd, "GIF", 96, 96),
+    }
+
+
+SCENARIOS: List[Scenario] = [
+    # name, method, route, request factory, share of --iterations (admin jobs run a handful of times)
+    ("nearby",                "GET",    "restaurants/nearby",        lambda r, c: {"params": dict(zip(("lat", "lon"), map(str, _near(r, c))))}, 1),
+    ("nearby sparse",         "GET",    "restaurants/nearby",        lambda r, c: {"params": {"lat": str(40.3 + r.random() * 0.2), "lon": str(-3.85 + r.random() * 0.3)}}, 1),
+    ("cuisine near",          "GET",    "restaurants/cuisine/{cuisine}", lambda r, c: {"path": {"cuisine": r.choice(CUISINES)}, "params": dict(zip(("lat", "lon"), map(str, _near(r, c))))}, 1),
+    ("cuisine",               "GET",    "restaurants/cuisine/{cuisine}", lambda r, c: {"path": {"cuisine": r.choice(CUISINES)}}, 1),
+    ("search",                "GET",    "restaurants/search",        lambda r, c: {"params": {"q": r.choice(CUISINES)}}, 0.5),
+    ("detail",                "GET",    "restaurants/{restaurant_id}", lambda r, c: {"path": {"restaurant_id": _rest(r, c)["id"]}}, 1),
+    ("menu",                  "GET",    "restaurants/{restaurant_id}/menu", lambda r, c: {"path": {"restaurant_id": _rest(r, c)["id"]}}, 1),
+    ("image",                 "GET",    "images/{image_type}/{filename}", lambda r, c: _image(r, c), 1),
+    ("image variant",         "GET",    "images/{image_type}/{filename}", lambda r, c: _image(r, c, w="320", fmt="webp"), 0.5),
+    ("image range",           "GET",    "images/{image_type}/{filename}", lambda r, c: {**_image(r, c), "headers": {"Range": "bytes=0-1023"}}, 0.5),
+    ("basket get",            "GET",    "baskets/{basket_id}",       lambda r, c: {"path": {"basket_id": r.choice(c.baskets)}}, 1),
+    ("basket put",            "PUT",    "baskets/{basket_id}",       lambda r, c: {"path": {"basket_id": r.choice(c.baskets)}, "body": {"items": [_basket_item(r, c)]}}, 1),
+    ("basket patch",          "PATCH",  "baskets/{basket_id}",       lambda r, c: {"path": {"basket_id": r.choice(c.baskets)}, "body": {"ops": [{"op": "add", "item": _basket_item(r, c)}]}}, 1),
+    ("basket restaurants",    "GET",    "baskets/{basket_id}/restaurants", lambda r, c: {"path": {"basket_id": r.choice(c.baskets)}, "params": {"hydrate": "1"}}, 1),
+    ("orders by basket",      "GET",    "orders",                    lambda r, c: {"params": {"basket_id": r.choice(c.baskets)}}, 1),
+    ("orders by restaurant",  "GET",    "orders",                    lambda r, c: {"params": {"restaurant_id": _rest(r, c)["id"], "limit": "20"}}, 0.5),
+    ("orders with archive",   "GET",    "orders",                    lambda r, c: {"params": {"basket_id": r.choice(c.baskets), "include_archived": "1"}}, 0.5),
+    ("orders ndjson",         "GET",    "orders",                    lambda r, c: {"params": {"basket_id": r.choice(c.baskets), "format": "ndjson"}}, 0.5),
+    ("order create",          "POST",   "orders",                    _order, 1),
+    ("order get",             "GET",    "orders/{order_id}",         lambda r, c: {"path": {"order_id": r.choice(c.orders)}}, 1),
+    ("order get archived",    "GET",    "orders/{order_id}",         lambda r, c: {"path": {"order_id": r.choice(c.archived or c.orders)}}, 0.5),
+    ("order status",          "PUT",    "orders/{order_id}/status",  lambda r, c: {"path": {"order_id": r.choice(c.orders)}, "body": {"status": "PREPARING"}}, 1),
+    ("order refresh eta",     "POST",   "orders/{order_id}/refresh-eta", lambda r, c: {"path": {"order_id": r.choice(c.orders)}}, 1),
+    ("manage list",           "GET",    "manage/restaurants",        lambda r, c: {"params": {"limit": "100"}}, 0.5),
+    ("manage list q",         "GET",    "manage/restaurants",        lambda r, c: {"params": {"q": r.choice(CUISINES), "limit": "100"}}, 0.2),
+    ("manage list ndjson",    "GET",    "manage/restaurants",        lambda r, c: {"params": {"format": "ndjson"}}, 0.1),
+    ("manage create",         "POST",   "manage/restaurants",        lambda r, c: {"body": {**restaurant_rows(r, 1, City())[0], "id": f"bench-{r.getrandbits(32):08x}"}}, 0.5),
+    ("manage import x50",     "POST",   "manage/restaurants/import", _import_body, 0.1),
+    ("meals list",            "GET",    "manage/restaurants/{restaurant_id}/meals", lambda r, c: {"path": {"restaurant_id": _rest(r, c)["id"]}}, 1),
+    ("meal create",           "POST",   "manage/restaurants/{restaurant_id}/meals", _new_meal, 0.5),
+    ("meal batch x20",        "POST",   "manage/restaurants/{restaurant_id}/meals/batch", lambda r, c: (lambda rid: {"path": {"restaurant_id": rid}, "body": {"ops": meal_ops(r, rid, 20)}})(_rest(r, c)["id"]), 0.2),
+    ("meal update",           "PUT",    "manage/restaurants/{restaurant_id}/meals/{meal_id}", lambda r, c: (lambda rm: {"path": {"restaurant_id": rm[0], "meal_id": rm[1]}, "body": {"price": round(r.uniform(4, 20), 2)}})(_meal(r, c)), 0.5),
+    ("meal delete",           "DELETE", "manage/restaurants/{restaurant_id}/meals/{meal_id}", lambda r, c: (lambda rm: {"path": {"restaurant_id": rm[0], "meal_id": rm[1]}})(c.spare_meals.pop()), 0.5),
+    ("meal search",           "GET",    "meals/search",              lambda r, c: {"params": {"q": r.choice(("ramen", "paella", "burrito", "gyoza"))}}, 0.5),
+    ("image search",          "GET",    "images/search",             lambda r, c: {"params": {"q": r.choice(("r0000", "m000", "r00012")), "type": "food"}}, 1),
+    ("image upload",          "PUT",    "manage/images/{image_type}/{filename}", _image_upload, 0.2),
+    ("image delete",          "DELETE", "manage/images/{image_type}/{filename}", lambda r, c: (lambda img: {"path": {"image_type": img[0], "filename": img[1]}})(c.spare_images.pop()), 0.2),
+    ("image sync",            "POST",   "manage/images/sync",        lambda r, c: {}, 0.05),
+    ("menu migration",        "POST",   "manage/migrations/menus",   lambda r, c: {"params": {"max_restaurants": "50"}}, 0.05),
+    ("menu migration status", "GET",    "manage/migrations/menus/{job_id}", lambda r, c: {"path": {"job_id": c.migration_job}}, 0.5),
+    ("order archive",         "POST",   "manage/orders/archive",     lambda r, c: {"params": {"min_age_days": "1"}}, 0.05),
+    ("order reindex",         "POST",   "manage/orders/reindex",     lambda r, c: {}, 0.05),
+    ("cuisine rebuild",       "POST",   "manage/cuisine-index/rebuild", lambda r, c: {}, 0.05),
+    ("cell rebalance",        "POST",   "manage/cells/rebalance",    lambda r, c: {}, 0.05),
+    ("geocode reverse",       "GET",    "geocoding/reverse",         lambda r, c: {"params": dict(zip(("lat", "lon"), map(str, _near(r, c))))}, 1),
+    ("geocode search",        "GET",    "geocoding/search",          lambda r, c: {"params": {"q": f"Calle Mayor {r.randint(1, 500)}"}}, 1),
+    ("geocode autocomplete",  "GET",    "geocoding/autocomplete",    lambda r, c: {"params": {"q": r.choice(("gran", "calle m", "paseo", "plaza")), "at": "40.4168,-3.7038"}}, 1),
+    ("geocode route",         "GET",    "geocoding/route",           lambda r, c: (lambda a, b: {"params": {"from_lat": str(a[0]), "from_lon": str(a[1]), "to_lat": str(b[0]), "to_lon": str(b[1])}})(_near(r, c), _near(r, c)), 1),
+    ("metrics",               "GET",    "internal/metrics",          lambda r, c: {}, 0.1),
+]
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def run_scenario(client: RouteClient, city: City, scenario: Scenario, iterations: int, concurrency: int, seed: int) -> Dict[str, Any]:
+    name, method, route, factory, share = scenario
+    count    = max(1, int(round(iterations * share)))
+    rnd      = random.Random(f"{seed}:{name}")
+    requests = [factory(rnd, city) for _ in range(count)]
+
+    def one(kwargs: Request) -> Tuple[float, int, Dict[str, int]]:
+        start = time.perf_counter()
+        resp  = client.call(method, route, **kwargs)
+        return time.perf_counter() - start, resp.status_code, round_trips(resp)
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, requests))
+    else:
+        results = [one(kwargs) for kwargs in requests]
+    wall = time.perf_counter() - started
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    statuses  : Dict[str, int] = {}
+    trips     : Dict[str, float] = {}
+    for _, status, phases in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        for phase, calls in phases.items():
+            trips[phase] = trips.get(phase, 0) + calls
+
+    return {
+        "requests"   : count,
+        "rps"        : round(count / wall, 1) if wall else 0.0,
+        "p50_ms"     : round(_percentile(latencies, 50), 3),
+        "p95_ms"     : round(_percentile(latencies, 95), 3),
+        "p99_ms"     : round(_percentile(latencies, 99), 3),
+        "round_trips": {phase: round(total / count, 2) for phase, total in sorted(trips.items())},
+        "statuses"   : dict(sorted(statuses.items())),
+    }
+
+
+def _trips_text(trips: Dict[str, float]) -> str:
+    return " ".join(f"{phase}={calls:g}" for phase, calls in trips.items()) or "-"
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    # round trips are deterministic for a given seed and city, so any increase is a regression;
+    # latency is only flagged past the tolerance because it moves with the machine
+    regressions = []
+    same_config = baseline.get("config") == results["config"]
+    if not same_config:
+        print("note: baseline was recorded with a different configuration; latency and round-trip diffs are not comparable")
+
+    print(f"\n{'scenario':<24} {'p95 ms':>10} {'baseline':>10} {'diff':>8}  round trips")
+    for name, cur in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if old is None:
+            print(f"{name:<24} {cur['p95_ms']:>10.2f} {'-':>10} {'new':>8}  {_trips_text(cur['round_trips'])}")
+            continue
+        diff  = (cur["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0.0
+        trips = []
+        for phase in sorted(set(cur["round_trips"]) | set(old["round_trips"])):
+            a, b = old["round_trips"].get(phase, 0), cur["round_trips"].get(phase, 0)
+            trips.append(f"{phase}={b:g}" + (f" (was {a:g})" if a != b else ""))
+            if b > a and same_config:
+                regressions.append(f"{name}: {phase} round trips {a:g} -> {b:g}")
+        if diff > tolerance * 100 and same_config:
+            regressions.append(f"{name}: p95 {old['p95_ms']:.2f} ms -> {cur['p95_ms']:.2f} ms")
+        print(f"{name:<24} {cur['p95_ms']:>10.2f} {old['p95_ms']:>10.2f} {diff:>+7.1f}%  {' '.join(trips) or '-'}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end route benchmarks against a synthetic city.")
+    parser.add_argument("--restaurants", type=int, default=2000)
+    parser.add_argument("--meals", type=int, default=25, help="median meals per restaurant")
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=200, help="requests per scenario before its share is applied")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--table-latency-ms", type=float, default=0.0)
+    parser.add_argument("--blob-latency-ms", type=float, default=0.0)
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0)
+    parser.add_argument("--upstream-sim", action="store_true", help="send geocoding calls to the upstream simulator instead of the in-process stubs")
+    parser.add_argument("--only", help="run scenarios whose name contains this text")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 when the results regress against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative p95 growth with --check")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+
+    # the simulator's realistic latency, errors and throttling; the stubs answer instantly unless told otherwise
+    sim = None
+    if args.upstream_sim:
+        sim = UpstreamSimulator().start()
+        os.environ.update(sim.urls())
+
+    import function_app
+
+    client = RouteClient(function_app.app)
+    if sim is None:
+        upstreams.install(args.upstream_latency_ms)
+
+    covered = {(route, method) for _, method, route, _, _ in SCENARIOS}
+    for route, method in client.routes():
+        if (route, method) not in covered:
+            print(f"warning: no scenario for {method} {route}")
+
+    # seeding runs without injected latency; only the measured requests pay for round trips
+    started = time.perf_counter()
+    # every scenario runs at most --iterations requests, which bounds what the delete scenarios consume
+    city    = seed_city(client, args.restaurants, args.meals, args.orders, args.seed, spares=args.iterations)
+    print(f"seeded {city.stats()} in {time.perf_counter() - started:.1f}s")
+
+    local_storage.STORAGE_TABLE_LATENCY_MS = args.table_latency_ms
+    local_storage.STORAGE_BLOB_LATENCY_MS  = args.blob_latency_ms
+
+    config  = {k: getattr(args, k) for k in ("restaurants", "meals", "orders", "iterations", "concurrency", "seed",
+                                            "table_latency_ms", "blob_latency_ms", "upstream_latency_ms")}
+    config["storage_backend"] = os.environ["STORAGE_BACKEND"]
+    config["upstreams"]       = "sim" if sim else "stub"
+    results = {"config": config, "scenarios": {}}
+
+    print(f"\n{'scenario':<24} {'n':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  round trips / request   statuses")
+    for scenario in SCENARIOS:
+        if args.only and args.only not in scenario[0]:
+            continue
+        res = run_scenario(client, city, scenario, args.iterations, args.concurrency, args.seed)
+        results["scenarios"][scenario[0]] = res
+        print(
+            f"{scenario[0]:<24} {res['requests']:>5} {res['rps']:>9.1f} {res['p50_ms']:>9.2f} {res['p95_ms']:>9.2f} "
+            f"{res['p99_ms']:>9.2f}  {_trips_text(res['round_trips']):<24} {res['statuses']}"
+        )
+
+    if sim is not None:
+        print(f"\nupstream simulator: {sim.stats}")
+        sim.stop()
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        for line in regressions:
+            print(f"regression: {line}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        print(f"\nbaseline written to {args.baseline}")
+
+    return 1 if args.check and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+from benchmarks.upstreams import respond
+
+# a local stand-in for Nominatim, HERE autosuggest and Google Routes with tunable latency, errors and rate limits.
+# Run from backend/:  python -m benchmarks.upstream_sim --port 8089 --latency nominatim=120:900 --error-rate here=0.02
+# then start the app with NOMINATIM_URL=http://127.0.0.1:8089/nominatim, HERE_AUTOSUGGEST_URL=http://127.0.0.1:8089/here/v1/autosuggest
+# and GOOGLE_ROUTES_URL=http://127.0.0.1:8089/google/directions/v2:computeRoutes
+
+SERVICES = ("nominatim", "here", "google")
+
+# medians and tails roughly as seen from a European region; Nominatim's usage policy allows one request per second
+DEFAULT_PROFILES: Dict[str, Dict[str, float]] = {
+    "nominatim": {"median_ms": 120.0, "p99_ms": 900.0, "error_rate": 0.002, "rps": 1.0, "burst": 2.0},
+    "here"     : {"median_ms": 60.0, "p99_ms": 250.0, "error_rate": 0.001, "rps": 20.0, "burst": 40.0},
+    "google"   : {"median_ms": 180.0, "p99_ms": 700.0, "error_rate": 0.001, "rps": 50.0, "burst": 100.0},
+}
+
+_Z99 = 2.326
+
+
+class Profile:
+    def __init__(self, median_ms: float, p99_ms: float, error_rate: float, rps: float, burst: float):
+        self.median_ms  = median_ms
+        self.p99_ms     = max(p99_ms, median_ms)
+        self.error_rate = error_rate
+        self.rps        = rps
+        self.burst      = max(burst, 1.0)
+        self._tokens    = self.burst
+        self._refill_at = time.monotonic()
+        self._lock      = threading.Lock()
+
+    def delay(self, rnd: random.Random) -> float:
+        # log-normal with the given median and 99th percentile: a long right tail like real upstreams
+        if self.median_ms <= 0:
+            return 0.0
+        sigma = math.log(self.p99_ms / self.median_ms) / _Z99
+        return rnd.lognormvariate(math.log(self.median_ms), sigma) / 1000.0
+
+    def admit(self) -> Optional[float]:
+        # token bucket; returns the Retry-After seconds when the caller is over its rate
+        if self.rps <= 0:
+            return None
+        with self._lock:
+            now             = time.monotonic()
+            self._tokens    = min(self.burst, self._tokens + (now - self._refill_at) * self.rps)
+            self._refill_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return None
+            return (1 - self._tokens) / self.rps
+
+    def to_json(self) -> Dict[str, float]:
+        return {"median_ms": self.median_ms, "p99_ms": self.p99_ms, "error_rate": self.error_rate, "rps": self.rps, "burst": self.burst}
+
+
+class UpstreamSimulator:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, profiles: Optional[Dict[str, Dict[str, float]]] = None, seed: int = 7):
+        self.profiles : Dict[str, Profile] = {}
+        self.stats    : Dict[str, Dict[str, int]] = {name: {"served": 0, "throttled": 0, "errors": 0} for name in SERVICES}
+        self._rnd     = random.Random(seed)
+        self._lock    = threading.Lock()
+        self.configure(DEFAULT_PROFILES)
+        if profiles:
+            self.configure(profiles)
+
+        sim = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: Any):
+                pass
+
+            def do_GET(self):
+                sim._handle(self, "GET")
+
+            def do_POST(self):
+                sim._handle(self, "POST")
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def urls(self) -> Dict[str, str]:
+        # the environment the app needs to talk to this simulator
+        return {
+            "NOMINATIM_URL"       : f"{self.base_url}/nominatim",
+            "HERE_AUTOSUGGEST_URL": f"{self.base_url}/here/v1/autosuggest",
+            "GOOGLE_ROUTES_URL"   : f"{self.base_url}/google/directions/v2:computeRoutes",
+        }
+
+    def configure(self, profiles: Dict[str, Dict[str, float]]):
+        with self._lock:
+            for name, values in profiles.items():
+                if name not in SERVICES:
+                    raise ValueError(f"Unknown upstream '{name}'")
+                current = self.profiles[name].to_json() if name in self.profiles else DEFAULT_PROFILES[name]
+                self.profiles[name] = Profile(**{**current, **{k: float(v) for k, v in values.items()}})
+
+    def start(self) -> "UpstreamSimulator":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="upstream-sim", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _count(self, service: str, key: str):
+        with self._lock:
+            self.stats[service][key] += 1
+
+    def _handle(self, handler: BaseHTTPRequestHandler, method: str):
+        parsed  = urlparse(handler.path)
+        length  = int(handler.headers.get("Content-Length") or 0)
+        raw     = handler.rfile.read(length) if length else b""
+        service = parsed.path.strip("/").split("/", 1)[0]
+
+        if parsed.path == "/_sim/stats" and method == "GET":
+            with self._lock:
+                body = {"stats": self.stats, "profiles": {k: p.to_json() for k, p in self.profiles.items()}}
+            return self._send(handler, 200, body)
+        if parsed.path == "/_sim/profiles" and method == "POST":
+            try:
+                self.configure(json.loads(raw or b"{}"))
+            except (TypeError, ValueError) as e:
+                return self._send(handler, 400, {"error": str(e)})
+            return self._send(handler, 200, {k: p.to_json() for k, p in self.profiles.items()})
+
+        profile = self.profiles.get(service)
+        if profile is None:
+            return self._send(handler, 404, {"error": "Unknown upstream"})
+
+        retry_after = profile.admit()
+        if retry_after is not None:
+            self._count(service, "throttled")
+            return self._send(handler, 429, {"error": "Too Many Requests"}, {"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+        with self._lock:
+            delay  = profile.delay(self._rnd)
+            failed = self._rnd.random() < profile.error_rate
+        time.sleep(delay)
+
+        if failed:
+            self._count(service, "errors")
+            return self._send(handler, self._rnd.choice((500, 502, 503)), {"error": "Upstream unavailable"})
+
+        try:
+            body = json.loads(raw) if raw else None
+        except ValueError:
+            return self._send(handler, 400, {"error": "Invalid JSON body"})
+        status, payload = respond(method, parsed.path, dict(parse_qsl(parsed.query)), body)
+        self._count(service, "served")
+        self._send(handler, status, payload)
+
+    def _send(self, handler: BaseHTTPRequestHandler, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+def _parse_settings(values: List[str], keys: Tuple[str, ...]) -> Dict[str, Dict[str, float]]:
+    # "nominatim=120:900" -> {"nominatim": {"median_ms": 120, "p99_ms": 900}}
+    out: Dict[str, Dict[str, float]] = {}
+    for value in values or ():
+        name, _, spec = value.partition("=")
+        if not spec:
+            raise argparse.ArgumentTypeError(f"Expected SERVICE=VALUE, got {value!r}")
+        targets = SERVICES if name == "all" else (name,)
+        for target in targets:
+            for key, raw in zip(keys, spec.split(":")):
+                out.setdefault(target, {})[key] = float(raw)
+    return out
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Simulated Nominatim, HERE autosuggest and Google Routes upstreams.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--latency", action="append", help="SERVICE=MEDIAN_MS[:P99_MS], SERVICE is nominatim, here, google or all")
+    parser.add_argument("--error-rate", action="append", help="SERVICE=FRACTION of requests answered with a 5xx")
+    parser.add_argument("--rate-limit", action="append", help="SERVICE=RPS[:BURST]; 0 disables throttling")
+    args = parser.parse_args(argv)
+
+    profiles: Dict[str, Dict[str, float]] = {}
+    for values, keys in ((args.latency, ("median_ms", "p99_ms")), (args.error_rate, ("error_rate",)), (args.rate_limit, ("rps", "burst"))):
+        for name, settings in _parse_settings(values, keys).items():
+            profiles.setdefault(name, {}).update(settings)
+
+    sim = UpstreamSimulator(args.host, args.port, profiles, args.seed)
+    for name, url in sim.urls().items():
+        print(f"{name}={url}")
+    print(json.dumps({k: p.to_json() for k, p in sim.profiles.items()}, indent=2))
+    try:
+        sim.server.serve_forever()
+    except KeyboardInterrupt:
+        sim.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import math
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+# realistic stand-ins for the Nominatim, HERE autosuggest and Google Routes responses the geocoding module parses
+
+ROADS  = ("Calle Mayor", "Gran Via", "Calle de Alcala", "Paseo del Prado", "Calle de Atocha", "Calle de Serrano", "Calle de Toledo")
+HOODS  = ("Sol", "Malasana", "Chueca", "Lavapies", "Salamanca", "Retiro", "Chamberi", "La Latina")
+STEPS  = ("Head north", "Turn right", "Turn left", "Continue straight", "Keep left", "Keep right", "Slight right")
+MOVES  = ("DEPART", "TURN_RIGHT", "TURN_LEFT", "STRAIGHT", "FORK_LEFT", "FORK_RIGHT", "TURN_SLIGHT_RIGHT")
+
+
+def _rng(*parts: Any) -> random.Random:
+    # the same query always gets the same answer, like a real upstream
+    seed = hashlib.blake2b("|".join(str(p) for p in parts).encode("utf-8"), digest_size=8).digest()
+    return random.Random(int.from_bytes(seed, "big"))
+
+
+def _address(rnd: random.Random) -> Dict[str, str]:
+    return {
+        "house_number" : str(rnd.randint(1, 180)),
+        "road"         : rnd.choice(ROADS),
+        "neighbourhood": rnd.choice(HOODS),
+        "suburb"       : "Centro",
+        "city"         : "Madrid",
+        "state"        : "Comunidad de Madrid",
+        "postcode"     : f"280{rnd.randint(1, 54):02d}",
+        "country"      : "Spain",
+        "country_code" : "es",
+    }
+
+
+def _display_name(addr: Dict[str, str]) -> str:
+    return ", ".join([addr["house_number"], addr["road"], addr["neighbourhood"], addr["city"], addr["postcode"], addr["country"]])
+
+
+def nominatim_reverse(lat: float, lon: float) -> Dict[str, Any]:
+    rnd  = _rng("reverse", round(lat, 5), round(lon, 5))
+    addr = _address(rnd)
+    return {
+        "place_id"    : rnd.randint(10 ** 7, 10 ** 9),
+        "licence"     : "Data (c) OpenStreetMap contributors, ODbL 1.0. https://osm.org/copyright",
+        "osm_type"    : "way",
+        "lat"         : f"{lat + rnd.uniform(-0.0002, 0.0002):.7f}",
+        "lon"         : f"{lon + rnd.uniform(-0.0002, 0.0002):.7f}",
+        "display_name": _display_name(addr),
+        "address"     : addr,
+        "boundingbox" : [f"{lat - 0.0005:.7f}", f"{lat + 0.0005:.7f}", f"{lon - 0.0005:.7f}", f"{lon + 0.0005:.7f}"],
+    }
+
+
+def nominatim_search(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    rnd = _rng("search", query.lower())
+    out = []
+    for _ in range(rnd.randint(1, limit)):
+        lat  = 40.4168 + rnd.gauss(0, 0.03)
+        lon  = -3.7038 + rnd.gauss(0, 0.04)
+        addr = _address(rnd)
+        out.append({
+            "place_id"    : rnd.randint(10 ** 7, 10 ** 9),
+            "lat"         : f"{lat:.7f}",
+            "lon"         : f"{lon:.7f}",
+            "display_name": _display_name(addr),
+            "class"       : "place",
+            "type"        : "house",
+            "importance"  : round(rnd.random(), 4),
+            "address"     : addr,
+        })
+    return out
+
+
+def here_autosuggest(query: str, at: str, limit: int = 5) -> Dict[str, Any]:
+    rnd = _rng("autosuggest", query.lower(), at)
+    try:
+        lat, lon = (float(v) for v in at.split(","))
+    except ValueError:
+        lat, lon = 40.42024, -3.68755
+
+    items = []
+    for i in range(limit):
+        addr = _address(rnd)
+        items.append({
+            "title"     : f"{query.title()} {addr['road']}" if i else query.title(),
+            "id"        : f"here:af:street:{rnd.getrandbits(64):x}",
+            "resultType": rnd.choice(("street", "houseNumber", "place", "locality")),
+            "address"   : {"label": _display_name(addr)},
+            "position"  : {"lat": round(lat + rnd.gauss(0, 0.02), 5), "lng": round(lon + rnd.gauss(0, 0.02), 5)},
+            "distance"  : rnd.randint(50, 15000),
+        })
+    return {"items": items}
+
+
+def encode_polyline(points: List[Tuple[float, float]]) -> str:
+    # Google's encoded polyline format, precision 5
+    out       = []
+    prev_lat  = 0
+    prev_lon  = 0
+    for lat, lon in points:
+        ilat, ilon = int(round(lat * 1e5)), int(round(lon * 1e5))
+        for delta in (ilat - prev_lat, ilon - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev_lat, prev_lon = ilat, ilon
+    return "".join(out)
+
+
+def _distance_m(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    dlat = math.radians(b[0] - a[0])
+    dlon = math.radians(b[1] - a[1])
+    h    = math.sin(dlat / 2) ** 2 + math.cos(math.radians(a[0])) * math.cos(math.radians(b[0])) * math.sin(dlon / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(h))
+
+
+def _km_text(meters: float) -> str:
+    return f"{meters / 1000:.1f} km" if meters >= 1000 else f"{int(meters)} m"
+
+
+def _min_text(seconds: float) -> str:
+    return f"{max(1, int(round(seconds / 60)))} min"
+
+
+def google_routes(origin: Tuple[float, float], destination: Tuple[float, float]) -> Dict[str, Any]:
+    rnd    = _rng("route", origin, destination)
+    # streets are not straight lines: a jittered walk with a few hundred vertices per route
+    n      = max(8, int(_distance_m(origin, destination) / 25))
+    points = [origin]
+    for i in range(1, n):
+        t = i / n
+        points.append((
+            origin[0] + (destination[0] - origin[0]) * t + rnd.gauss(0, 0.0003),
+            origin[1] + (destination[1] - origin[1]) * t + rnd.gauss(0, 0.0003),
+        ))
+    points.append(destination)
+
+    meters  = sum(_distance_m(a, b) for a, b in zip(points, points[1:]))
+    seconds = meters / rnd.uniform(5.5, 9.5)
+    steps   = []
+    for i in range(rnd.randint(4, 12)):
+        share = meters / 8 * rnd.uniform(0.3, 1.7)
+        steps.append({
+            "distanceMeters"       : int(share),
+            "staticDuration"       : f"{int(share / 7)}s",
+            "navigationInstruction": {"maneuver": MOVES[i % len(MOVES)], "instructions": f"{STEPS[i % len(STEPS)]} onto {rnd.choice(ROADS)}"},
+            "localizedValues"      : {"distance": {"text": _km_text(share)}, "staticDuration": {"text": _min_text(share / 7)}},
+        })
+
+    return {
+        "routes": [{
+            "distanceMeters" : int(meters),
+            "duration"       : f"{int(seconds)}s",
+            "polyline"       : {"encodedPolyline": encode_polyline(points)},
+            "legs"           : [{"distanceMeters": int(meters), "duration": f"{int(seconds)}s", "steps": steps}],
+            "localizedValues": {"distance": {"text": _km_text(meters)}, "duration": {"text": _min_text(seconds)}},
+        }]
+    }
+
+
+def respond(method: str, url: str, params: Optional[Dict[str, Any]] = None, body: Optional[Dict[str, Any]] = None) -> Tuple[int, Any]:
+    # (status, payload) for one upstream call, routed on the request path like the real services
+    params = params or {}
+    path   = urlparse(url).path
+    if path.endswith("/reverse"):
+        return 200, nominatim_reverse(float(params["lat"]), float(params["lon"]))
+    if path.endswith("/search"):
+        return 200, nominatim_search(str(params.get("q") or ""), int(params.get("limit") or 5))
+    if path.endswith("/autosuggest"):
+        return 200, here_autosuggest(str(params.get("q") or ""), str(params.get("at") or ""), int(params.get("limit") or 5))
+    if path.endswith("computeRoutes") and method == "POST":
+        try:
+            o = body["origin"]["location"]["latLng"]
+            d = body["destination"]["location"]["latLng"]
+            return 200, google_routes((float(o["latitude"]), float(o["longitude"])), (float(d["latitude"]), float(d["longitude"])))
+        except (KeyError, TypeError, ValueError):
+            return 400, {"error": {"code": 400, "message": "Invalid origin or destination", "status": "INVALID_ARGUMENT"}}
+    return 404, {"error": "Not found"}
+
+
+def _response(url: str, status: int, payload: Any) -> requests.Response:
+    resp             = requests.Response()
+    resp.status_code = status
+    resp.url         = url
+    resp._content    = json.dumps(payload).encode("utf-8")
+    resp.headers["Content-Type"] = "application/json"
+    return resp
+
+
+class StubUpstreams:
+    # stands in for the requests module inside api.geocoding; latency_ms models the upstream round trip
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.calls      = 0
+
+    def _call(self, method: str, url: str, params: Optional[Dict[str, Any]], body: Optional[Dict[str, Any]]) -> requests.Response:
+        self.calls += 1
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+        status, payload = respond(method, url, params, body)
+        return _response(url, status, payload)
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs: Any) -> requests.Response:
+        return self._call("GET", url, params, None)
+
+    def post(self, url: str, json: Optional[Dict[str, Any]] = None, **kwargs: Any) -> requests.Response:
+        return self._call("POST", url, None, json)
+
+    def __getattr__(self, name: str) -> Any:
+        # exceptions and everything else still come from requests
+        return getattr(requests, name)
+
+
+def install(latency_ms: float = 0.0) -> StubUpstreams:
+    import api.geocoding
+
+    stub = StubUpstreams(latency_ms)
+    api.geocoding.requests = stub
+    return stub
@@ -1,9 +1,11 @@
 import azure.functions as func
-from api import geocoding, management, orders, restaurants
+from api import geocoding, internal, management, orders, restaurants
+from shared.telemetry import TimedFunctionApp
 
-app = func.FunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
+app = TimedFunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
 
 geocoding.register_routes(app)
 restaurants.register_routes(app)
 management.register_routes(app)
-orders.register_routes(app)
\ No newline at end of file
+orders.register_routes(app)
+internal.register_routes(app)
@@ -0,0 +1,255 @@
+import base64
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from shared.cache import LRUCache
+from shared.database import get_blob_service_client, get_table_client
+from shared.order_index import unindex_orders
+
+TABLE_ORDERS             = "Orders"
+TABLE_ORDERS_ARCHIVE     = "OrdersArchive"
+BLOB_CONTAINER_ARCHIVE   = "orders-archive"
+
+ORDER_ARCHIVE_MIN_AGE_DAYS = int(os.environ.get("ORDER_ARCHIVE_MIN_AGE_DAYS", "30"))
+ORDER_ARCHIVE_STATUSES     = {
+    s.strip().upper()
+    for s in os.environ.get("ORDER_ARCHIVE_STATUSES", "DELIVERED,CANCELLED").split(",")
+    if s.strip()
+}
+
+# each gzip member is appended as one block, so keep members well under the 4 MiB block limit
+_MEMBER_MAX_ORDERS   = 500
+_TRANSACTION_SIZE    = 100
+_INDEX_WRITE_RETRIES = 5
+
+_segment_indexes = LRUCache(maxsize=64, ttl_seconds=600)
+
+
+def _segment_blob(day: str) -> str:
+    return f"segments/{day}.jsonl.gz"
+
+
+def _index_blob(day: str) -> str:
+    return f"index/{day}.json"
+
+
+def _basket_partition(basket_id: str) -> str:
+    return f"basket:{basket_id}"
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _entity_to_record(ent: Any) -> Dict[str, Any]:
+    record = {}
+    for key, val in dict(ent).items():
+        if isinstance(val, (bytes, bytearray)):
+            val = {"$b64": base64.b64encode(bytes(val)).decode("ascii")}
+        elif isinstance(val, datetime):
+            val = val.isoformat()
+        record[key] = val
+    return record
+
+
+def _record_to_entity(record: Dict[str, Any]) -> Dict[str, Any]:
+    ent = {}
+    for key, val in record.items():
+        if isinstance(val, dict) and "$b64" in val:
+            val = base64.b64decode(val["$b64"])
+        ent[key] = val
+    return ent
+
+
+def _container():
+    container = get_blob_service_client().get_container_client(BLOB_CONTAINER_ARCHIVE)
+    try:
+        container.create_container()
+    except ResourceExistsError:
+        pass
+    return container
+
+
+def _read_segment_index(container: Any, day: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    try:
+        downloader = container.get_blob_client(_index_blob(day)).download_blob()
+        raw        = downloader.readall()
+        return json.loads(raw.decode("utf-8")), downloader.properties.etag
+    except ResourceNotFoundError:
+        return {"segment": _segment_blob(day), "orders": {}, "baskets": {}}, None
+
+
+def _load_segment_index(container: Any, day: str) -> Dict[str, Any]:
+    return _read_segment_index(container, day)[0]
+
+
+def _append_member(container: Any, day: str, records: List[Dict[str, Any]]) -> List[int]:
+    blob = container.get_blob_client(_segment_blob(day))
+    try:
+        blob.create_append_blob(if_none_match="*")
+    except ResourceExistsError:
+        pass
+
+    payload = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode("utf-8")
+    member  = gzip.compress(payload)
+    result  = blob.append_block(member)
+    return [int(result["blob_append_offset"]), len(member)]
+
+
+def _archive_day(container: Any, day: str, entities: List[Any]):
+    spans: List[Tuple[str, str, List[int]]] = []
+    for chunk in _chunks(entities, _MEMBER_MAX_ORDERS):
+        span = _append_member(container, day, [_entity_to_record(ent) for ent in chunk])
+        spans.extend((ent.get("RowKey"), ent.get("basket_id") or "", span) for ent in chunk)
+
+    # appends are atomic but the index is read-modify-write, so two runs archiving the same day
+    # merge through the blob ETag instead of overwriting each other's entries
+    blob = container.get_blob_client(_index_blob(day))
+    for _ in range(_INDEX_WRITE_RETRIES):
+        index, etag = _read_segment_index(container, day)
+        for order_id, basket_id, span in spans:
+            index["orders"][order_id] = span
+            basket_orders = index["baskets"].setdefault(basket_id, [])
+            if order_id not in basket_orders:
+                basket_orders.append(order_id)
+
+        body = json.dumps(index, separators=(",", ":")).encode("utf-8")
+        try:
+            if etag:
+                blob.upload_blob(body, overwrite=True, etag=etag, match_condition=MatchConditions.IfNotModified)
+            else:
+                blob.upload_blob(body, overwrite=False)
+        except (ResourceModifiedError, ResourceExistsError):
+            continue
+        _segment_indexes.set(day, index)
+        return
+
+    raise ResourceModifiedError(f"Archive index for {day} kept changing, retry the run")
+
+
+def _write_pointers(by_day: Dict[str, List[Any]]):
+    client     = get_table_client(TABLE_ORDERS_ARCHIVE)
+    partitions : Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+
+    for day, entities in by_day.items():
+        for ent in entities:
+            order_id = ent.get("RowKey")
+            partitions["order"].append({"PartitionKey": "order", "RowKey": order_id, "segment": day})
+            partitions[_basket_partition(ent.get("basket_id") or "")].append(
+                {
+                    "PartitionKey" : _basket_partition(ent.get("basket_id") or ""),
+                    "RowKey"       : order_id,
+                    "segment"      : day,
+                    "restaurant_id": ent.get("restaurant_id"),
+                    "created_at"   : ent.get("created_at"),
+                }
+            )
+
+    for rows in partitions.values():
+        for chunk in _chunks(rows, _TRANSACTION_SIZE):
+            client.submit_transaction([("upsert", row) for row in chunk])
+
+
+def _delete_hot(entities: List[Any]):
+    client = get_table_client(TABLE_ORDERS)
+    for chunk in _chunks(entities, _TRANSACTION_SIZE):
+        client.submit_transaction(
+            [("delete", {"PartitionKey": "order", "RowKey": ent.get("RowKey")}) for ent in chunk]
+        )
+
+
+def archive_orders(min_age_days: Optional[int] = None, limit: int = 5000) -> Dict[str, Any]:
+    min_age = ORDER_ARCHIVE_MIN_AGE_DAYS if min_age_days is None else min_age_days
+    cutoff  = (datetime.now(timezone.utc) - timedelta(days=min_age)).isoformat()
+
+    client  = get_table_client(TABLE_ORDERS)
+    by_day  : Dict[str, List[Any]] = defaultdict(list)
+    total   = 0
+
+    for ent in client.query_entities(f"PartitionKey eq 'order' and created_at lt '{cutoff}'"):
+        if (ent.get("status") or "").upper() not in ORDER_ARCHIVE_STATUSES:
+            continue
+        by_day[(ent.get("created_at") or "unknown")[:10]].append(ent)
+        total += 1
+        if total >= limit:
+            break
+
+    if not by_day:
+        return {"archived": 0, "segments": []}
+
+    container = _container()
+    for day, entities in by_day.items():
+        _archive_day(container, day, entities)
+
+    # the hot copy is only dropped once the segment, its index and the pointers are durable
+    _write_pointers(by_day)
+    for entities in by_day.values():
+        _delete_hot(entities)
+        unindex_orders(entities)
+
+    return {"archived": total, "segments": sorted(by_day.keys()), "cutoff": cutoff}
+
+
+def _get_segment_index(container: Any, day: str) -> Dict[str, Any]:
+    return _segment_indexes.get_or_load(day, lambda: _load_segment_index(container, day))
+
+
+def _read_member(container: Any, day: str, span: List[int]) -> List[Dict[str, Any]]:
+    offset, length = span
+    raw = container.get_blob_client(_segment_blob(day)).download_blob(offset=offset, length=length).readall()
+    return [json.loads(line) for line in gzip.decompress(raw).decode("utf-8").splitlines() if line]
+
+
+def _fetch_from_segment(container: Any, day: str, order_ids: List[str]) -> List[Dict[str, Any]]:
+    index = _get_segment_index(container, day)
+    if any(oid not in index["orders"] for oid in order_ids):
+        # another worker may have archived into this segment since we cached its index
+        _segment_indexes.invalidate(day)
+        index = _get_segment_index(container, day)
+
+    wanted = set(order_ids)
+    spans  = {tuple(index["orders"][oid]) for oid in order_ids if oid in index["orders"]}
+    out    = []
+    for span in spans:
+        for record in _read_member(container, day, list(span)):
+            if record.get("RowKey") in wanted:
+                wanted.discard(record.get("RowKey"))
+                out.append(_record_to_entity(record))
+    return out
+
+
+def get_archived_order(order_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        pointer = get_table_client(TABLE_ORDERS_ARCHIVE).get_entity(partition_key="order", row_key=order_id)
+    except ResourceNotFoundError:
+        return None
+
+    container = get_blob_service_client().get_container_client(BLOB_CONTAINER_ARCHIVE)
+    found     = _fetch_from_segment(container, pointer.get("segment"), [order_id])
+    return found[0] if found else None
+
+
+def list_archived_orders(basket_id: str, restaurant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    client  = get_table_client(TABLE_ORDERS_ARCHIVE)
+    pk      = _basket_partition(basket_id).replace("'", "''")
+    by_day  : Dict[str, List[str]] = defaultdict(list)
+
+    for pointer in client.query_entities(f"PartitionKey eq '{pk}'"):
+        if restaurant_id and pointer.get("restaurant_id") != restaurant_id:
+            continue
+        by_day[pointer.get("segment")].append(pointer.get("RowKey"))
+
+    if not by_day:
+        return []
+
+    container = get_blob_service_client().get_container_client(BLOB_CONTAINER_ARCHIVE)
+    out       = []
+    for day, order_ids in by_day.items():
+        out.extend(_fetch_from_segment(container, day, order_ids))
+    return out
@@ -0,0 +1,229 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+from azure.core.exceptions import ResourceNotFoundError
+from shared.database import get_table_client
+from shared.events import CellsChanged, poll_events, publish, subscribe
+from shared.geo import encode_geohash, geohash_children
+from shared.query_analyzer import allow_table_scan
+
+TABLE_RESTAURANTS    = "Restaurants"
+TABLE_CUISINE_INDEX  = "CuisineIndex"
+TABLE_CELL_DIRECTORY = "CellDirectory"
+CELL_PARTITION       = "cell"
+VERSION_PARTITION    = "version"
+LISTING_VERSION_ROW  = "listings"
+
+BASE_PRECISION             = 6
+SPLIT_PRECISION            = 7
+CELL_SPLIT_THRESHOLD       = int(os.environ.get("CELL_SPLIT_THRESHOLD", "200"))
+CELL_DIRECTORY_TTL_SECONDS = float(os.environ.get("CELL_DIRECTORY_TTL_SECONDS", "300"))
+
+_TRANSACTION_SIZE = 100
+
+_directory           : Optional[Dict[str, int]] = None
+_directory_loaded_at = 0.0
+_listing_version     = "0"
+_directory_lock      = threading.Lock()
+
+
+def _directory_rows() -> Dict[str, Any]:
+    client = get_table_client(TABLE_CELL_DIRECTORY)
+    return {ent.get("RowKey"): ent for ent in client.query_entities(f"PartitionKey eq '{CELL_PARTITION}'")}
+
+
+def _read_listing_version() -> str:
+    try:
+        ent = get_table_client(TABLE_CELL_DIRECTORY).get_entity(partition_key=VERSION_PARTITION, row_key=LISTING_VERSION_ROW)
+    except ResourceNotFoundError:
+        return "0"
+    return str(ent.get("version") or "0")
+
+
+def get_cell_directory() -> Dict[str, int]:
+    # only split cells have a row; everything else lives at BASE_PRECISION
+    global _directory, _directory_loaded_at, _listing_version
+
+    poll_events()
+    if _directory is not None and time.monotonic() - _directory_loaded_at < CELL_DIRECTORY_TTL_SECONDS:
+        return _directory
+
+    with _directory_lock:
+        if _directory is not None and time.monotonic() - _directory_loaded_at < CELL_DIRECTORY_TTL_SECONDS:
+            return _directory
+        try:
+            _directory = {
+                cell: int(ent.get("precision") or BASE_PRECISION) for cell, ent in _directory_rows().items()
+            }
+            _listing_version = _read_listing_version()
+        except Exception:
+            logging.exception("Could not load cell directory")
+            if _directory is None:
+                _directory = {}
+        _directory_loaded_at = time.monotonic()
+        return _directory
+
+
+def _on_cells_changed(event: CellsChanged):
+    global _directory_loaded_at
+    _directory_loaded_at = 0.0
+
+
+subscribe(CellsChanged, _on_cells_changed)
+
+
+def listing_version() -> str:
+    # changes whenever any restaurant listing could; read with the directory, so checking it costs no round trip
+    get_cell_directory()
+    return _listing_version
+
+
+def bump_listing_version():
+    global _listing_version
+    version = uuid.uuid4().hex[:16]
+    get_table_client(TABLE_CELL_DIRECTORY).upsert_entity(
+        {"PartitionKey": VERSION_PARTITION, "RowKey": LISTING_VERSION_ROW, "version": version}
+    )
+    _listing_version = version
+    publish(CellsChanged())
+
+
+def partition_for(lat: float, lon: float) -> str:
+    cell      = encode_geohash(lat, lon, BASE_PRECISION)
+    precision = get_cell_directory().get(cell, BASE_PRECISION)
+    return cell if precision == BASE_PRECISION else encode_geohash(lat, lon, precision)
+
+
+def is_current_row(ent: Any) -> bool:
+    # a split cell's base partition keeps copies of its rows until the next drain; scans read the child copy
+    cell = ent.get("PartitionKey") or ""
+    return len(cell) != BASE_PRECISION or get_cell_directory().get(cell, BASE_PRECISION) == BASE_PRECISION
+
+
+def resolve_partitions(cells: Iterable[str]) -> List[str]:
+    directory = get_cell_directory()
+    out       = []
+    for cell in cells:
+        if directory.get(cell, BASE_PRECISION) > BASE_PRECISION:
+            out.extend(geohash_children(cell))
+        else:
+            out.append(cell)
+    return out
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _newer_than_target(client: Any, ent: Any, target: str) -> bool:
+    try:
+        current = client.get_entity(partition_key=target, row_key=ent.get("RowKey"))
+    except ResourceNotFoundError:
+        return True
+    return (ent.get("updated_at") or "") > (current.get("updated_at") or "")
+
+
+def _repoint_cuisine_rows(moved: Dict[str, List[Dict[str, Any]]]):
+    # the plain {cuisine} rows remember which partition holds the restaurant; keep them pointing at the child
+    by_cuisine : Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for target, entities in moved.items():
+        for ent in entities:
+            cuisines = {c.strip().lower() for c in (ent.get("cuisines") or "").split(",") if c.strip()}
+            for cuisine in cuisines:
+                by_cuisine[cuisine].append({"PartitionKey": cuisine, "RowKey": ent.get("RowKey"), "geohash": target})
+
+    c_client = get_table_client(TABLE_CUISINE_INDEX)
+    for rows in by_cuisine.values():
+        for chunk in _chunks(rows, _TRANSACTION_SIZE):
+            c_client.submit_transaction([("upsert", row) for row in chunk])
+
+
+def _move_partition(client: Any, cell: str, check_targets: bool) -> int:
+    by_target : Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    moved     : List[Any] = []
+
+    for ent in client.query_entities(f"PartitionKey eq '{cell}'"):
+        lat, lon = ent.get("lat"), ent.get("lon")
+        if lat is None or lon is None:
+            continue
+        target = encode_geohash(float(lat), float(lon), SPLIT_PRECISION)
+        moved.append(ent)
+        # a late write may have landed in the base cell after the split; never let it clobber a newer child row
+        if check_targets and not _newer_than_target(client, ent, target):
+            continue
+        by_target[target].append({**dict(ent), "PartitionKey": target})
+
+    for target, entities in by_target.items():
+        for chunk in _chunks(entities, _TRANSACTION_SIZE):
+            client.submit_transaction([("upsert", ent) for ent in chunk])
+    _repoint_cuisine_rows(by_target)
+    return len(moved)
+
+
+def _delete_partition_rows(client: Any, cell: str):
+    keys = [ent.get("RowKey") for ent in client.query_entities(f"PartitionKey eq '{cell}'", select=["RowKey"])]
+    for chunk in _chunks(keys, _TRANSACTION_SIZE):
+        client.submit_transaction([("delete", {"PartitionKey": cell, "RowKey": key}) for key in chunk])
+
+
+def rebalance_cells(max_splits: int = 20) -> Dict[str, Any]:
+    client     = get_table_client(TABLE_RESTAURANTS)
+    dir_client = get_table_client(TABLE_CELL_DIRECTORY)
+    rows       = _directory_rows()
+    now        = datetime.now(timezone.utc)
+
+    counts: Dict[str, int] = defaultdict(int)
+    with allow_table_scan():
+        for ent in client.list_entities(select=["PartitionKey"]):
+            counts[ent.get("PartitionKey")] += 1
+
+    # drain base partitions of split cells once every worker has reloaded the directory
+    drained     = []
+    drain_after = (now - timedelta(seconds=CELL_DIRECTORY_TTL_SECONDS)).isoformat()
+    for cell, row in rows.items():
+        if int(row.get("precision") or BASE_PRECISION) == BASE_PRECISION or not counts.get(cell):
+            continue
+        if (row.get("split_at") or "") > drain_after:
+            continue
+        _move_partition(client, cell, check_targets=True)
+        _delete_partition_rows(client, cell)
+        drained.append(cell)
+
+    hot = sorted(
+        (
+            cell for cell, n in counts.items()
+            if len(cell) == BASE_PRECISION and n > CELL_SPLIT_THRESHOLD and cell not in rows
+        ),
+        key=lambda cell: -counts[cell],
+    )[:max_splits]
+
+    # copy first, then flip the directory; the base rows stay readable until the next drain
+    split = []
+    for cell in hot:
+        moved = _move_partition(client, cell, check_targets=False)
+        dir_client.upsert_entity(
+            {
+                "PartitionKey": CELL_PARTITION,
+                "RowKey"      : cell,
+                "precision"   : SPLIT_PRECISION,
+                "count"       : moved,
+                "split_at"    : now.isoformat(),
+            }
+        )
+        split.append({"cell": cell, "restaurants": moved})
+
+    if split:
+        publish(*(CellsChanged(cell=s["cell"]) for s in split))
+    if split or drained:
+        bump_listing_version()
+
+    oversized = sorted(
+        cell for cell, n in counts.items() if len(cell) == SPLIT_PRECISION and n > CELL_SPLIT_THRESHOLD
+    )
+    return {"split": split, "drained": drained, "oversized": oversized}
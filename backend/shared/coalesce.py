@@ -0,0 +1,72 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class _Batch:
+    __slots__ = ("payloads", "results", "error", "done")
+
+    def __init__(self):
+        self.payloads : List[Any] = []
+        self.results  : List[Any] = []
+        self.error    : Optional[BaseException] = None
+        self.done     = threading.Event()
+
+
+class _KeyState:
+    __slots__ = ("busy", "waiting")
+
+    def __init__(self):
+        self.busy    = False
+        self.waiting : Optional[_Batch] = None
+
+
+class WriteCoalescer:
+    # Group commit: a writer with nothing in flight for its key flushes straight away. Payloads that
+    # arrive while that flush runs queue up and go out together in the next single storage write.
+    def __init__(self):
+        self._keys : Dict[Hashable, _KeyState] = {}
+        self._cond = threading.Condition()
+
+    def submit(self, key: Hashable, payload: Any, flush: Callable[[List[Any]], List[Any]]) -> Any:
+        with self._cond:
+            state = self._keys.get(key)
+            if state is None:
+                state = self._keys[key] = _KeyState()
+
+            if not state.busy:
+                batch      = _Batch()
+                leader     = True
+                state.busy = True
+            else:
+                batch  = state.waiting
+                leader = batch is None
+                if leader:
+                    batch = state.waiting = _Batch()
+            index = len(batch.payloads)
+            batch.payloads.append(payload)
+
+            if leader and state.waiting is batch:
+                # the first queued writer flushes for the whole queue once the running flush is done
+                while state.busy:
+                    self._cond.wait()
+                state.busy    = True
+                state.waiting = None
+
+        if leader:
+            try:
+                batch.results = flush(batch.payloads)
+            except BaseException as e:
+                batch.error = e
+            finally:
+                with self._cond:
+                    state.busy = False
+                    if state.waiting is None:
+                        self._keys.pop(key, None)
+                    self._cond.notify_all()
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
@@ -0,0 +1,208 @@
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from azure.core.exceptions import ResourceNotFoundError
+from shared.cells import partition_for
+from shared.database import get_table_client
+from shared.geo import (
+    distance_to_geohash_meters,
+    encode_geohash,
+    geohash_neighbors,
+    haversine_distance_meters,
+)
+
+TABLE_RESTAURANTS   = "Restaurants"
+TABLE_CUISINE_INDEX = "CuisineIndex"
+
+# finest first; a query only widens to the next precision when the finer ring cannot fill the page
+CUISINE_GEO_PRECISIONS = tuple(
+    int(p) for p in os.environ.get("CUISINE_GEO_PRECISIONS", "5,4").split(",") if p.strip()
+)
+
+# until a rebuild has completed, a short page may look at this many plain {cuisine} rows for restaurants without geo rows
+CUISINE_LEGACY_SCAN_MAX_ROWS = int(os.environ.get("CUISINE_LEGACY_SCAN_MAX_ROWS", "500"))
+
+# written by rebuild_cuisine_index; cuisine partitions are lowercase names, so the leading underscore cannot clash
+REBUILD_PARTITION = "_meta"
+REBUILD_ROW       = "rebuild"
+
+# everything RestaurantSummary reads, so index rows can stand in for the restaurant entity
+_SUMMARY_FIELDS = (
+    "name",
+    "unique_name",
+    "city",
+    "address_first_line",
+    "postal_code",
+    "rating_star",
+    "rating_count",
+    "is_delivery",
+    "is_collection",
+    "cuisines",
+    "tags",
+)
+
+_rebuilt = False
+
+
+def _split_csv(val: Optional[str]) -> List[str]:
+    return [part.strip() for part in (val or "").split(",") if part.strip()]
+
+
+def cuisine_geo_partition(cuisine: str, geohash: str) -> str:
+    return f"{cuisine}:{geohash}"
+
+
+def cuisine_index_entities(restaurant: Dict[str, Any]) -> List[Dict[str, Any]]:
+    lat, lon = restaurant["lat"], restaurant["lon"]
+    summary  = {field: restaurant.get(field) for field in _SUMMARY_FIELDS}
+    out      = []
+    for cuisine in _split_csv(restaurant.get("cuisines")):
+        cuisine = cuisine.lower()
+        out.append(
+            {
+                "PartitionKey": cuisine,
+                "RowKey"      : restaurant["RowKey"],
+                "geohash"     : restaurant["PartitionKey"],
+                "lat"         : lat,
+                "lon"         : lon,
+                "updated_at"  : restaurant.get("updated_at"),
+            }
+        )
+        for precision in CUISINE_GEO_PRECISIONS:
+            out.append(
+                {
+                    "PartitionKey": cuisine_geo_partition(cuisine, encode_geohash(lat, lon, precision)),
+                    "RowKey"      : restaurant["RowKey"],
+                    "lat"         : lat,
+                    "lon"         : lon,
+                    "updated_at"  : restaurant.get("updated_at"),
+                    **summary,
+                }
+            )
+    return out
+
+
+def _covered_radius_meters(lat: float, precision: int) -> float:
+    # the 3x3 block around the user's cell covers at least one cell size in every direction
+    bits    = precision * 5
+    lat_deg = 180.0 / (2 ** (bits // 2))
+    lon_deg = 360.0 / (2 ** ((bits + 1) // 2))
+    return min(lat_deg * 111320.0, lon_deg * 111320.0 * math.cos(math.radians(lat)))
+
+
+def query_cuisine_near(cuisine: str, lat: float, lon: float, limit: int) -> List[Tuple[float, Any]]:
+    client = get_table_client(TABLE_CUISINE_INDEX)
+    user   = (lat, lon)
+    found  : Dict[str, Tuple[float, Any]] = {}
+
+    for precision in CUISINE_GEO_PRECISIONS:
+        cells  = geohash_neighbors(encode_geohash(lat, lon, precision))
+        bounds = {cell: distance_to_geohash_meters(user, cell) for cell in cells}
+
+        for cell in sorted(cells, key=bounds.get):
+            if len(found) >= limit:
+                kth = sorted(d for d, _ in found.values())[limit - 1]
+                if bounds[cell] > kth:
+                    break
+            pk = cuisine_geo_partition(cuisine, cell).replace("'", "''")
+            for ent in client.query_entities(f"PartitionKey eq '{pk}'"):
+                if ent.get("lat") is None or ent.get("lon") is None:
+                    continue
+                dist = haversine_distance_meters(user, (ent.get("lat"), ent.get("lon")))
+                found[ent.get("RowKey")] = (dist, ent)
+
+        ranked = sorted(found.values(), key=lambda hit: hit[0])
+        if len(ranked) >= limit and ranked[limit - 1][0] <= _covered_radius_meters(lat, precision):
+            break
+
+    if len(found) < limit and not cuisine_index_rebuilt():
+        _fill_from_legacy_partition(cuisine, user, limit, found)
+
+    return sorted(found.values(), key=lambda hit: hit[0])[:limit]
+
+
+def cuisine_index_rebuilt() -> bool:
+    # once a rebuild has run every restaurant has geo rows, so short pages are simply short
+    global _rebuilt
+    if _rebuilt:
+        return True
+    try:
+        get_table_client(TABLE_CUISINE_INDEX).get_entity(partition_key=REBUILD_PARTITION, row_key=REBUILD_ROW)
+    except ResourceNotFoundError:
+        return False
+    _rebuilt = True
+    return True
+
+
+def _load_restaurant(client: Any, row: Any) -> Optional[Any]:
+    # the stored geohash, then the cell the coordinates map to now in case a split moved the restaurant
+    partitions = [row.get("geohash"), partition_for(float(row.get("lat")), float(row.get("lon")))]
+    for pk in dict.fromkeys(pk for pk in partitions if pk):
+        try:
+            return client.get_entity(partition_key=pk, row_key=row.get("RowKey"))
+        except ResourceNotFoundError:
+            continue
+    return None
+
+
+def _fill_from_legacy_partition(cuisine: str, user: Tuple[float, float], limit: int, found: Dict[str, Tuple[float, Any]]):
+    # restaurants indexed before the geo rows existed only have a row in the plain cuisine partition;
+    # rank the first CUISINE_LEGACY_SCAN_MAX_ROWS of those by their stored coordinates and load just the nearest missing ones
+    pk         = cuisine.replace("'", "''")
+    candidates = []
+    rows       = get_table_client(TABLE_CUISINE_INDEX).query_entities(
+        f"PartitionKey eq '{pk}'", results_per_page=min(CUISINE_LEGACY_SCAN_MAX_ROWS, 1000)
+    )
+    for scanned, row in enumerate(rows, 1):
+        if scanned > CUISINE_LEGACY_SCAN_MAX_ROWS:
+            break
+        if row.get("RowKey") in found or row.get("lat") is None or row.get("lon") is None:
+            continue
+        candidates.append((haversine_distance_meters(user, (row.get("lat"), row.get("lon"))), row))
+
+    client = get_table_client(TABLE_RESTAURANTS)
+    for dist, row in sorted(candidates, key=lambda hit: hit[0])[:limit - len(found)]:
+        ent = _load_restaurant(client, row)
+        if ent is not None:
+            found[row.get("RowKey")] = (dist, ent)
+
+
+def _prefer(current: Optional[Any], candidate: Any) -> bool:
+    # after a cell split a restaurant can briefly exist in both the base cell and its child;
+    # the copy in the partition it maps to now wins, then the most recently updated one
+    if current is None:
+        return True
+    home = partition_for(float(candidate.get("lat")), float(candidate.get("lon")))
+    if (candidate.get("PartitionKey") == home) != (current.get("PartitionKey") == home):
+        return candidate.get("PartitionKey") == home
+    return (candidate.get("updated_at") or "") > (current.get("updated_at") or "")
+
+
+def rebuild_cuisine_index(restaurants: Iterable[Any]) -> Dict[str, int]:
+    global _rebuilt
+    client  = get_table_client(TABLE_CUISINE_INDEX)
+    latest  : Dict[str, Any] = {}
+    scanned = 0
+    for ent in restaurants:
+        if ent.get("lat") is None or ent.get("lon") is None:
+            continue
+        scanned += 1
+        if _prefer(latest.get(ent.get("RowKey")), ent):
+            latest[ent.get("RowKey")] = ent
+
+    # a transaction may only touch each row once, so rows are keyed by RowKey within their partition
+    by_pk: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for ent in latest.values():
+        for row in cuisine_index_entities(dict(ent)):
+            by_pk.setdefault(row["PartitionKey"], {})[row["RowKey"]] = row
+
+    written = 0
+    for rows_by_key in by_pk.values():
+        rows = list(rows_by_key.values())
+        for i in range(0, len(rows), 100):
+            client.submit_transaction([("upsert", row) for row in rows[i:i + 100]])
+            written += len(rows[i:i + 100])
+
+    client.upsert_entity({"PartitionKey": REBUILD_PARTITION, "RowKey": REBUILD_ROW, "restaurants": len(latest)})
+    _rebuilt = True
+    return {"restaurants": len(latest), "scanned": scanned, "rows": written}
@@ -1,5 +1,19 @@
 import os
+import threading
+from typing import Dict, Tuple
 from azure.data.tables import TableServiceClient, TableClient
+from azure.storage.blob import BlobServiceClient
+from shared.local_storage import LocalBlobServiceClient, LocalTableServiceClient, get_local_store
+from shared.query_analyzer import analyze_table_client
+from shared.telemetry import instrument_client
+
+# azure: the storage account in AzureWebJobsStorage; memory / sqlite: offline stores for local runs and benchmarks
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "azure").lower()
+
+
+_table_clients      : Dict[Tuple[str, str], TableClient] = {}
+_table_clients_lock = threading.Lock()
+_blob_services      : Dict[str, BlobServiceClient] = {}
 
 
 def get_connection_string() -> str:
@@ -7,16 +21,40 @@ def get_connection_string() -> str:
 
 
 def get_table_service_client() -> TableServiceClient:
+    if STORAGE_BACKEND != "azure":
+        return instrument_client(LocalTableServiceClient(get_local_store(STORAGE_BACKEND)), "table")
     connection_string = get_connection_string()
-    return TableServiceClient.from_connection_string(connection_string)
+    return instrument_client(TableServiceClient.from_connection_string(connection_string), "table")
+
+
+def get_blob_service_client() -> BlobServiceClient:
+    connection_string = get_connection_string()
+    client            = _blob_services.get(connection_string)
+    if client is None:
+        if STORAGE_BACKEND != "azure":
+            client = instrument_client(LocalBlobServiceClient(get_local_store(STORAGE_BACKEND)), "blob")
+        else:
+            client = instrument_client(BlobServiceClient.from_connection_string(connection_string), "blob")
+        _blob_services[connection_string] = client
+    return client
 
 
 def get_table_client(table_name: str) -> TableClient:
-    service_client = get_table_service_client()
-    
-    try:
-        service_client.create_table_if_not_exists(table_name)
-    except Exception:
-        pass
-    
-    return service_client.get_table_client(table_name)
\ No newline at end of file
+    key    = (get_connection_string(), table_name)
+    client = _table_clients.get(key)
+    if client is not None:
+        return client
+
+    with _table_clients_lock:
+        client = _table_clients.get(key)
+        if client is None:
+            service_client = get_table_service_client()
+            
+            try:
+                service_client.create_table_if_not_exists(table_name)
+            except Exception:
+                pass
+            
+            client = analyze_table_client(service_client.get_table_client(table_name), table_name)
+            _table_clients[key] = client
+    return client
\ No newline at end of file
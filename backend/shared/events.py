@@ -0,0 +1,272 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple, Type
+from pydantic import BaseModel, Field
+from shared.database import get_table_client
+
+CACHE_EVENTS_TRANSPORT     = os.environ.get("CACHE_EVENTS_TRANSPORT", "table").lower()
+CACHE_EVENTS_FILE          = os.environ.get("CACHE_EVENTS_FILE", "cache-events.jsonl")
+CACHE_EVENTS_POLL_SECONDS  = float(os.environ.get("CACHE_EVENTS_POLL_SECONDS", "2"))
+TABLE_CACHE_EVENTS         = "CacheEvents"
+
+# table writers on different hosts can disagree on the clock; re-read this much history and dedupe by id
+_TABLE_LOOKBACK_SECONDS = 10
+_SEEN_MAX               = 4096
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class CacheEvent(BaseModel):
+    type       : str
+    event_id   : str = Field(default_factory=lambda: uuid.uuid4().hex)
+    emitted_at : str = Field(default_factory=_now_iso)
+
+
+class RestaurantChanged(CacheEvent):
+    type          : Literal["restaurant-changed"] = "restaurant-changed"
+    restaurant_id : str
+
+
+class MenuChanged(CacheEvent):
+    type          : Literal["menu-changed"] = "menu-changed"
+    restaurant_id : str
+
+
+class ImagesChanged(CacheEvent):
+    type       : Literal["images-changed"] = "images-changed"
+    image_type : Optional[str] = None
+    filename   : Optional[str] = None
+
+
+class CellsChanged(CacheEvent):
+    type : Literal["cells-changed"] = "cells-changed"
+    cell : Optional[str] = None
+
+
+EVENT_TYPES: Dict[str, Type[CacheEvent]] = {
+    cls.model_fields["type"].default: cls for cls in (RestaurantChanged, MenuChanged, ImagesChanged, CellsChanged)
+}
+
+
+def parse_event(data: Dict[str, Any]) -> Optional[CacheEvent]:
+    cls = EVENT_TYPES.get(data.get("type"))
+    if cls is None:
+        return None
+    try:
+        return cls.model_validate(data)
+    except ValueError:
+        return None
+
+
+class LocalTransport:
+    # single-process stand-in; every bus in the process shares the same log
+    def __init__(self):
+        self._events : List[Dict[str, Any]] = []
+        self._lock   = threading.Lock()
+
+    def publish(self, events: List[Dict[str, Any]]):
+        with self._lock:
+            self._events.extend(events)
+
+    def start(self) -> Any:
+        with self._lock:
+            return len(self._events)
+
+    def poll(self, cursor: Any) -> Tuple[List[Dict[str, Any]], Any]:
+        with self._lock:
+            return self._events[cursor:], len(self._events)
+
+
+class FileTransport:
+    # a shared JSONL file, good enough for several local workers and tests
+    def __init__(self, path: str):
+        self.path  = path
+        self._lock = threading.Lock()
+
+    def publish(self, events: List[Dict[str, Any]]):
+        payload = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in events)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(payload)
+
+    def start(self) -> Any:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def poll(self, cursor: Any) -> Tuple[List[Dict[str, Any]], Any]:
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(cursor)
+                data = f.read()
+        except OSError:
+            return [], cursor
+
+        # only consume complete lines; a concurrent writer may be mid-append
+        end = data.rfind(b"\n") + 1
+        out = []
+        for line in data[:end].splitlines():
+            try:
+                out.append(json.loads(line))
+            except ValueError:
+                continue
+        return out, cursor + end
+
+
+class TableTransport:
+    # one partition per UTC hour, row keys sort by publish time
+    def __init__(self, table_name: str = TABLE_CACHE_EVENTS):
+        self.table_name = table_name
+
+    @staticmethod
+    def _partition(at: datetime) -> str:
+        return at.strftime("%Y%m%d%H")
+
+    @staticmethod
+    def _row_key(at: datetime) -> str:
+        return f"{int(at.timestamp() * 1000000):020d}"
+
+    def publish(self, events: List[Dict[str, Any]]):
+        client = get_table_client(self.table_name)
+        now    = datetime.now(timezone.utc)
+        rows   = [
+            {
+                "PartitionKey": self._partition(now),
+                "RowKey"      : f"{self._row_key(now)}-{event['event_id']}",
+                "payload"     : json.dumps(event, separators=(",", ":")),
+            }
+            for event in events
+        ]
+        for i in range(0, len(rows), 100):
+            client.submit_transaction([("upsert", row) for row in rows[i:i + 100]])
+
+    def start(self) -> Any:
+        return datetime.now(timezone.utc)
+
+    def poll(self, cursor: Any) -> Tuple[List[Dict[str, Any]], Any]:
+        client = get_table_client(self.table_name)
+        now    = datetime.now(timezone.utc)
+        since  = cursor - timedelta(seconds=_TABLE_LOOKBACK_SECONDS)
+
+        out  = []
+        hour = since.replace(minute=0, second=0, microsecond=0)
+        while hour <= now:
+            query = f"PartitionKey eq '{self._partition(hour)}' and RowKey gt '{self._row_key(since)}'"
+            for ent in client.query_entities(query):
+                try:
+                    out.append(json.loads(ent.get("payload") or "{}"))
+                except ValueError:
+                    continue
+            hour += timedelta(hours=1)
+        return out, now
+
+
+def _make_transport(name: str) -> Any:
+    if name == "local":
+        return LocalTransport()
+    if name == "file":
+        return FileTransport(CACHE_EVENTS_FILE)
+    if name == "table":
+        return TableTransport()
+    raise ValueError(f"Unknown cache events transport '{name}'")
+
+
+class EventBus:
+    def __init__(self, transport: Any, poll_seconds: float = CACHE_EVENTS_POLL_SECONDS):
+        self.transport     = transport
+        self.poll_seconds  = poll_seconds
+        self._handlers     : Dict[str, List[Callable[[CacheEvent], None]]] = defaultdict(list)
+        self._seen         : "OrderedDict[str, None]" = OrderedDict()
+        self._cursor       : Any = None
+        self._last_poll    = 0.0
+        self._lock         = threading.Lock()
+        self._poll_lock    = threading.Lock()
+
+    def subscribe(self, event_cls: Type[CacheEvent], handler: Callable[[CacheEvent], None]):
+        self._handlers[event_cls.model_fields["type"].default].append(handler)
+
+    def _mark_seen(self, event_id: str) -> bool:
+        with self._lock:
+            if event_id in self._seen:
+                return False
+            self._seen[event_id] = None
+            while len(self._seen) > _SEEN_MAX:
+                self._seen.popitem(last=False)
+            return True
+
+    def _dispatch(self, event: CacheEvent):
+        if not self._mark_seen(event.event_id):
+            return
+        for handler in self._handlers.get(event.type, ()):
+            try:
+                handler(event)
+            except Exception:
+                logging.exception("Cache event handler failed for %s", event.type)
+
+    def publish(self, *events: CacheEvent):
+        if not events:
+            return
+        # this worker's own caches are invalidated immediately, other workers pick it up on their next poll
+        for event in events:
+            self._dispatch(event)
+        try:
+            self.transport.publish([event.model_dump() for event in events])
+        except Exception:
+            logging.exception("Could not publish %d cache events", len(events))
+
+    def poll(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_poll < self.poll_seconds:
+            return
+        if not self._poll_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_poll = now
+            if self._cursor is None:
+                self._cursor = self.transport.start()
+                return
+            raw, self._cursor = self.transport.poll(self._cursor)
+        except Exception:
+            logging.exception("Could not poll cache events")
+            return
+        finally:
+            self._poll_lock.release()
+
+        for data in raw:
+            event = parse_event(data)
+            if event is not None:
+                self._dispatch(event)
+
+
+_bus      : Optional[EventBus] = None
+_bus_lock = threading.Lock()
+
+
+def get_event_bus() -> EventBus:
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                _bus = EventBus(_make_transport(CACHE_EVENTS_TRANSPORT))
+                _bus.poll(force=True)
+    return _bus
+
+
+def publish(*events: CacheEvent):
+    get_event_bus().publish(*events)
+
+
+def subscribe(event_cls: Type[CacheEvent], handler: Callable[[CacheEvent], None]):
+    get_event_bus().subscribe(event_cls, handler)
+
+
+def poll_events():
+    get_event_bus().poll()
@@ -67,7 +67,7 @@ def estimate_eta_minutes(distance_m: float) -> Tuple[int, int]:
     return round(lower), round(upper)
 
 
-def decode_geohash(geohash: str) -> Tuple[float, float]:
+def _geohash_intervals(geohash: str) -> Tuple[List[float], List[float]]:
     lat_interval = [-90.0, 90.0]
     lon_interval = [-180.0, 180.0]
     even         = True
@@ -87,8 +87,25 @@ def decode_geohash(geohash: str) -> Tuple[float, float]:
                     lat_interval[1] = sum(lat_interval) / 2
             even = not even
     
+    return lat_interval, lon_interval
+
+
+def decode_geohash(geohash: str) -> Tuple[float, float]:
+    lat_interval, lon_interval = _geohash_intervals(geohash)
     return (sum(lat_interval) / 2, sum(lon_interval) / 2)
 
+
+def geohash_children(geohash: str) -> List[str]:
+    return [geohash + c for c in _BASE32]
+
+
+def distance_to_geohash_meters(coord: Tuple[float, float], geohash: str) -> float:
+    # lower bound on the distance from coord to anything inside the cell
+    lat_interval, lon_interval = _geohash_intervals(geohash)
+    lat = min(max(coord[0], lat_interval[0]), lat_interval[1])
+    lon = min(max(coord[1], lon_interval[0]), lon_interval[1])
+    return haversine_distance_meters(coord, (lat, lon))
+
 def geohash_neighbors(geohash: str) -> List[str]:
     lat, lon    = decode_geohash(geohash)
     precision   = len(geohash)
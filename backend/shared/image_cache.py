@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from azure.core.exceptions import ResourceNotFoundError
+from shared.database import get_blob_service_client
+from shared.events import ImagesChanged, poll_events, subscribe
+from shared.images import observe_image
+from shared.menu import BLOB_CONTAINER_IMAGES
+
+IMAGE_CACHE_MEMORY_BYTES  = int(float(os.environ.get("IMAGE_CACHE_MEMORY_MB", "64")) * 1024 * 1024)
+IMAGE_CACHE_DISK_BYTES    = int(float(os.environ.get("IMAGE_CACHE_DISK_MB", "512")) * 1024 * 1024)
+IMAGE_CACHE_MAX_ITEM      = int(float(os.environ.get("IMAGE_CACHE_MAX_ITEM_MB", "4")) * 1024 * 1024)
+IMAGE_CACHE_DIR           = os.environ.get("IMAGE_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "foodflow-images")
+IMAGE_REVALIDATE_SECONDS  = float(os.environ.get("IMAGE_REVALIDATE_SECONDS", "300"))
+IMAGE_CHUNK_BYTES         = 1024 * 1024
+
+CONTENT_TYPES = {
+    "jpg"  : "image/jpeg",
+    "jpeg" : "image/jpeg",
+    "png"  : "image/png",
+    "gif"  : "image/gif",
+    "webp" : "image/webp",
+}
+
+
+def content_type_for(filename: str) -> str:
+    return CONTENT_TYPES.get(filename.rsplit(".", 1)[-1].lower(), "application/octet-stream")
+
+
+class ImageMeta:
+    __slots__ = ("path", "etag", "last_modified", "size", "content_type", "checked_at")
+
+    def __init__(self, path: str, etag: str, last_modified: Optional[datetime], size: int, content_type: str):
+        self.path          = path
+        self.etag          = etag
+        self.last_modified = last_modified
+        self.size          = size
+        self.content_type  = content_type
+        self.checked_at    = time.monotonic()
+
+    def to_json(self) -> Dict[str, object]:
+        return {
+            "path"         : self.path,
+            "etag"         : self.etag,
+            "last_modified": self.last_modified.isoformat() if self.last_modified else None,
+            "size"         : self.size,
+            "content_type" : self.content_type,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, object]) -> "ImageMeta":
+        last_modified = data.get("last_modified")
+        return cls(
+            data["path"],
+            data["etag"],
+            datetime.fromisoformat(last_modified) if last_modified else None,
+            int(data["size"]),
+            data["content_type"],
+        )
+
+
+class _MemoryLRU:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes     = 0
+        self._data     : "OrderedDict[str, Tuple[ImageMeta, bytes]]" = OrderedDict()
+        self._lock     = threading.Lock()
+
+    def get(self, path: str) -> Optional[Tuple[ImageMeta, bytes]]:
+        with self._lock:
+            hit = self._data.get(path)
+            if hit is not None:
+                self._data.move_to_end(path)
+            return hit
+
+    def put(self, meta: ImageMeta, data: bytes):
+        with self._lock:
+            old = self._data.pop(meta.path, None)
+            if old is not None:
+                self.bytes -= len(old[1])
+            self._data[meta.path] = (meta, data)
+            self.bytes += len(data)
+            while self.bytes > self.max_bytes and self._data:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def drop(self, path: str):
+        with self._lock:
+            old = self._data.pop(path, None)
+            if old is not None:
+                self.bytes -= len(old[1])
+
+
+class _DiskLRU:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock     = threading.Lock()
+
+    def _file(self, path: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(path.encode("utf-8")).hexdigest())
+
+    def get(self, path: str) -> Optional[Tuple[ImageMeta, bytes]]:
+        base = self._file(path)
+        try:
+            with open(base + ".json", "r", encoding="utf-8") as f:
+                meta = ImageMeta.from_json(json.load(f))
+            with open(base, "rb") as f:
+                data = f.read()
+            os.utime(base)
+        except (OSError, ValueError, KeyError):
+            return None
+        if len(data) != meta.size:
+            return None
+        return meta, data
+
+    def put(self, meta: ImageMeta, data: bytes):
+        base = self._file(meta.path)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f"{base}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, base)
+            with open(base + ".json", "w", encoding="utf-8") as f:
+                json.dump(meta.to_json(), f)
+        except OSError:
+            return
+        self._evict()
+
+    def drop(self, path: str):
+        base = self._file(path)
+        for name in (base, base + ".json"):
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+
+    def _evict(self):
+        with self._lock:
+            try:
+                files = [e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith((".json", ".tmp"))]
+            except OSError:
+                return
+            total = sum(e.stat().st_size for e in files)
+            if total <= self.max_bytes:
+                return
+            for entry in sorted(files, key=lambda e: e.stat().st_mtime):
+                if total <= self.max_bytes:
+                    break
+                total -= entry.stat().st_size
+                for name in (entry.path, entry.path + ".json"):
+                    try:
+                        os.remove(name)
+                    except OSError:
+                        pass
+
+
+_memory = _MemoryLRU(IMAGE_CACHE_MEMORY_BYTES)
+_disk   = _DiskLRU(IMAGE_CACHE_DIR, IMAGE_CACHE_DISK_BYTES)
+
+
+def _blob_client(path: str):
+    return get_blob_service_client().get_blob_client(container=BLOB_CONTAINER_IMAGES, blob=path)
+
+
+def _meta_from_props(path: str, props) -> ImageMeta:
+    return ImageMeta(path, props.etag, props.last_modified, int(props.size), content_type_for(path))
+
+
+def _cache(meta: ImageMeta, data: bytes):
+    if meta.size > IMAGE_CACHE_MAX_ITEM:
+        return
+    _memory.put(meta, data)
+    _disk.put(meta, data)
+
+
+def _fresh(meta: ImageMeta) -> bool:
+    if time.monotonic() - meta.checked_at < IMAGE_REVALIDATE_SECONDS:
+        return True
+    try:
+        props = _blob_client(meta.path).get_blob_properties()
+    except ResourceNotFoundError:
+        return False
+    if props.etag != meta.etag:
+        return False
+    meta.checked_at = time.monotonic()
+    return True
+
+
+def invalidate_image(path: str):
+    _memory.drop(path)
+    _disk.drop(path)
+
+
+def _on_images_changed(event: ImagesChanged):
+    if event.image_type and event.filename:
+        invalidate_image(f"{event.image_type}/{event.filename}")
+
+
+subscribe(ImagesChanged, _on_images_changed)
+
+
+def get_image_meta(path: str) -> Optional[ImageMeta]:
+    poll_events()
+    for tier in (_memory, _disk):
+        hit = tier.get(path)
+        if hit is not None and _fresh(hit[0]):
+            if tier is _disk:
+                _memory.put(*hit)
+            return hit[0]
+    try:
+        props = _blob_client(path).get_blob_properties()
+    except ResourceNotFoundError:
+        observe_image(path, exists=False)
+        return None
+    observe_image(path, exists=True, size=int(props.size), last_modified=props.last_modified)
+    return _meta_from_props(path, props)
+
+
+def read_image(meta: ImageMeta, start: int = 0, end: Optional[int] = None) -> bytes:
+    end = meta.size - 1 if end is None else end
+
+    for tier in (_memory, _disk):
+        hit = tier.get(meta.path)
+        if hit is not None and hit[0].etag == meta.etag:
+            if tier is _disk:
+                _memory.put(*hit)
+            return hit[1][start:end + 1]
+
+    whole = start == 0 and end == meta.size - 1
+    if whole or meta.size <= IMAGE_CACHE_MAX_ITEM:
+        # small images are fetched once in full so later ranges come from the cache
+        downloader = _blob_client(meta.path).download_blob()
+        body       = bytearray()
+        for chunk in downloader.chunks():
+            body.extend(chunk)
+        data = bytes(body)
+        _cache(meta, data)
+        return data[start:end + 1]
+
+    downloader = _blob_client(meta.path).download_blob(offset=start, length=end - start + 1)
+    body       = bytearray()
+    for chunk in downloader.chunks():
+        body.extend(chunk)
+    return bytes(body)
@@ -0,0 +1,156 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from typing import Dict, Optional
+from azure.storage.blob import ContentSettings
+from shared.database import get_blob_service_client
+from shared.image_cache import ImageMeta, get_image_meta, read_image
+from shared.menu import BLOB_CONTAINER_IMAGES
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+DERIVED_PREFIX          = "derived"
+IMAGE_VARIANT_WIDTHS    = sorted(
+    int(w) for w in os.environ.get("IMAGE_VARIANT_WIDTHS", "96,160,320,640,960,1280").split(",") if w.strip()
+)
+IMAGE_VARIANT_MAX_PIXELS = int(os.environ.get("IMAGE_VARIANT_MAX_PIXELS", str(40 * 1000 * 1000)))
+# renders running at once per worker; requests past the limit get the original instead of waiting
+IMAGE_VARIANT_RENDER_CONCURRENCY = int(os.environ.get("IMAGE_VARIANT_RENDER_CONCURRENCY", "2"))
+
+QUALITY_TIERS = {
+    "low"  : 50,
+    "med"  : 70,
+    "high" : 85,
+}
+FORMATS = {
+    "webp" : ("WEBP", "image/webp"),
+    "jpeg" : ("JPEG", "image/jpeg"),
+}
+
+
+_render_slots = threading.BoundedSemaphore(max(1, IMAGE_VARIANT_RENDER_CONCURRENCY))
+_renders      : Dict[str, threading.Event] = {}
+_renders_lock = threading.Lock()
+
+
+class Variant:
+    __slots__ = ("width", "fmt", "quality")
+
+    def __init__(self, width: Optional[int], fmt: str, quality: str):
+        self.width   = width
+        self.fmt     = fmt
+        self.quality = quality
+
+    def key(self) -> str:
+        return f"{self.width or 'orig'}-{self.quality}"
+
+
+def parse_variant(params: Dict[str, str]) -> Optional[Variant]:
+    width   = params.get("w")
+    fmt     = (params.get("fmt") or "").lower()
+    quality = (params.get("q") or "").lower()
+    if not width and not fmt and not quality:
+        return None
+
+    if fmt and fmt not in FORMATS:
+        raise ValueError(f"fmt must be one of {', '.join(FORMATS)}")
+    if quality and quality not in QUALITY_TIERS:
+        raise ValueError(f"q must be one of {', '.join(QUALITY_TIERS)}")
+
+    bucket = None
+    if width:
+        try:
+            requested = int(width)
+        except ValueError:
+            raise ValueError("w must be an integer")
+        if requested <= 0:
+            raise ValueError("w must be positive")
+        # snap to a fixed set of widths so arbitrary ?w= values cannot fan out the derived store
+        bucket = next((w for w in IMAGE_VARIANT_WIDTHS if w >= requested), IMAGE_VARIANT_WIDTHS[-1])
+
+    return Variant(bucket, fmt or "webp", quality or "med")
+
+
+def _variant_path(meta: ImageMeta, variant: Variant) -> str:
+    # the source etag is part of the name, so replacing an original never serves a stale variant
+    source = hashlib.sha1(meta.etag.encode("utf-8")).hexdigest()[:10]
+    stem   = meta.path.rsplit(".", 1)[0]
+    return f"{DERIVED_PREFIX}/{stem}/{variant.key()}-{source}.{variant.fmt}"
+
+
+def _render(data: bytes, variant: Variant) -> bytes:
+    with Image.open(io.BytesIO(data)) as img:
+        if img.width * img.height > IMAGE_VARIANT_MAX_PIXELS:
+            raise ValueError("Source image too large")
+        frame = img.convert("RGBA" if variant.fmt == "webp" else "RGB")
+
+    if variant.width and frame.width > variant.width:
+        height = max(1, round(frame.height * variant.width / frame.width))
+        frame  = frame.resize((variant.width, height), Image.LANCZOS)
+
+    out        = io.BytesIO()
+    pil_format = FORMATS[variant.fmt][0]
+    if pil_format == "JPEG":
+        frame.save(out, pil_format, quality=QUALITY_TIERS[variant.quality], optimize=True, progressive=True)
+    else:
+        frame.save(out, pil_format, quality=QUALITY_TIERS[variant.quality], method=4)
+    return out.getvalue()
+
+
+def _store_variant(source: ImageMeta, variant: Variant, derived_path: str) -> Optional[ImageMeta]:
+    try:
+        body = _render(read_image(source), variant)
+    except Exception:
+        logging.exception("Could not render image variant %s", derived_path)
+        return None
+
+    try:
+        get_blob_service_client().get_blob_client(container=BLOB_CONTAINER_IMAGES, blob=derived_path).upload_blob(
+            body,
+            overwrite        = True,
+            content_settings = ContentSettings(
+                content_type  = FORMATS[variant.fmt][1],
+                cache_control = "public, max-age=31536000, immutable",
+            ),
+        )
+    except Exception:
+        logging.exception("Could not store image variant %s", derived_path)
+        return None
+    return get_image_meta(derived_path)
+
+
+def get_variant_meta(path: str, variant: Variant) -> Optional[ImageMeta]:
+    # falls back to the original when the variant cannot be produced
+    source = get_image_meta(path)
+    if source is None or Image is None:
+        return source
+
+    derived_path = _variant_path(source, variant)
+    derived      = get_image_meta(derived_path)
+    if derived is not None:
+        return derived
+
+    # one render per derived blob at a time; concurrent first requests wait for it instead of rendering again
+    with _renders_lock:
+        running = _renders.get(derived_path)
+        if running is None:
+            _renders[derived_path] = threading.Event()
+    if running is not None:
+        running.wait()
+        return get_image_meta(derived_path) or source
+
+    try:
+        if not _render_slots.acquire(blocking=False):
+            return source
+        try:
+            return _store_variant(source, variant, derived_path) or source
+        finally:
+            _render_slots.release()
+    finally:
+        with _renders_lock:
+            _renders.pop(derived_path).set()
@@ -0,0 +1,268 @@
+import bisect
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from shared.database import get_blob_service_client
+from shared.events import ImagesChanged, poll_events, publish, subscribe
+from shared.menu import BLOB_CONTAINER_IMAGES
+
+BLOB_CONTAINER_CATALOG      = "catalog"
+IMAGE_CATALOG_SNAPSHOT      = "images.json.gz"
+IMAGE_CATALOG_TTL_SECONDS   = float(os.environ.get("IMAGE_CATALOG_TTL_SECONDS", "300"))
+
+_TOKEN_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def _tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_SPLIT.split((text or "").lower()) if t]
+
+
+class ImageEntry:
+    __slots__ = ("image_type", "filename", "size", "last_modified", "tokens")
+
+    def __init__(self, image_type: str, filename: str, size: Optional[int] = None, last_modified: Optional[str] = None):
+        self.image_type    = image_type
+        self.filename      = filename
+        self.size          = size
+        self.last_modified = last_modified
+        self.tokens        = _tokenize(filename.rsplit(".", 1)[0])
+
+    def to_row(self) -> List[Any]:
+        return [self.image_type, self.filename, self.size, self.last_modified]
+
+
+class ImageCatalog:
+    def __init__(self, entries: Iterable[ImageEntry] = ()):
+        self._lock    = threading.Lock()
+        self._entries : Dict[str, Dict[str, ImageEntry]] = {}
+        self._tokens  : Dict[str, Dict[str, Set[str]]] = {}
+        self._sorted  : Dict[str, List[str]] = {}
+        for entry in entries:
+            self._add(entry)
+
+    def _add(self, entry: ImageEntry):
+        by_name = self._entries.setdefault(entry.image_type, {})
+        if entry.filename in by_name:
+            self._remove(entry.image_type, entry.filename)
+        by_name[entry.filename] = entry
+
+        tokens = self._tokens.setdefault(entry.image_type, {})
+        for token in entry.tokens:
+            if token not in tokens:
+                tokens[token] = set()
+                self._sorted.pop(entry.image_type, None)
+            tokens[token].add(entry.filename)
+
+    def _remove(self, image_type: str, filename: str):
+        entry = self._entries.get(image_type, {}).pop(filename, None)
+        if not entry:
+            return
+        tokens = self._tokens.get(image_type, {})
+        for token in entry.tokens:
+            names = tokens.get(token)
+            if names is not None:
+                names.discard(filename)
+                if not names:
+                    del tokens[token]
+                    self._sorted.pop(image_type, None)
+
+    def add(self, entry: ImageEntry):
+        with self._lock:
+            self._add(entry)
+
+    def remove(self, image_type: str, filename: str):
+        with self._lock:
+            self._remove(image_type, filename)
+
+    def get(self, image_type: str, filename: str) -> Optional[ImageEntry]:
+        with self._lock:
+            return self._entries.get(image_type, {}).get(filename)
+
+    def _token_matches(self, image_type: str, token: str) -> Set[str]:
+        tokens = self._tokens.get(image_type, {})
+        keys   = self._sorted.get(image_type)
+        if keys is None:
+            keys = sorted(tokens)
+            self._sorted[image_type] = keys
+
+        out = set()
+        i   = bisect.bisect_left(keys, token)
+        while i < len(keys) and keys[i].startswith(token):
+            out |= tokens[keys[i]]
+            i += 1
+        return out
+
+    def search(self, image_type: str, q: str, limit: int) -> List[ImageEntry]:
+        with self._lock:
+            by_name = self._entries.get(image_type, {})
+            q_norm  = (q or "").strip().lower()
+            if not q_norm:
+                return [by_name[n] for n in sorted(by_name)[:limit]]
+
+            names: Optional[Set[str]] = None
+            for token in _tokenize(q_norm):
+                matches = self._token_matches(image_type, token)
+                names   = matches if names is None else names & matches
+                if not names:
+                    break
+
+            if not names:
+                # fall back to raw substring matching for queries that straddle token boundaries
+                names = {n for n in by_name if q_norm in n.lower()}
+
+            ranked = sorted(names, key=lambda n: (not n.lower().startswith(q_norm), n))
+            return [by_name[n] for n in ranked[:limit]]
+
+    def rows(self) -> List[List[Any]]:
+        with self._lock:
+            return [entry.to_row() for by_name in self._entries.values() for entry in by_name.values()]
+
+    def __len__(self) -> int:
+        return sum(len(by_name) for by_name in self._entries.values())
+
+
+_catalog           : Optional[ImageCatalog] = None
+_catalog_loaded_at = 0.0
+_catalog_lock      = threading.Lock()
+
+# uploads/deletes seen since the last sync, replayed over every snapshot reload
+_pending_changes   : Dict[Tuple[str, str], Optional[ImageEntry]] = {}
+
+
+def _iso(val: Any) -> Optional[str]:
+    return val.isoformat() if isinstance(val, datetime) else val
+
+
+def _catalog_key(path: str) -> Optional[Tuple[str, str]]:
+    # only "{type}/{filename}" blobs are catalogued; derived variants live deeper and are skipped
+    image_type, sep, filename = path.partition("/")
+    if not sep or not filename or "/" in filename:
+        return None
+    return image_type, filename
+
+
+def _list_image_entries() -> Iterable[ImageEntry]:
+    container = get_blob_service_client().get_container_client(BLOB_CONTAINER_IMAGES)
+    for blob in container.list_blobs():
+        key = _catalog_key(blob.name)
+        if key is None:
+            continue
+        yield ImageEntry(key[0], key[1], blob.size, _iso(blob.last_modified))
+
+
+def _write_snapshot(catalog: ImageCatalog):
+    container = get_blob_service_client().get_container_client(BLOB_CONTAINER_CATALOG)
+    try:
+        container.create_container()
+    except ResourceExistsError:
+        pass
+    body = gzip.compress(json.dumps(catalog.rows(), separators=(",", ":")).encode("utf-8"))
+    container.get_blob_client(IMAGE_CATALOG_SNAPSHOT).upload_blob(body, overwrite=True)
+
+
+def _read_snapshot() -> Optional[ImageCatalog]:
+    blob = get_blob_service_client().get_blob_client(container=BLOB_CONTAINER_CATALOG, blob=IMAGE_CATALOG_SNAPSHOT)
+    try:
+        rows = json.loads(gzip.decompress(blob.download_blob().readall()).decode("utf-8"))
+    except ResourceNotFoundError:
+        return None
+    return ImageCatalog(ImageEntry(*row) for row in rows)
+
+
+def sync_image_catalog() -> Dict[str, Any]:
+    global _catalog, _catalog_loaded_at
+
+    catalog = ImageCatalog(_list_image_entries())
+    _write_snapshot(catalog)
+    publish(ImagesChanged())
+    with _catalog_lock:
+        _catalog           = catalog
+        _catalog_loaded_at = time.monotonic()
+        _pending_changes.clear()
+    return {"images": len(catalog)}
+
+
+def get_image_catalog() -> ImageCatalog:
+    global _catalog, _catalog_loaded_at
+
+    poll_events()
+    if _catalog is not None and time.monotonic() - _catalog_loaded_at < IMAGE_CATALOG_TTL_SECONDS:
+        return _catalog
+
+    with _catalog_lock:
+        if _catalog is not None and time.monotonic() - _catalog_loaded_at < IMAGE_CATALOG_TTL_SECONDS:
+            return _catalog
+        try:
+            snapshot = _read_snapshot()
+        except Exception:
+            logging.exception("Could not load image catalog snapshot")
+            snapshot = None
+
+        if snapshot is None and _catalog is None:
+            # no sync has run yet (fresh deployment): list the container once and leave a snapshot for the others
+            try:
+                snapshot = ImageCatalog(_list_image_entries())
+                _write_snapshot(snapshot)
+            except Exception:
+                logging.exception("Could not build image catalog from the container")
+                if snapshot is None:
+                    snapshot = ImageCatalog()
+
+        if snapshot is not None:
+            for (image_type, filename), entry in _pending_changes.items():
+                if entry is None:
+                    snapshot.remove(image_type, filename)
+                else:
+                    snapshot.add(entry)
+            _catalog = snapshot
+        _catalog_loaded_at = time.monotonic()
+        return _catalog
+
+
+def _on_images_changed(event: ImagesChanged):
+    global _catalog_loaded_at
+
+    # a full sync happened elsewhere, reload the snapshot on next use; single-file changes are replayed locally
+    if event.filename is None:
+        _catalog_loaded_at = 0.0
+
+
+subscribe(ImagesChanged, _on_images_changed)
+
+
+def record_image_upload(image_type: str, filename: str, size: Optional[int] = None, last_modified: Any = None):
+    entry = ImageEntry(image_type, filename, size, _iso(last_modified))
+    with _catalog_lock:
+        _pending_changes[(image_type, filename)] = entry
+    get_image_catalog().add(entry)
+    publish(ImagesChanged(image_type=image_type, filename=filename))
+
+
+def record_image_delete(image_type: str, filename: str):
+    with _catalog_lock:
+        _pending_changes[(image_type, filename)] = None
+    get_image_catalog().remove(image_type, filename)
+    publish(ImagesChanged(image_type=image_type, filename=filename))
+
+
+def observe_image(path: str, exists: bool, size: Optional[int] = None, last_modified: Any = None):
+    # the image route notices blobs added or removed outside the API before the next sync does
+    key = _catalog_key(path)
+    if key is None:
+        return
+    known = get_image_catalog().get(*key)
+    if exists and known is None:
+        record_image_upload(key[0], key[1], size, last_modified)
+    elif not exists and known is not None:
+        record_image_delete(*key)
+
+
+def search_image_catalog(image_type: str, q: str, limit: int) -> List[Tuple[str, Optional[int], Optional[str]]]:
+    return [(e.filename, e.size, e.last_modified) for e in get_image_catalog().search(image_type, q, limit)]
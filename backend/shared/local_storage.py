@@ -0,0 +1,623 @@
+import base64
+import bisect
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from azure.core.paging import ItemPaged
+from azure.data.tables import TableEntity, TableTransactionError, UpdateMode
+from azure.storage.blob import ContentSettings
+from shared.odata import evaluate_filter, parse_filter, pinned_partition
+
+# offline stand-ins for the Table and Blob clients, covering only the calls this app makes
+
+STORAGE_SQLITE_PATH       = os.environ.get("STORAGE_SQLITE_PATH", "local-storage.sqlite3")
+STORAGE_TABLE_LATENCY_MS  = float(os.environ.get("STORAGE_TABLE_LATENCY_MS", "0"))
+STORAGE_BLOB_LATENCY_MS   = float(os.environ.get("STORAGE_BLOB_LATENCY_MS", "0"))
+STORAGE_LATENCY_JITTER    = float(os.environ.get("STORAGE_LATENCY_JITTER", "0.25"))
+STORAGE_BLOB_MB_PER_SECOND = float(os.environ.get("STORAGE_BLOB_MB_PER_SECOND", "0"))
+
+TABLE_PAGE_MAX    = 1000
+TRANSACTION_MAX   = 100
+BLOB_CHUNK_BYTES  = 4 * 1024 * 1024
+
+Key = Tuple[str, str]
+
+
+def _round_trip(base_ms: float, nbytes: int = 0):
+    # one simulated service call; jitter is uniform around the base so percentiles have some spread
+    delay = base_ms / 1000.0
+    if delay > 0 and STORAGE_LATENCY_JITTER > 0:
+        delay *= 1 + random.uniform(-STORAGE_LATENCY_JITTER, STORAGE_LATENCY_JITTER)
+    if nbytes and STORAGE_BLOB_MB_PER_SECOND > 0:
+        delay += nbytes / (STORAGE_BLOB_MB_PER_SECOND * 1024 * 1024)
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _new_etag() -> str:
+    return f'W/"datetime\'{_now().isoformat()}\'-{uuid.uuid4().hex[:8]}"'
+
+
+def _encode_value(val: Any) -> Any:
+    if isinstance(val, (bytes, bytearray)):
+        return {"$b64": base64.b64encode(bytes(val)).decode("ascii")}
+    if isinstance(val, datetime):
+        return {"$dt": val.isoformat()}
+    return val
+
+
+def _decode_value(val: Any) -> Any:
+    if isinstance(val, dict) and "$b64" in val:
+        return base64.b64decode(val["$b64"])
+    if isinstance(val, dict) and "$dt" in val:
+        return datetime.fromisoformat(val["$dt"])
+    return val
+
+
+class MemoryStore:
+    def __init__(self):
+        self.lock        = threading.RLock()
+        self._tables     : Dict[str, Dict[Key, Tuple[Dict[str, Any], str, datetime]]] = {}
+        self._keys       : Dict[str, List[Key]] = {}
+        self._containers : Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    # tables
+
+    def create_table(self, table: str) -> bool:
+        with self.lock:
+            if table in self._tables:
+                return False
+            self._tables[table] = {}
+            self._keys[table]   = []
+            return True
+
+    def rows(self, table: str, partition: Optional[str], start: Optional[Key]) -> List[Tuple[Key, Dict[str, Any], str, datetime]]:
+        # at most one service page plus one row, so the caller knows whether to hand out a continuation
+        with self.lock:
+            keys = self._keys.get(table, [])
+            lo   = bisect.bisect_left(keys, start) if start else 0
+            if partition is not None:
+                lo = max(lo, bisect.bisect_left(keys, (partition, "")))
+            hi = bisect.bisect_left(keys, (partition + "\x00", "")) if partition is not None else len(keys)
+            data = self._tables.get(table, {})
+            return [(key, *data[key]) for key in keys[lo:min(hi, lo + TABLE_PAGE_MAX + 1)]]
+
+    def get_row(self, table: str, key: Key) -> Optional[Tuple[Dict[str, Any], str, datetime]]:
+        with self.lock:
+            return self._tables.get(table, {}).get(key)
+
+    def write_rows(self, table: str, puts: List[Tuple[Key, Dict[str, Any], str, datetime]], deletes: List[Key]):
+        with self.lock:
+            self.create_table(table)
+            data, keys = self._tables[table], self._keys[table]
+            for key in deletes:
+                if data.pop(key, None) is not None:
+                    del keys[bisect.bisect_left(keys, key)]
+            for key, props, etag, ts in puts:
+                if key not in data:
+                    bisect.insort(keys, key)
+                data[key] = (props, etag, ts)
+
+    # blobs
+
+    def create_container(self, container: str) -> bool:
+        with self.lock:
+            if container in self._containers:
+                return False
+            self._containers[container] = {}
+            return True
+
+    def get_blob(self, container: str, name: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return self._containers.get(container, {}).get(name)
+
+    def put_blob(self, container: str, name: str, record: Dict[str, Any]):
+        with self.lock:
+            self._containers.setdefault(container, {})[name] = record
+
+    def delete_blob(self, container: str, name: str) -> bool:
+        with self.lock:
+            return self._containers.get(container, {}).pop(name, None) is not None
+
+    def list_blobs(self, container: str, prefix: str) -> List[Tuple[str, Dict[str, Any]]]:
+        with self.lock:
+            blobs = self._containers.get(container, {})
+            return [(name, blobs[name]) for name in sorted(blobs) if name.startswith(prefix)]
+
+
+class SQLiteStore:
+    # one file shared by every worker on the machine; rows are JSON with typed wrappers for bytes and datetimes
+    def __init__(self, path: str):
+        self.lock = threading.RLock()
+        self._db  = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tables (name TEXT PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS entities (
+                tbl TEXT, pk TEXT, rk TEXT, body TEXT, etag TEXT, ts TEXT,
+                PRIMARY KEY (tbl, pk, rk)
+            );
+            CREATE TABLE IF NOT EXISTS containers (name TEXT PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS blobs (
+                container TEXT, name TEXT, data BLOB, meta TEXT,
+                PRIMARY KEY (container, name)
+            );
+            """
+        )
+
+    def _row(self, row: Tuple[str, str, str, str, str]) -> Tuple[Key, Dict[str, Any], str, datetime]:
+        pk, rk, body, etag, ts = row
+        return (pk, rk), {k: _decode_value(v) for k, v in json.loads(body).items()}, etag, datetime.fromisoformat(ts)
+
+    def create_table(self, table: str) -> bool:
+        with self.lock:
+            return self._db.execute("INSERT OR IGNORE INTO tables (name) VALUES (?)", (table,)).rowcount == 1
+
+    def rows(self, table: str, partition: Optional[str], start: Optional[Key]) -> List[Tuple[Key, Dict[str, Any], str, datetime]]:
+        sql, args = "SELECT pk, rk, body, etag, ts FROM entities WHERE tbl = ?", [table]
+        if partition is not None:
+            sql += " AND pk = ?"
+            args.append(partition)
+        if start:
+            sql += " AND (pk > ? OR (pk = ? AND rk >= ?))"
+            args.extend([start[0], start[0], start[1]])
+        sql += " ORDER BY pk, rk LIMIT ?"
+        args.append(TABLE_PAGE_MAX + 1)
+        with self.lock:
+            return [self._row(row) for row in self._db.execute(sql, args).fetchall()]
+
+    def get_row(self, table: str, key: Key) -> Optional[Tuple[Dict[str, Any], str, datetime]]:
+        with self.lock:
+            row = self._db.execute(
+                "SELECT pk, rk, body, etag, ts FROM entities WHERE tbl = ? AND pk = ? AND rk = ?", (table, *key)
+            ).fetchone()
+        return self._row(row)[1:] if row else None
+
+    def write_rows(self, table: str, puts: List[Tuple[Key, Dict[str, Any], str, datetime]], deletes: List[Key]):
+        with self.lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("INSERT OR IGNORE INTO tables (name) VALUES (?)", (table,))
+                self._db.executemany("DELETE FROM entities WHERE tbl = ? AND pk = ? AND rk = ?", [(table, *key) for key in deletes])
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO entities (tbl, pk, rk, body, etag, ts) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (table, key[0], key[1], json.dumps({k: _encode_value(v) for k, v in props.items()}), etag, ts.isoformat())
+                        for key, props, etag, ts in puts
+                    ],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def create_container(self, container: str) -> bool:
+        with self.lock:
+            return self._db.execute("INSERT OR IGNORE INTO containers (name) VALUES (?)", (container,)).rowcount == 1
+
+    def get_blob(self, container: str, name: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self._db.execute("SELECT data, meta FROM blobs WHERE container = ? AND name = ?", (container, name)).fetchone()
+        if row is None:
+            return None
+        record = {k: _decode_value(v) for k, v in json.loads(row[1]).items()}
+        record["data"] = bytearray(row[0])
+        return record
+
+    def put_blob(self, container: str, name: str, record: Dict[str, Any]):
+        meta = json.dumps({k: _encode_value(v) for k, v in record.items() if k != "data"})
+        with self.lock:
+            self._db.execute("INSERT OR IGNORE INTO containers (name) VALUES (?)", (container,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO blobs (container, name, data, meta) VALUES (?, ?, ?, ?)",
+                (container, name, bytes(record["data"]), meta),
+            )
+
+    def delete_blob(self, container: str, name: str) -> bool:
+        with self.lock:
+            return self._db.execute("DELETE FROM blobs WHERE container = ? AND name = ?", (container, name)).rowcount == 1
+
+    def list_blobs(self, container: str, prefix: str) -> List[Tuple[str, Dict[str, Any]]]:
+        with self.lock:
+            rows = self._db.execute(
+                "SELECT name FROM blobs WHERE container = ? AND substr(name, 1, ?) = ? ORDER BY name",
+                (container, len(prefix), prefix),
+            ).fetchall()
+        return [(name, self.get_blob(container, name)) for (name,) in rows]
+
+
+# tables
+
+
+def _entity(key: Key, props: Dict[str, Any], etag: str, ts: datetime, select: Optional[List[str]] = None) -> TableEntity:
+    ent = TableEntity()
+    ent["PartitionKey"], ent["RowKey"] = key
+    for name, val in props.items():
+        if select is None or name in select:
+            ent[name] = val
+    if select is not None:
+        for name in ("PartitionKey", "RowKey"):
+            if name not in select:
+                del ent[name]
+    ent._metadata = {"etag": etag, "timestamp": ts}
+    return ent
+
+
+def _split(entity: Dict[str, Any]) -> Tuple[Key, Dict[str, Any]]:
+    key = (str(entity["PartitionKey"]), str(entity["RowKey"]))
+    return key, {k: v for k, v in entity.items() if k not in ("PartitionKey", "RowKey")}
+
+
+class LocalTableClient:
+    def __init__(self, store: Any, table_name: str):
+        self.store      = store
+        self.table_name = table_name
+
+    def _paged(self, query_filter: Optional[str], select: Optional[List[str]], results_per_page: Optional[int]) -> ItemPaged:
+        node      = parse_filter(query_filter)
+        partition = pinned_partition(node)
+        page_size = min(results_per_page or TABLE_PAGE_MAX, TABLE_PAGE_MAX)
+
+        def get_next(token: Optional[Dict[str, str]]) -> Tuple[List[TableEntity], Optional[Dict[str, str]]]:
+            _round_trip(STORAGE_TABLE_LATENCY_MS)
+            start = (token["PartitionKey"], token["RowKey"]) if token else None
+            out   : List[TableEntity] = []
+            for scanned, (key, props, etag, ts) in enumerate(self.store.rows(self.table_name, partition, start)):
+                # like the service, a page ends after a thousand rows examined even if few of them matched
+                if len(out) == page_size or scanned == TABLE_PAGE_MAX:
+                    return out, {"PartitionKey": key[0], "RowKey": key[1]}
+                ent = _entity(key, props, etag, ts)
+                if evaluate_filter(node, ent):
+                    out.append(_entity(key, props, etag, ts, select) if select else ent)
+            return out, None
+
+        def extract(page: Tuple[List[TableEntity], Optional[Dict[str, str]]]):
+            rows, token = page
+            return token, iter(rows)
+
+        return ItemPaged(get_next, extract)
+
+    def query_entities(
+        self,
+        query_filter: str,
+        *,
+        parameters: Optional[Dict[str, Any]] = None,
+        select: Optional[List[str]] = None,
+        results_per_page: Optional[int] = None,
+        **kwargs: Any,
+    ) -> ItemPaged:
+        for name, val in (parameters or {}).items():
+            literal      = "'" + str(val).replace("'", "''") + "'" if isinstance(val, str) else str(val)
+            query_filter = query_filter.replace(f"@{name}", literal)
+        return self._paged(query_filter, select, results_per_page)
+
+    def list_entities(self, *, select: Optional[List[str]] = None, results_per_page: Optional[int] = None, **kwargs: Any) -> ItemPaged:
+        return self._paged(None, select, results_per_page)
+
+    def get_entity(self, partition_key: str, row_key: str, *, select: Optional[List[str]] = None, **kwargs: Any) -> TableEntity:
+        _round_trip(STORAGE_TABLE_LATENCY_MS)
+        row = self.store.get_row(self.table_name, (partition_key, row_key))
+        if row is None:
+            raise ResourceNotFoundError(f"Entity {partition_key}/{row_key} not found in {self.table_name}")
+        return _entity((partition_key, row_key), *row, select)
+
+    def _write(self, ops: List[Tuple[str, Dict[str, Any], Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        # validates every op against current state, then applies them together
+        now     = _now()
+        puts    : Dict[Key, Tuple[Key, Dict[str, Any], str, datetime]] = {}
+        deletes : List[Key] = []
+        results = []
+        with self.store.lock:
+            for index, (op, entity, options) in enumerate(ops):
+                key, props = _split(entity)
+                current    = self.store.get_row(self.table_name, key)
+                etag       = options.get("etag")
+                if op in ("update", "delete") and options.get("match_condition") == MatchConditions.IfNotModified:
+                    if current is None or current[1] != etag:
+                        if len(ops) == 1:
+                            raise ResourceModifiedError(f"Entity {key[0]}/{key[1]} was modified")
+                        raise TableTransactionError(message=f"{index}:UpdateConditionNotSatisfied", index=index)
+                if op == "create" and current is not None:
+                    if len(ops) == 1:
+                        raise ResourceExistsError(f"Entity {key[0]}/{key[1]} already exists")
+                    raise TableTransactionError(message=f"{index}:EntityAlreadyExists", index=index)
+                if op == "update" and current is None:
+                    if len(ops) == 1:
+                        raise ResourceNotFoundError(f"Entity {key[0]}/{key[1]} not found")
+                    raise TableTransactionError(message=f"{index}:ResourceNotFound", index=index)
+
+                if op == "delete":
+                    deletes.append(key)
+                    results.append({})
+                    continue
+
+                mode = options.get("mode", UpdateMode.MERGE)
+                if current is not None and mode in (UpdateMode.MERGE, "merge"):
+                    props = {**current[0], **props}
+                new_etag  = _new_etag()
+                puts[key] = (key, props, new_etag, now)
+                results.append({"etag": new_etag, "date": now})
+
+            self.store.write_rows(self.table_name, list(puts.values()), deletes)
+        return results
+
+    def create_entity(self, entity: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        _round_trip(STORAGE_TABLE_LATENCY_MS)
+        return self._write([("create", entity, kwargs)])[0]
+
+    def upsert_entity(self, entity: Dict[str, Any], mode: UpdateMode = UpdateMode.MERGE, **kwargs: Any) -> Dict[str, Any]:
+        _round_trip(STORAGE_TABLE_LATENCY_MS)
+        return self._write([("upsert", entity, {**kwargs, "mode": mode})])[0]
+
+    def update_entity(self, entity: Dict[str, Any], mode: UpdateMode = UpdateMode.MERGE, **kwargs: Any) -> Dict[str, Any]:
+        _round_trip(STORAGE_TABLE_LATENCY_MS)
+        return self._write([("update", entity, {**kwargs, "mode": mode})])[0]
+
+    def delete_entity(self, *args: Any, **kwargs: Any) -> None:
+        # like the SDK: accepts an entity or partition_key/row_key, and a missing entity is not an error
+        _round_trip(STORAGE_TABLE_LATENCY_MS)
+        if args and isinstance(args[0], dict):
+            entity = args[0]
+        elif "entity" in kwargs:
+            entity = kwargs.pop("entity")
+        else:
+            pk     = args[0] if args else kwargs.pop("partition_key")
+            rk     = args[1] if len(args) > 1 else kwargs.pop("row_key")
+            entity = {"PartitionKey": pk, "RowKey": rk}
+        key, _ = _split(entity)
+        if self.store.get_row(self.table_name, key) is None and kwargs.get("match_condition") != MatchConditions.IfNotModified:
+            return
+        self._write([("delete", entity, kwargs)])
+
+    def submit_transaction(self, operations: Iterable[Any], **kwargs: Any) -> List[Dict[str, Any]]:
+        _round_trip(STORAGE_TABLE_LATENCY_MS)
+        ops = []
+        for op in operations:
+            name, entity = op[0], op[1]
+            options      = dict(op[2]) if len(op) > 2 else {}
+            ops.append((str(getattr(name, "value", name)).lower(), entity, options))
+
+        if not ops:
+            return []
+        if len(ops) > TRANSACTION_MAX:
+            raise TableTransactionError(message=f"0:A batch can hold at most {TRANSACTION_MAX} operations", index=0)
+        partitions = {str(entity["PartitionKey"]) for _, entity, _ in ops}
+        if len(partitions) > 1:
+            raise TableTransactionError(message="0:All operations in a batch must share a PartitionKey", index=0)
+        seen = set()
+        for index, (_, entity, _) in enumerate(ops):
+            if entity["RowKey"] in seen:
+                raise TableTransactionError(message=f"{index}:InvalidDuplicateRow", index=index)
+            seen.add(entity["RowKey"])
+
+        return self._write(ops)
+
+
+class LocalTableServiceClient:
+    def __init__(self, store: Any):
+        self.store = store
+
+    def create_table_if_not_exists(self, table_name: str) -> LocalTableClient:
+        self.store.create_table(table_name)
+        return LocalTableClient(self.store, table_name)
+
+    def get_table_client(self, table_name: str) -> LocalTableClient:
+        return LocalTableClient(self.store, table_name)
+
+
+# blobs
+
+
+class LocalBlobProperties:
+    def __init__(self, container: str, name: str, record: Dict[str, Any]):
+        self.container        = container
+        self.name             = name
+        self.size             = len(record["data"])
+        self.etag             = record["etag"]
+        self.last_modified    = record["last_modified"]
+        self.blob_type        = record.get("blob_type", "BlockBlob")
+        self.content_settings = ContentSettings(
+            content_type  = record.get("content_type"),
+            cache_control = record.get("cache_control"),
+        )
+
+
+class LocalBlobDownloader:
+    def __init__(self, data: bytes, properties: LocalBlobProperties):
+        self._data      = data
+        self.properties = properties
+        self.size       = len(data)
+
+    def readall(self) -> bytes:
+        return self._data
+
+    def chunks(self) -> Iterable[bytes]:
+        for i in range(0, len(self._data), BLOB_CHUNK_BYTES):
+            yield self._data[i:i + BLOB_CHUNK_BYTES]
+
+
+class LocalBlobClient:
+    def __init__(self, store: Any, container: str, blob: str):
+        self.store          = store
+        self.container_name = container
+        self.blob_name      = blob
+
+    def _record(self) -> Dict[str, Any]:
+        record = self.store.get_blob(self.container_name, self.blob_name)
+        if record is None:
+            raise ResourceNotFoundError(f"Blob {self.container_name}/{self.blob_name} not found")
+        return record
+
+    def _check_conditions(self, record: Optional[Dict[str, Any]], kwargs: Dict[str, Any]):
+        etag      = kwargs.get("etag")
+        condition = kwargs.get("match_condition")
+        if condition == MatchConditions.IfNotModified and (record is None or record["etag"] != etag):
+            raise ResourceModifiedError(f"Blob {self.container_name}/{self.blob_name} was modified")
+        if condition == MatchConditions.IfMissing and record is not None:
+            raise ResourceExistsError(f"Blob {self.container_name}/{self.blob_name} already exists")
+        if kwargs.get("if_none_match") == "*" and record is not None:
+            raise ResourceExistsError(f"Blob {self.container_name}/{self.blob_name} already exists")
+
+    def exists(self, **kwargs: Any) -> bool:
+        _round_trip(STORAGE_BLOB_LATENCY_MS)
+        return self.store.get_blob(self.container_name, self.blob_name) is not None
+
+    def get_blob_properties(self, **kwargs: Any) -> LocalBlobProperties:
+        _round_trip(STORAGE_BLOB_LATENCY_MS)
+        return LocalBlobProperties(self.container_name, self.blob_name, self._record())
+
+    def download_blob(self, offset: Optional[int] = None, length: Optional[int] = None, **kwargs: Any) -> LocalBlobDownloader:
+        record = self._record()
+        data   = bytes(record["data"])
+        if offset is not None:
+            data = data[offset:offset + length] if length is not None else data[offset:]
+        _round_trip(STORAGE_BLOB_LATENCY_MS, len(data))
+        return LocalBlobDownloader(data, LocalBlobProperties(self.container_name, self.blob_name, record))
+
+    def upload_blob(
+        self,
+        data: Any,
+        overwrite: bool = False,
+        content_settings: Optional[ContentSettings] = None,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        body = data.read() if hasattr(data, "read") else data
+        body = body.encode("utf-8") if isinstance(body, str) else bytes(body)
+        _round_trip(STORAGE_BLOB_LATENCY_MS, len(body))
+        with self.store.lock:
+            current = self.store.get_blob(self.container_name, self.blob_name)
+            self._check_conditions(current, kwargs)
+            if current is not None and not overwrite and kwargs.get("match_condition") is None:
+                raise ResourceExistsError(f"Blob {self.container_name}/{self.blob_name} already exists")
+            record = {
+                "data"         : bytearray(body),
+                "etag"         : f'"0x{hashlib.blake2b(uuid.uuid4().bytes, digest_size=8).hexdigest().upper()}"',
+                "last_modified": _now(),
+                "content_type" : content_settings.content_type if content_settings else None,
+                "cache_control": content_settings.cache_control if content_settings else None,
+            }
+            self.store.put_blob(self.container_name, self.blob_name, record)
+        return {"etag": record["etag"], "last_modified": record["last_modified"]}
+
+    def create_append_blob(self, content_settings: Optional[ContentSettings] = None, **kwargs: Any) -> Dict[str, Any]:
+        _round_trip(STORAGE_BLOB_LATENCY_MS)
+        with self.store.lock:
+            self._check_conditions(self.store.get_blob(self.container_name, self.blob_name), kwargs)
+            record = {
+                "data"         : bytearray(),
+                "etag"         : f'"0x{uuid.uuid4().hex[:16].upper()}"',
+                "last_modified": _now(),
+                "blob_type"    : "AppendBlob",
+                "content_type" : content_settings.content_type if content_settings else None,
+            }
+            self.store.put_blob(self.container_name, self.blob_name, record)
+        return {"etag": record["etag"], "last_modified": record["last_modified"]}
+
+    def append_block(self, data: Any, **kwargs: Any) -> Dict[str, Any]:
+        body = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        _round_trip(STORAGE_BLOB_LATENCY_MS, len(body))
+        with self.store.lock:
+            record = self._record()
+            if record.get("blob_type") != "AppendBlob":
+                raise ResourceExistsError(f"Blob {self.container_name}/{self.blob_name} is not an append blob")
+            self._check_conditions(record, kwargs)
+            offset                  = len(record["data"])
+            record["data"]         += body
+            record["etag"]          = f'"0x{uuid.uuid4().hex[:16].upper()}"'
+            record["last_modified"] = _now()
+            self.store.put_blob(self.container_name, self.blob_name, record)
+        return {"etag": record["etag"], "last_modified": record["last_modified"], "blob_append_offset": str(offset)}
+
+    def delete_blob(self, **kwargs: Any) -> None:
+        _round_trip(STORAGE_BLOB_LATENCY_MS)
+        with self.store.lock:
+            self._check_conditions(self.store.get_blob(self.container_name, self.blob_name), kwargs)
+            if not self.store.delete_blob(self.container_name, self.blob_name):
+                raise ResourceNotFoundError(f"Blob {self.container_name}/{self.blob_name} not found")
+
+
+class LocalContainerClient:
+    def __init__(self, store: Any, container: str):
+        self.store          = store
+        self.container_name = container
+
+    def create_container(self, **kwargs: Any) -> Dict[str, Any]:
+        _round_trip(STORAGE_BLOB_LATENCY_MS)
+        if not self.store.create_container(self.container_name):
+            raise ResourceExistsError(f"Container {self.container_name} already exists")
+        return {}
+
+    def get_blob_client(self, blob: str) -> LocalBlobClient:
+        return LocalBlobClient(self.store, self.container_name, blob)
+
+    def upload_blob(self, name: str, data: Any, **kwargs: Any) -> LocalBlobClient:
+        client = self.get_blob_client(name)
+        client.upload_blob(data, **kwargs)
+        return client
+
+    def delete_blob(self, blob: str, **kwargs: Any) -> None:
+        self.get_blob_client(blob).delete_blob(**kwargs)
+
+    def list_blobs(self, name_starts_with: Optional[str] = None, results_per_page: Optional[int] = None, **kwargs: Any) -> ItemPaged:
+        page_size = results_per_page or 5000
+
+        def get_next(token: Optional[str]) -> Tuple[List[LocalBlobProperties], Optional[str]]:
+            _round_trip(STORAGE_BLOB_LATENCY_MS)
+            blobs = [
+                LocalBlobProperties(self.container_name, name, record)
+                for name, record in self.store.list_blobs(self.container_name, name_starts_with or "")
+                if token is None or name >= token
+            ]
+            if len(blobs) > page_size:
+                return blobs[:page_size], blobs[page_size].name
+            return blobs, None
+
+        def extract(page: Tuple[List[LocalBlobProperties], Optional[str]]):
+            blobs, token = page
+            return token, iter(blobs)
+
+        return ItemPaged(get_next, extract)
+
+
+class LocalBlobServiceClient:
+    def __init__(self, store: Any):
+        self.store = store
+
+    def get_container_client(self, container: str) -> LocalContainerClient:
+        return LocalContainerClient(self.store, container)
+
+    def get_blob_client(self, container: str, blob: str) -> LocalBlobClient:
+        return LocalBlobClient(self.store, container, blob)
+
+
+_stores      : Dict[str, Any] = {}
+_stores_lock = threading.Lock()
+
+
+def get_local_store(backend: str) -> Any:
+    # one store per backend and process, so every client sees the same data
+    with _stores_lock:
+        store = _stores.get(backend)
+        if store is None:
+            if backend == "memory":
+                store = MemoryStore()
+            elif backend == "sqlite":
+                store = SQLiteStore(STORAGE_SQLITE_PATH)
+            else:
+                raise ValueError(f"Unknown storage backend '{backend}'")
+            _stores[backend] = store
+        return store
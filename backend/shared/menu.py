@@ -1,30 +1,57 @@
+import hashlib
 import json
-from typing import Optional, Dict, Any, List
-from azure.storage.blob import BlobServiceClient
-from shared.database import get_connection_string
+import os
+from typing import Optional, Dict, Any, List, Tuple
+from shared.database import get_blob_service_client, get_table_client
 
 BLOB_CONTAINER_MENUS    = "menus"
 BLOB_CONTAINER_IMAGES   = "images"
 BLOB_STORAGE_ACCOUNT    = "ccmbg1bdc8"
 BLOB_BASE_URL           = f"https://{BLOB_STORAGE_ACCOUNT}.blob.core.windows.net/{BLOB_CONTAINER_IMAGES}"
+TABLE_MEALS             = "Meals"
 
-def get_image_url(image_type: str, filename: str) -> str:
-    return f"{BLOB_BASE_URL}/{image_type}/{filename}"
+# when set (e.g. https://<app>.azurewebsites.net/api), image urls point at the derivative route instead of raw blobs
+IMAGE_API_BASE_URL      = os.environ.get("IMAGE_API_BASE_URL", "").rstrip("/")
+IMAGE_VARIANT_FORMAT    = os.environ.get("IMAGE_VARIANT_FORMAT", "webp")
+IMAGE_VARIANT_QUALITY   = os.environ.get("IMAGE_VARIANT_QUALITY", "med")
+IMAGE_CARD_BANNER_WIDTH = int(os.environ.get("IMAGE_CARD_BANNER_WIDTH", "640"))
+IMAGE_CARD_LOGO_WIDTH   = int(os.environ.get("IMAGE_CARD_LOGO_WIDTH", "160"))
+IMAGE_MENU_ITEM_WIDTH   = int(os.environ.get("IMAGE_MENU_ITEM_WIDTH", "320"))
 
-def get_banner_url(restaurant_id: str) -> str:
-    return get_image_url("banners", f"{restaurant_id}.jpg")
+def get_image_url(image_type: str, filename: str, width: Optional[int] = None) -> str:
+    if not IMAGE_API_BASE_URL or not width:
+        return f"{BLOB_BASE_URL}/{image_type}/{filename}"
+    return (
+        f"{IMAGE_API_BASE_URL}/images/{image_type}/{filename}"
+        f"?w={width}&fmt={IMAGE_VARIANT_FORMAT}&q={IMAGE_VARIANT_QUALITY}"
+    )
+
+def get_banner_url(restaurant_id: str, width: Optional[int] = None) -> str:
+    return get_image_url("banners", f"{restaurant_id}.jpg", width)
+
+def get_logo_url(restaurant_id: str, width: Optional[int] = None) -> str:
+    return get_image_url("logos", f"{restaurant_id}.gif", width)
+
+def _menu_blob(restaurant_id: str) -> Any:
+    return get_blob_service_client().get_blob_client(container=BLOB_CONTAINER_MENUS, blob=f"{restaurant_id}/current.json")
+
+
+def get_menu_blob_etag(restaurant_id: str) -> Optional[str]:
+    try:
+        return _menu_blob(restaurant_id).get_blob_properties().etag
+    except Exception:
+        return None
 
-def get_logo_url(restaurant_id: str) -> str:
-    return get_image_url("logos", f"{restaurant_id}.gif")
 
 def get_menu_from_blob(restaurant_id: str) -> Optional[Dict[str, Any]]:
+    return get_menu_from_blob_versioned(restaurant_id)[0]
+
+
+def get_menu_from_blob_versioned(restaurant_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    # the menu and the ETag of the blob it was read from
     try:
-        conn_str    = get_connection_string()
-        bs          = BlobServiceClient.from_connection_string(conn_str)
-        blob_name   = f"{restaurant_id}/current.json"
-        blob_client = bs.get_blob_client(container=BLOB_CONTAINER_MENUS, blob=blob_name)
-        
-        data        = blob_client.download_blob().readall()
+        downloader  = _menu_blob(restaurant_id).download_blob()
+        data        = downloader.readall()
         menu_data   = json.loads(data.decode("utf-8"))
         
         details         = menu_data.get("restaurant_details", {})
@@ -35,13 +62,70 @@ def get_menu_from_blob(restaurant_id: str) -> Optional[Dict[str, Any]]:
             for item in category.get("items", []):
                 if item.get("image"):
                     item_id = item.get("id", "")
-                    item["image"] = get_image_url("food", f"{restaurant_id}_{item_id}.jpg")
+                    item["image"] = get_image_url("food", f"{restaurant_id}_{item_id}.jpg", IMAGE_MENU_ITEM_WIDTH)
         
-        return {
+        menu = {
             "phone_number"  : details.get("phone_number"),
             "description"   : details.get("description"),
             "menu_structure": menu_structure,
         }
+        return menu, downloader.properties.etag
     
     except Exception:
-        return None
+        return None, None
+
+
+def get_meals_menu_fallback(restaurant_id: str) -> Optional[Dict[str, Any]]:
+    return get_meals_menu_versioned(restaurant_id)[0]
+
+
+def get_meals_menu_versioned(restaurant_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    # versioned by the meal rows' own etags, which change on every write, rather than by the rendered body
+    client = get_table_client(TABLE_MEALS)
+    try:
+        entities = list(client.query_entities(f"PartitionKey eq '{restaurant_id}'"))
+    except Exception:
+        return None, None
+
+    if not entities:
+        return None, None
+
+    menu_items = []
+    for ent in entities:
+        meal_id     = ent.get("RowKey")
+        filename    = ent.get("image_filename") or f"{meal_id}.jpg"
+        image_type  = ent.get("image_type") or "food"
+        menu_items.append(
+            {
+                "id"         : meal_id,
+                "name"       : ent.get("name"),
+                "description": ent.get("description"),
+                "price"      : ent.get("price"),
+                "image"      : get_image_url(image_type, filename, IMAGE_MENU_ITEM_WIDTH) if filename else None,
+            }
+        )
+
+    menu_items.sort(key=lambda i: (i.get("name") or "").lower())
+    menu = {
+        "phone_number"  : None,
+        "description"   : None,
+        "menu_structure": [{"category_name": "Meals", "items": menu_items}],
+    }
+    digest = hashlib.blake2b(digest_size=12)
+    for ent in sorted(entities, key=lambda e: e.get("RowKey")):
+        digest.update(f"{ent.get('RowKey')}|{ent.metadata.get('etag')}\n".encode("utf-8"))
+    return menu, f"meals-{digest.hexdigest()}"
+
+
+def iter_menu_items(menu: Dict[str, Any]):
+    for category in menu.get("menu_structure") or []:
+        for item in category.get("items") or []:
+            if item.get("id") is not None:
+                yield item
+
+
+def compute_menu_version(menu: Dict[str, Any]) -> str:
+    digest = hashlib.sha1()
+    for item in iter_menu_items(menu):
+        digest.update(f"{item.get('id')}|{item.get('price')}|{item.get('name')}\n".encode("utf-8"))
+    return digest.hexdigest()[:12]
@@ -0,0 +1,88 @@
+import os
+from typing import Any, Dict, Optional
+from shared.cache import LRUCache
+from shared.events import MenuChanged, poll_events, subscribe
+from shared.menu import (
+    compute_menu_version,
+    get_meals_menu_fallback,
+    get_menu_from_blob,
+    iter_menu_items,
+)
+
+MENU_INDEX_MAX_RESTAURANTS = int(os.environ.get("MENU_INDEX_MAX_RESTAURANTS", "512"))
+MENU_INDEX_TTL_SECONDS     = float(os.environ.get("MENU_INDEX_TTL_SECONDS", "300"))
+
+
+class MenuItemPrice:
+    __slots__ = ("price", "available")
+
+    def __init__(self, price: Optional[float], available: bool):
+        self.price     = price
+        self.available = available
+
+
+class MenuIndex:
+    __slots__ = ("restaurant_id", "version", "items", "prices")
+
+    def __init__(self, restaurant_id: str, version: str, items: Dict[str, Dict[str, Any]]):
+        self.restaurant_id = restaurant_id
+        self.version       = version
+        self.items         = items
+        self.prices        = {item_id: _item_price(item) for item_id, item in items.items()}
+
+    def get(self, item_id: Any) -> Optional[Dict[str, Any]]:
+        return self.items.get(str(item_id))
+
+    def price_of(self, item_id: Any) -> Optional[MenuItemPrice]:
+        return self.prices.get(str(item_id))
+
+
+def _item_price(item: Dict[str, Any]) -> MenuItemPrice:
+    try:
+        price = round(float(item.get("price")), 2)
+    except Exception:
+        price = None
+    available = item.get("available", True) is not False and price is not None and price >= 0
+    return MenuItemPrice(price, available)
+
+
+_menu_indexes = LRUCache(maxsize=MENU_INDEX_MAX_RESTAURANTS, ttl_seconds=MENU_INDEX_TTL_SECONDS)
+
+
+def _build_menu_index(restaurant_id: str) -> Optional[MenuIndex]:
+    menu = get_menu_from_blob(restaurant_id) or get_meals_menu_fallback(restaurant_id)
+    if not menu:
+        return None
+
+    items: Dict[str, Dict[str, Any]] = {}
+    for item in iter_menu_items(menu):
+        items[str(item.get("id"))] = {
+            "name"       : item.get("name"),
+            "description": item.get("description"),
+            "image"      : item.get("image"),
+            "price"      : item.get("price"),
+            "available"  : item.get("available", item.get("is_available", True)),
+        }
+
+    return MenuIndex(restaurant_id, compute_menu_version(menu), items)
+
+
+def get_menu_index(restaurant_id: str) -> Optional[MenuIndex]:
+    if not restaurant_id:
+        return None
+
+    poll_events()
+    index = _menu_indexes.get(restaurant_id)
+    if index is None:
+        # missing menus are not cached so a transient blob failure cannot block checkout
+        index = _build_menu_index(restaurant_id)
+        if index is not None:
+            _menu_indexes.set(restaurant_id, index)
+    return index
+
+
+def invalidate_menu_index(restaurant_id: str):
+    _menu_indexes.invalidate(restaurant_id)
+
+
+subscribe(MenuChanged, lambda event: invalidate_menu_index(event.restaurant_id))
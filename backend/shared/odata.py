@@ -0,0 +1,213 @@
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# the subset of Table service $filter syntax this app writes:
+# comparisons of a property with a literal, joined by and/or/not and parentheses
+
+COMPARISON_OPS = ("eq", "ne", "gt", "ge", "lt", "le")
+
+_TOKEN_RE = re.compile(
+    r"\s*(?:"
+    r"(?P<str>'(?:[^']|'')*')"
+    r"|(?P<typed>(?:datetime|guid|X|binary)'[^']*')"
+    r"|(?P<num>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?L?)"
+    r"|(?P<paren>[()])"
+    r"|(?P<word>[A-Za-z_][A-Za-z0-9_]*)"
+    r")"
+)
+
+# ("cmp", field, op, value) | ("and", left, right) | ("or", left, right) | ("not", node)
+Node = Tuple[Any, ...]
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos    = 0
+    while pos < len(text):
+        if text[pos:].strip() == "":
+            break
+        match = _TOKEN_RE.match(text, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Unsupported filter near: {text[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos  = match.end()
+    return tokens
+
+
+def _literal(kind: str, raw: str) -> Any:
+    if kind == "str":
+        return raw[1:-1].replace("''", "'")
+    if kind == "typed":
+        return raw[raw.index("'") + 1:-1]
+    if kind == "num":
+        raw = raw.rstrip("L")
+        return float(raw) if any(c in raw for c in ".eE") else int(raw)
+    if raw == "true":
+        return True
+    if raw == "false":
+        return False
+    if raw == "null":
+        return None
+    raise ValueError(f"Unsupported literal {raw!r}")
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.pos    = 0
+
+    def _peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _take(self) -> Tuple[str, str]:
+        token = self._peek()
+        if token is None:
+            raise ValueError("Unexpected end of filter")
+        self.pos += 1
+        return token
+
+    def _keyword(self, word: str) -> bool:
+        token = self._peek()
+        if token and token[0] == "word" and token[1].lower() == word:
+            self.pos += 1
+            return True
+        return False
+
+    def parse(self) -> Node:
+        node = self._or()
+        if self._peek() is not None:
+            raise ValueError(f"Unexpected token {self._peek()[1]!r}")
+        return node
+
+    def _or(self) -> Node:
+        node = self._and()
+        while self._keyword("or"):
+            node = ("or", node, self._and())
+        return node
+
+    def _and(self) -> Node:
+        node = self._unary()
+        while self._keyword("and"):
+            node = ("and", node, self._unary())
+        return node
+
+    def _unary(self) -> Node:
+        if self._keyword("not"):
+            return ("not", self._unary())
+        token = self._peek()
+        if token == ("paren", "("):
+            self._take()
+            node = self._or()
+            if self._take() != ("paren", ")"):
+                raise ValueError("Expected ')'")
+            return node
+        return self._comparison()
+
+    def _comparison(self) -> Node:
+        kind, field = self._take()
+        if kind != "word":
+            raise ValueError(f"Expected a property name, got {field!r}")
+        kind, op = self._take()
+        if kind != "word" or op.lower() not in COMPARISON_OPS:
+            raise ValueError(f"Unsupported operator {op!r}")
+        kind, raw = self._take()
+        if kind not in ("str", "typed", "num", "word"):
+            raise ValueError(f"Expected a literal, got {raw!r}")
+        return ("cmp", field, op.lower(), _literal(kind, raw))
+
+
+def parse_filter(text: Optional[str]) -> Optional[Node]:
+    if not text or not text.strip():
+        return None
+    return _Parser(text).parse()
+
+
+def _conjuncts(node: Node) -> List[Node]:
+    if node[0] == "and":
+        return _conjuncts(node[1]) + _conjuncts(node[2])
+    return [node]
+
+
+_KIND_RANK = {"point": 0, "partition": 1, "range": 2, "scan": 3}
+
+
+def classify_filter(node: Optional[Node]) -> str:
+    # how much of the table the service has to walk: point < partition < range (of partitions) < scan
+    if node is None:
+        return "scan"
+    if node[0] == "or":
+        return max(classify_filter(node[1]), classify_filter(node[2]), key=_KIND_RANK.get)
+    if node[0] == "not":
+        return "scan"
+
+    parts = _conjuncts(node)
+    cmps  = [p for p in parts if p[0] == "cmp"]
+    pk_eq = any(f == "PartitionKey" and op == "eq" for _, f, op, _ in cmps)
+    rk_eq = any(f == "RowKey" and op == "eq" for _, f, op, _ in cmps)
+    if pk_eq and rk_eq:
+        return "point"
+    if pk_eq:
+        return "partition"
+
+    # a nested disjunction can still pin the partition, e.g. (PartitionKey eq 'a' or PartitionKey eq 'b')
+    kinds = [classify_filter(p) for p in parts if p[0] != "cmp"]
+    if any(f == "PartitionKey" and op in ("gt", "ge", "lt", "le") for _, f, op, _ in cmps):
+        kinds.append("range")
+    return min(kinds, key=_KIND_RANK.get) if kinds else "scan"
+
+
+def pinned_partition(node: Optional[Node]) -> Optional[str]:
+    # the PartitionKey an and-only filter is restricted to, so stores can read one partition
+    if node is None or node[0] in ("or", "not"):
+        return None
+    for part in _conjuncts(node):
+        if part[0] == "cmp" and part[1] == "PartitionKey" and part[2] == "eq" and isinstance(part[3], str):
+            return part[3]
+    return None
+
+
+_MISSING = object()
+
+_COMPARE = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "ge": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "le": lambda a, b: a <= b,
+}
+
+
+def _coerce(value: Any, literal: Any) -> Tuple[Any, Any]:
+    if isinstance(value, datetime) and isinstance(literal, str):
+        literal = datetime.fromisoformat(literal.replace("Z", "+00:00"))
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+    return value, literal
+
+
+def evaluate_filter(node: Optional[Node], entity: Dict[str, Any]) -> bool:
+    # like the service: a comparison against a missing property or a value of another type is false
+    if node is None:
+        return True
+    if node[0] == "and":
+        return evaluate_filter(node[1], entity) and evaluate_filter(node[2], entity)
+    if node[0] == "or":
+        return evaluate_filter(node[1], entity) or evaluate_filter(node[2], entity)
+    if node[0] == "not":
+        return not evaluate_filter(node[1], entity)
+
+    _, field, op, literal = node
+    value = entity.get(field, _MISSING)
+    if value is _MISSING or value is None or literal is None:
+        return False
+    try:
+        value, literal = _coerce(value, literal)
+        numeric = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (value, literal))
+        if not numeric and type(value) is not type(literal):
+            return False
+        return _COMPARE[op](value, literal)
+    except (TypeError, ValueError):
+        return False
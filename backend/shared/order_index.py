@@ -0,0 +1,148 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+from azure.core.exceptions import ResourceNotFoundError
+from shared.database import get_table_client
+
+TABLE_ORDERS             = "Orders"
+TABLE_ORDERS_BY_RECENCY  = "OrdersByRecency"
+
+ORDER_INDEX_READ_CONCURRENCY = int(os.environ.get("ORDER_INDEX_READ_CONCURRENCY", "8"))
+
+# written by rebuild_order_index once every order placed before the index existed has its rows
+BACKFILL_PARTITION = "meta"
+BACKFILL_ROW       = "backfill"
+
+# RowKeys sort ascending, so an inverted timestamp makes the newest order the first row of its partition
+_INVERT_FROM      = 10 ** 16
+_TRANSACTION_SIZE = 100
+
+_backfilled = False
+
+
+def _escape(val: str) -> str:
+    return (val or "").replace("'", "''")
+
+
+def _basket_partition(basket_id: str) -> str:
+    return f"basket:{basket_id}"
+
+
+def _restaurant_partition(restaurant_id: str) -> str:
+    return f"restaurant:{restaurant_id}"
+
+
+def recency_key(created_at: Optional[str], order_id: str) -> str:
+    try:
+        when = datetime.fromisoformat(created_at or "")
+    except ValueError:
+        when = datetime.now(timezone.utc)
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    micros = int(when.timestamp() * 1_000_000)
+    return f"{_INVERT_FROM - micros:016d}_{order_id}"
+
+
+def order_index_entities(order: Dict[str, Any]) -> List[Dict[str, Any]]:
+    row = {
+        "RowKey"       : order["recency_key"],
+        "order_id"     : order["RowKey"],
+        "basket_id"    : order.get("basket_id"),
+        "restaurant_id": order.get("restaurant_id"),
+        "created_at"   : order.get("created_at"),
+    }
+    return [
+        {**row, "PartitionKey": _basket_partition(order.get("basket_id") or "")},
+        {**row, "PartitionKey": _restaurant_partition(order.get("restaurant_id") or "")},
+    ]
+
+
+def index_order(order: Dict[str, Any]):
+    client = get_table_client(TABLE_ORDERS_BY_RECENCY)
+    for row in order_index_entities(order):
+        client.upsert_entity(row)
+
+
+def unindex_orders(orders: Iterable[Any]):
+    # one delete per row: the orders are already gone, so a row missing from a batch must not keep the others alive
+    client = get_table_client(TABLE_ORDERS_BY_RECENCY)
+    for order in orders:
+        key = order.get("recency_key")
+        if not key:
+            continue
+        for row in order_index_entities(dict(order)):
+            try:
+                client.delete_entity(partition_key=row["PartitionKey"], row_key=key)
+            except ResourceNotFoundError:
+                pass
+
+
+def order_index_ready() -> bool:
+    # until the backfill has run, older orders are missing from the index and listings read Orders instead
+    global _backfilled
+    if _backfilled:
+        return True
+    try:
+        get_table_client(TABLE_ORDERS_BY_RECENCY).get_entity(partition_key=BACKFILL_PARTITION, row_key=BACKFILL_ROW)
+    except ResourceNotFoundError:
+        return False
+    _backfilled = True
+    return True
+
+
+def order_index_filter(basket_id: str, restaurant_id: str) -> str:
+    # basket history is the common read; a basket+restaurant query filters inside the basket partition
+    if basket_id:
+        query = f"PartitionKey eq '{_escape(_basket_partition(basket_id))}'"
+        if restaurant_id:
+            query += f" and restaurant_id eq '{_escape(restaurant_id)}'"
+        return query
+    return f"PartitionKey eq '{_escape(_restaurant_partition(restaurant_id))}'"
+
+
+def load_indexed_order(row: Any) -> Optional[Any]:
+    # index rows can outlive their order for a moment (archive, failed write); those are skipped
+    try:
+        return get_table_client(TABLE_ORDERS).get_entity(partition_key="order", row_key=row.get("order_id"))
+    except ResourceNotFoundError:
+        return None
+
+
+def load_indexed_orders(rows: List[Any]) -> List[Any]:
+    if not rows:
+        return []
+    with ThreadPoolExecutor(max_workers=min(ORDER_INDEX_READ_CONCURRENCY, len(rows))) as pool:
+        return [ent for ent in pool.map(load_indexed_order, rows) if ent is not None]
+
+
+def rebuild_order_index() -> Dict[str, int]:
+    # backfill for orders placed before the index existed; stamps recency_key on orders that lack it
+    global _backfilled
+    orders_client = get_table_client(TABLE_ORDERS)
+    index_client  = get_table_client(TABLE_ORDERS_BY_RECENCY)
+    partitions    : Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    indexed       = 0
+
+    for ent in orders_client.query_entities("PartitionKey eq 'order'"):
+        order = dict(ent)
+        if not order.get("recency_key"):
+            order["recency_key"] = recency_key(order.get("created_at"), order["RowKey"])
+            orders_client.update_entity({"PartitionKey": "order", "RowKey": order["RowKey"], "recency_key": order["recency_key"]})
+        for row in order_index_entities(order):
+            partitions[row["PartitionKey"]].append(row)
+        indexed += 1
+
+    for rows in partitions.values():
+        for i in range(0, len(rows), _TRANSACTION_SIZE):
+            index_client.submit_transaction([("upsert", row) for row in rows[i:i + _TRANSACTION_SIZE]])
+
+    index_client.upsert_entity({
+        "PartitionKey": BACKFILL_PARTITION,
+        "RowKey"      : BACKFILL_ROW,
+        "orders"      : indexed,
+        "completed_at": datetime.now(timezone.utc).isoformat(),
+    })
+    _backfilled = True
+    return {"orders": indexed}
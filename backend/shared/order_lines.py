@@ -0,0 +1,127 @@
+import json
+import os
+import struct
+from typing import Any, Dict, List, Optional
+from shared.menu_index import get_menu_index
+
+# "json" stores lines as compact arrays, "packed" as a binary property
+ORDER_LINES_FORMAT = os.environ.get("ORDER_LINES_FORMAT", "json").strip().lower()
+
+_PACKED_VERSION = 1
+_PACKED_HEADER  = struct.Struct("<BH")
+_PACKED_LINE    = struct.Struct("<II")
+_PACKED_STR     = struct.Struct("<H")
+
+
+class OrderLine:
+    __slots__ = ("item_id", "quantity", "price_cents", "name")
+
+    def __init__(self, item_id: str, quantity: int, price_cents: int, name: Optional[str] = None):
+        self.item_id     = item_id
+        self.quantity    = quantity
+        self.price_cents = price_cents
+        self.name        = name
+
+    @property
+    def price(self) -> float:
+        return self.price_cents / 100
+
+
+def _to_cents(price: float) -> int:
+    return int(round(float(price) * 100))
+
+
+def build_order_lines(restaurant_id: str, items: List[Dict[str, Any]]) -> List[OrderLine]:
+    index = get_menu_index(restaurant_id)
+    lines = []
+    for it in items:
+        item_id   = str(it.get("id") or "")
+        menu_item = (index.get(item_id) if index else None) or {}
+        # every line keeps the name it was ordered under; menus are renamed and items retired after the fact
+        name      = it.get("name") or menu_item.get("name")
+        lines.append(OrderLine(item_id, int(it["quantity"]), _to_cents(it["price"]), name))
+    return lines
+
+
+def _pack_str(val: str) -> bytes:
+    raw = val.encode("utf-8")
+    return _PACKED_STR.pack(len(raw)) + raw
+
+
+def _unpack_str(buf: bytes, offset: int):
+    (length,) = _PACKED_STR.unpack_from(buf, offset)
+    offset   += _PACKED_STR.size
+    return buf[offset:offset + length].decode("utf-8"), offset + length
+
+
+def pack_order_lines(lines: List[OrderLine]) -> bytes:
+    out = [_PACKED_HEADER.pack(_PACKED_VERSION, len(lines))]
+    for line in lines:
+        out.append(_pack_str(line.item_id))
+        out.append(_PACKED_LINE.pack(line.quantity, line.price_cents))
+        out.append(_pack_str(line.name or ""))
+    return b"".join(out)
+
+
+def unpack_order_lines(buf: bytes) -> List[OrderLine]:
+    version, count = _PACKED_HEADER.unpack_from(buf, 0)
+    if version != _PACKED_VERSION:
+        raise ValueError(f"Unsupported packed order lines version {version}")
+
+    offset = _PACKED_HEADER.size
+    lines  = []
+    for _ in range(count):
+        item_id, offset       = _unpack_str(buf, offset)
+        quantity, price_cents = _PACKED_LINE.unpack_from(buf, offset)
+        offset               += _PACKED_LINE.size
+        name, offset          = _unpack_str(buf, offset)
+        lines.append(OrderLine(item_id, quantity, price_cents, name or None))
+    return lines
+
+
+def encode_order_lines(lines: List[OrderLine], menu_version: Optional[str]) -> Dict[str, Any]:
+    props: Dict[str, Any] = {"menu_version": menu_version}
+    if ORDER_LINES_FORMAT == "packed":
+        props["lines_packed"] = pack_order_lines(lines)
+    else:
+        compact = []
+        for line in lines:
+            row = [line.item_id, line.quantity, line.price_cents]
+            if line.name:
+                row.append(line.name)
+            compact.append(row)
+        props["lines_json"] = json.dumps(compact, separators=(",", ":"))
+    return props
+
+
+def decode_order_lines(ent: Any) -> Optional[List[OrderLine]]:
+    packed = ent.get("lines_packed")
+    if packed:
+        return unpack_order_lines(bytes(packed))
+
+    compact = ent.get("lines_json")
+    if compact:
+        return [
+            OrderLine(str(row[0]), int(row[1]), int(row[2]), row[3] if len(row) > 3 else None)
+            for row in json.loads(compact)
+        ]
+
+    return None
+
+
+def hydrate_order_lines(restaurant_id: str, lines: List[OrderLine], full: bool = True) -> List[Dict[str, Any]]:
+    index = get_menu_index(restaurant_id)
+    items = []
+    for line in lines:
+        menu_item = (index.get(line.item_id) if index else None) or {}
+        item = {
+            "id"      : line.item_id,
+            "name"    : line.name or menu_item.get("name"),
+            "price"   : line.price,
+            "quantity": line.quantity,
+            "image"   : menu_item.get("image"),
+        }
+        if full:
+            item["description"] = menu_item.get("description")
+        items.append(item)
+    return items
@@ -0,0 +1,140 @@
+import base64
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# a filtered page gives up after this many raw rows and hands back a cursor, so sparse matches cannot turn one request into a full scan
+PAGE_SCAN_MAX_ROWS = int(os.environ.get("PAGE_SCAN_MAX_ROWS", "2000"))
+TABLE_PAGE_MAX     = 1000
+
+# the same guard for filtered ndjson exports, which are allowed to read much further per request
+EXPORT_SCAN_MAX_ROWS = int(os.environ.get("EXPORT_SCAN_MAX_ROWS", "20000"))
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], scope: str = "") -> Dict[str, Any]:
+    # cursors are bound to the query that produced them; replaying one against another query is rejected
+    if not cursor:
+        return {}
+    try:
+        raw   = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        state = json.loads(raw)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(state, dict) or state.get("q", "") != scope:
+        raise ValueError("Invalid cursor")
+    return state
+
+
+def _table_token(value: Any) -> Optional[Dict[str, str]]:
+    if value is None:
+        return None
+    if not isinstance(value, dict) or not all(isinstance(value.get(k), (str, type(None))) for k in ("PartitionKey", "RowKey")):
+        raise ValueError("Invalid cursor")
+    return {"PartitionKey": value.get("PartitionKey"), "RowKey": value.get("RowKey")}
+
+
+class TableScan:
+    # lazily walks a table query page by page; cursor() resumes right after the last row handed out
+    def __init__(
+        self,
+        client: Any,
+        cursor: Optional[str] = None,
+        query_filter: Optional[str] = None,
+        select: Optional[List[str]] = None,
+        scope: str = "",
+        page_size: int = TABLE_PAGE_MAX,
+    ):
+        state = decode_cursor(cursor, scope)
+        try:
+            self._skip     = int(state.get("s") or 0)
+            self.page_size = int(state.get("n") or page_size)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+
+        self.client       = client
+        self.query_filter = query_filter
+        self.select       = select
+        self.scope        = scope
+        self._start       = _table_token(state.get("t"))
+        self._next        : Optional[Dict[str, str]] = self._start
+        self._rows        = 0
+        self._index       = self._skip
+
+    def __iter__(self) -> Iterator[Any]:
+        kwargs = {"results_per_page": self.page_size, "select": self.select}
+        if self.query_filter:
+            pager = self.client.query_entities(self.query_filter, **kwargs).by_page(continuation_token=self._start)
+        else:
+            pager = self.client.list_entities(**kwargs).by_page(continuation_token=self._start)
+
+        skip = self._skip
+        for page in pager:
+            rows        = list(page)
+            self._next  = pager.continuation_token
+            self._rows  = len(rows)
+            self._index = skip
+            for i in range(skip, len(rows)):
+                self._index = i + 1
+                yield rows[i]
+            skip        = 0
+            self._start = self._next
+            self._rows  = 0
+            self._index = 0
+            if self._next is None:
+                return
+
+    def cursor(self) -> Optional[str]:
+        if self._index < self._rows:
+            return encode_cursor({"q": self.scope, "t": self._start, "s": self._index, "n": self.page_size})
+        if self._next is None:
+            return None
+        return encode_cursor({"q": self.scope, "t": self._next, "s": 0, "n": self.page_size})
+
+
+def page_entities(
+    client: Any,
+    limit: int,
+    cursor: Optional[str] = None,
+    query_filter: Optional[str] = None,
+    select: Optional[List[str]] = None,
+    predicate: Optional[Callable[[Any], bool]] = None,
+    scope: str = "",
+) -> Tuple[List[Any], Optional[str]]:
+    # rows come back in table key order; the cursor is the service continuation of the page the
+    # response stopped in plus how many of that page's rows were already consumed
+    page_size = TABLE_PAGE_MAX if predicate else min(max(limit, 1), TABLE_PAGE_MAX)
+    scan      = TableScan(client, cursor, query_filter, select, scope, page_size)
+
+    out = []
+    for scanned, ent in enumerate(scan, 1):
+        if predicate is None or predicate(ent):
+            out.append(ent)
+        if len(out) >= limit or scanned >= PAGE_SCAN_MAX_ROWS:
+            return out, scan.cursor()
+    return out, None
+
+
+def scan_matches(scan: TableScan, predicate: Optional[Callable[[Any], bool]] = None, max_rows: int = EXPORT_SCAN_MAX_ROWS) -> Iterator[Any]:
+    # stops after max_rows raw rows however few matched; scan.cursor() then resumes right after the last row read
+    for scanned, ent in enumerate(scan, 1):
+        if predicate is None or predicate(ent):
+            yield ent
+        if scanned >= max_rows:
+            return
+
+
+def page_list(items: List[Any], limit: int, cursor: Optional[str] = None, scope: str = "") -> Tuple[List[Any], Optional[str]]:
+    # for result sets that are already materialised and sorted, e.g. an index read
+    try:
+        offset = max(0, int(decode_cursor(cursor, scope).get("o") or 0))
+    except TypeError:
+        raise ValueError("Invalid cursor")
+    page = items[offset:offset + limit]
+    if offset + limit >= len(items):
+        return page, None
+    return page, encode_cursor({"q": scope, "o": offset + limit})
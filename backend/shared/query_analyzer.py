@@ -0,0 +1,124 @@
+import contextvars
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Set, Tuple
+from shared.odata import classify_filter, parse_filter
+from shared.telemetry import current_route, metrics
+
+# off: pass through; log: warn once per route and query shape; strict: raise on unapproved table scans (tests)
+STORAGE_QUERY_ANALYZER = os.environ.get("STORAGE_QUERY_ANALYZER", "log").lower()
+
+metrics.describe("storage_queries_total", "counter", "Table queries by route, table and kind (point, partition, range, scan).")
+metrics.describe("storage_rows_read_total", "counter", "Entities returned by the table service, by route, table and query kind.")
+
+_allowed: contextvars.ContextVar[bool] = contextvars.ContextVar("table_scan_allowed", default=False)
+
+_warned      : Set[Tuple[str, str, str]] = set()
+_warned_lock = threading.Lock()
+
+
+class TableScanError(RuntimeError):
+    pass
+
+
+@contextmanager
+def allow_table_scan() -> Iterator[None]:
+    # marks a deliberate full scan (admin exports, rebuilds, background jobs) so strict mode lets it through
+    token = _allowed.set(True)
+    try:
+        yield
+    finally:
+        _allowed.reset(token)
+
+
+def classify_query(query_filter: Optional[str]) -> str:
+    try:
+        return classify_filter(parse_filter(query_filter))
+    except ValueError:
+        return "scan"
+
+
+def _check(table: str, kind: str, query_filter: Optional[str]):
+    route = current_route()
+    metrics.inc("storage_queries_total", route=route, table=table, kind=kind)
+    if kind != "scan" or _allowed.get():
+        return
+
+    message = f"Table scan on {table} from route '{route or '-'}': {query_filter or '<all entities>'}"
+    if STORAGE_QUERY_ANALYZER == "strict":
+        raise TableScanError(message)
+
+    # the filter values vary per request; the shape of the first one seen is enough to find the caller
+    key = (route, table, (query_filter or "")[:60])
+    with _warned_lock:
+        if key in _warned:
+            return
+        _warned.add(key)
+    logging.warning(message)
+
+
+class _CountingPager:
+    def __init__(self, pager: Any, table: str, kind: str):
+        self._pager = pager
+        self._table = table
+        self._kind  = kind
+        self._route = current_route()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Any:
+        rows = list(next(self._pager))
+        metrics.inc("storage_rows_read_total", len(rows), route=self._route, table=self._table, kind=self._kind)
+        return iter(rows)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pager, name)
+
+
+class _CountingPaged:
+    def __init__(self, paged: Any, table: str, kind: str):
+        self._paged = paged
+        self._table = table
+        self._kind  = kind
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+    def by_page(self, *args, **kwargs):
+        return _CountingPager(self._paged.by_page(*args, **kwargs), self._table, self._kind)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._paged, name)
+
+
+class AnalyzedTableClient:
+    # classifies every query made through the wrapped table client and counts the rows it pulls
+    def __init__(self, client: Any, table: str):
+        self._client = client
+        self._table  = table
+
+    def query_entities(self, query_filter: str, *args, **kwargs) -> Any:
+        kind = classify_query(query_filter)
+        _check(self._table, kind, query_filter)
+        return _CountingPaged(self._client.query_entities(query_filter, *args, **kwargs), self._table, kind)
+
+    def list_entities(self, *args, **kwargs) -> Any:
+        _check(self._table, "scan", None)
+        return _CountingPaged(self._client.list_entities(*args, **kwargs), self._table, "scan")
+
+    def get_entity(self, *args, **kwargs) -> Any:
+        _check(self._table, "point", None)
+        entity = self._client.get_entity(*args, **kwargs)
+        metrics.inc("storage_rows_read_total", route=current_route(), table=self._table, kind="point")
+        return entity
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+def analyze_table_client(client: Any, table: str) -> Any:
+    return client if STORAGE_QUERY_ANALYZER == "off" else AnalyzedTableClient(client, table)
@@ -0,0 +1,17 @@
+import threading
+import time
+
+
+class RateLimiter:
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next    = 0.0
+        self._lock    = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now        = time.monotonic()
+            wait       = max(0.0, self._next - now)
+            self._next = max(now, self._next) + self.interval
+        if wait:
+            time.sleep(wait)
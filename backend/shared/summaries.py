@@ -0,0 +1,105 @@
+import os
+from typing import Any, List, Optional
+from shared.cache import LRUCache
+from shared.events import RestaurantChanged, subscribe
+from shared.geo import estimate_eta_minutes
+from shared.menu import (
+    IMAGE_CARD_BANNER_WIDTH,
+    IMAGE_CARD_LOGO_WIDTH,
+    get_banner_url,
+    get_logo_url,
+)
+from utils.response import encode_json
+
+RESTAURANT_SUMMARY_CACHE_SIZE  = int(os.environ.get("RESTAURANT_SUMMARY_CACHE_SIZE", "20000"))
+RESTAURANT_SUMMARY_TTL_SECONDS = float(os.environ.get("RESTAURANT_SUMMARY_TTL_SECONDS", "3600"))
+
+
+class RestaurantSummary:
+    __slots__ = (
+        "id",
+        "name",
+        "unique_name",
+        "city",
+        "address",
+        "postal_code",
+        "lat",
+        "lon",
+        "rating_star",
+        "rating_count",
+        "is_delivery",
+        "is_collection",
+        "cuisines",
+        "tags",
+        "version",
+        "_fragment",
+    )
+
+    def __init__(self, ent: Any):
+        self.id            = ent.get("RowKey")
+        self.name          = ent.get("name")
+        self.unique_name   = ent.get("unique_name")
+        self.city          = ent.get("city")
+        self.address       = ent.get("address_first_line")
+        self.postal_code   = ent.get("postal_code")
+        self.lat           = ent.get("lat")
+        self.lon           = ent.get("lon")
+        self.rating_star   = ent.get("rating_star")
+        self.rating_count  = ent.get("rating_count")
+        self.is_delivery   = ent.get("is_delivery")
+        self.is_collection = ent.get("is_collection")
+        self.cuisines      = ent.get("cuisines")
+        self.tags          = ent.get("tags")
+        self.version       = ent.get("updated_at")
+        self._fragment     : Optional[bytes] = None
+
+    def fragment(self) -> bytes:
+        # the serialized object without its closing brace, so per-request fields can be appended
+        if self._fragment is None:
+            body = encode_json(
+                {
+                    "id"           : self.id,
+                    "name"         : self.name,
+                    "unique_name"  : self.unique_name,
+                    "city"         : self.city,
+                    "address"      : self.address,
+                    "postal_code"  : self.postal_code,
+                    "lat"          : self.lat,
+                    "lon"          : self.lon,
+                    "rating_star"  : self.rating_star,
+                    "rating_count" : self.rating_count,
+                    "is_delivery"  : self.is_delivery,
+                    "is_collection": self.is_collection,
+                    "logo_url"     : get_logo_url(self.id, IMAGE_CARD_LOGO_WIDTH),
+                    "banner_url"   : get_banner_url(self.id, IMAGE_CARD_BANNER_WIDTH),
+                    "cuisines"     : self.cuisines,
+                    "tags"         : self.tags,
+                }
+            )
+            self._fragment = body[:-1]
+        return self._fragment
+
+    def render(self, distance_m: Optional[int] = None, eta_minutes: Optional[List[int]] = None) -> bytes:
+        distance = b"null" if distance_m is None else str(int(distance_m)).encode("ascii")
+        eta      = b"null" if eta_minutes is None else f"[{int(eta_minutes[0])},{int(eta_minutes[1])}]".encode("ascii")
+        return b"".join((self.fragment(), b',"distance_m":', distance, b',"eta_minutes":', eta, b"}"))
+
+    def render_at(self, dist: Optional[float]) -> bytes:
+        if dist is None:
+            return self.render()
+        return self.render(round(dist), list(estimate_eta_minutes(dist)))
+
+
+_summaries = LRUCache(maxsize=RESTAURANT_SUMMARY_CACHE_SIZE, ttl_seconds=RESTAURANT_SUMMARY_TTL_SECONDS)
+subscribe(RestaurantChanged, lambda event: _summaries.invalidate(event.restaurant_id))
+
+
+def summary_for(ent: Any) -> RestaurantSummary:
+    rest_id = ent.get("RowKey")
+    cached  = _summaries.get(rest_id)
+    if cached is not None and cached.version == ent.get("updated_at"):
+        return cached
+
+    summary = RestaurantSummary(ent)
+    _summaries.set(rest_id, summary)
+    return summary
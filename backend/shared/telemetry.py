@@ -0,0 +1,249 @@
+import bisect
+import contextvars
+import functools
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import azure.functions as func
+from azure.core.paging import ItemPaged
+
+try:
+    from azure.storage.blob import StorageStreamDownloader
+except ImportError:
+    StorageStreamDownloader = None
+
+TELEMETRY_ENABLED = os.environ.get("TELEMETRY_ENABLED", "1").lower() not in ("0", "false", "no")
+SERVER_TIMING     = os.environ.get("SERVER_TIMING", "1").lower() not in ("0", "false", "no")
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# phase -> [seconds, calls] for the request running in this context
+_phases: contextvars.ContextVar[Optional[Dict[str, List[float]]]] = contextvars.ContextVar("phases", default=None)
+_route : contextvars.ContextVar[str] = contextvars.ContextVar("route", default="")
+
+
+def current_route() -> str:
+    # empty outside an HTTP request, e.g. in timer triggers
+    return _route.get()
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    acc = _phases.get()
+    if acc is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        slot     = acc.setdefault(phase, [0.0, 0])
+        slot[0] += time.perf_counter() - start
+        slot[1] += 1
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts  = [0] * (len(buckets) + 1)
+        self.sum     = 0.0
+        self.count   = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum   += value
+        self.count += 1
+
+
+class Registry:
+    # per worker process; Prometheus sums across instances
+    def __init__(self):
+        self._histograms : Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self._counters   : Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._help       : Dict[str, Tuple[str, str]] = {}
+        self._lock       = threading.Lock()
+
+    def describe(self, name: str, kind: str, text: str):
+        self._help[name] = (kind, text)
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.count, h.buckets) for key, h in self._histograms.items()}
+            counters   = dict(self._counters)
+
+        lines : List[str] = []
+        seen  = set()
+
+        def header(name: str):
+            if name in seen:
+                return
+            seen.add(name)
+            kind, text = self._help.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), (counts, total, count, buckets) in sorted(histograms.items()):
+            header(name)
+            cumulative = 0
+            for bound, n in zip(buckets, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels, le=_fmt(bound))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {_fmt(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name)
+            lines.append(f"{name}{_labels(labels)} {_fmt(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _fmt(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...], **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(str(v))}"' for k, v in pairs) + "}"
+
+
+metrics = Registry()
+metrics.describe("http_request_duration_seconds", "histogram", "Handler latency by route, method and status class.")
+metrics.describe("http_request_phase_seconds", "histogram", "Time spent per phase (table, blob, upstream, serialize, compress) within one request.")
+metrics.describe("http_request_phase_calls_total", "counter", "Calls made per phase, by route.")
+
+
+def server_timing(phases: Dict[str, List[float]], total: float) -> str:
+    parts = [f'{phase};dur={seconds * 1000:.1f};desc="{int(calls)} calls"' for phase, (seconds, calls) in sorted(phases.items())]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def timed_route(route: str):
+    # wraps an HTTP handler: collects phase timings for Server-Timing and feeds the per-route histograms
+    def decorator(handler: Callable[..., func.HttpResponse]) -> Callable[..., func.HttpResponse]:
+        @functools.wraps(handler)
+        def wrapper(req: func.HttpRequest, *args, **kwargs) -> func.HttpResponse:
+            acc   : Dict[str, List[float]] = {}
+            token = _phases.set(acc)
+            named = _route.set(route)
+            start = time.perf_counter()
+            resp  = None
+            try:
+                resp = handler(req, *args, **kwargs)
+                return resp
+            finally:
+                total = time.perf_counter() - start
+                _phases.reset(token)
+                _route.reset(named)
+                status = f"{resp.status_code // 100}xx" if resp is not None else "5xx"
+                metrics.observe("http_request_duration_seconds", total, route=route, method=req.method, status=status)
+                for phase, (seconds, calls) in acc.items():
+                    metrics.observe("http_request_phase_seconds", seconds, route=route, phase=phase)
+                    metrics.inc("http_request_phase_calls_total", calls, route=route, phase=phase)
+                if resp is not None and SERVER_TIMING:
+                    resp.headers["Server-Timing"] = server_timing(acc, total)
+        return wrapper
+    return decorator
+
+
+class TimedFunctionApp(func.FunctionApp):
+    # every @app.route handler is timed without touching the route modules
+    def route(self, route: Optional[str] = None, *args, **kwargs):
+        register = super().route(route, *args, **kwargs)
+        if not TELEMETRY_ENABLED:
+            return register
+
+        def decorator(handler):
+            return register(timed_route(route or handler.__name__)(handler))
+        return decorator
+
+
+class _TimedPaged:
+    # ItemPaged fetches lazily, so the time is spent while iterating, not when the query is created
+    def __init__(self, paged: Any, phase: str):
+        self._paged = paged
+        self._phase = phase
+
+    def __iter__(self):
+        # one timed call per page fetch rather than per item
+        return itertools.chain.from_iterable(self.by_page())
+
+    def by_page(self, *args, **kwargs):
+        return _TimedPager(self._paged.by_page(*args, **kwargs), self._phase)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._paged, name)
+
+
+class _TimedIterator:
+    def __init__(self, it: Iterator[Any], phase: str):
+        self._it    = it
+        self._phase = phase
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Any:
+        with timed(self._phase):
+            return next(self._it)
+
+
+class _TimedPager(_TimedIterator):
+    # keeps continuation_token and friends reachable on the wrapped page iterator
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._it, name)
+
+
+_CLIENT_FACTORIES = ("get_table_client", "get_blob_client", "get_container_client")
+
+
+class TimedClient:
+    # proxies an Azure SDK client and times every call made through it
+    def __init__(self, client: Any, phase: str):
+        self._client = client
+        self._phase  = phase
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+        if name in _CLIENT_FACTORIES:
+            return lambda *args, **kwargs: TimedClient(attr(*args, **kwargs), self._phase)
+
+        def call(*args, **kwargs):
+            with timed(self._phase):
+                result = attr(*args, **kwargs)
+            if isinstance(result, ItemPaged):
+                return _TimedPaged(result, self._phase)
+            if StorageStreamDownloader is not None and isinstance(result, StorageStreamDownloader):
+                return TimedClient(result, self._phase)
+            return result
+        return call
+
+
+def instrument_client(client: Any, phase: str) -> Any:
+    return TimedClient(client, phase) if TELEMETRY_ENABLED else client
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# the function app imports its packages from the backend root, e.g. `from shared.database import ...`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("CACHE_EVENTS_TRANSPORT", "local")
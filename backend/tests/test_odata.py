@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from shared.odata import classify_filter, evaluate_filter, parse_filter, pinned_partition
+
+
+@pytest.mark.parametrize("text, kind", [
+    ("PartitionKey eq 'a' and RowKey eq 'b'", "point"),
+    ("PartitionKey eq 'a' and price gt 3", "partition"),
+    ("(PartitionKey eq 'a' or PartitionKey eq 'b') and x eq 1", "partition"),
+    ("PartitionKey ge 'a' and PartitionKey lt 'b'", "range"),
+    ("RowKey eq 'b'", "scan"),
+    ("not (PartitionKey eq 'a')", "scan"),
+    (None, "scan"),
+])
+def test_classify_filter(text, kind):
+    assert classify_filter(parse_filter(text)) == kind
+
+
+def test_pinned_partition():
+    assert pinned_partition(parse_filter("PartitionKey eq 'o''neil' and n gt 1")) == "o'neil"
+    assert pinned_partition(parse_filter("PartitionKey eq 'a' or PartitionKey eq 'b'")) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("n eq 3", True),
+    ("n eq 3.0", True),
+    ("n gt 3L", False),
+    ("name eq 'o''neil'", True),
+    ("name eq 3", False),
+    ("missing eq 'x'", False),
+    ("not (missing eq 'x')", True),
+    ("flag eq true and (n lt 2 or name ne 'x')", True),
+    ("at ge datetime'2026-01-01T00:00:00Z'", True),
+])
+def test_evaluate_filter(text, expected):
+    entity = {"n": 3, "name": "o'neil", "flag": True, "at": datetime(2026, 2, 1, tzinfo=timezone.utc)}
+    assert evaluate_filter(parse_filter(text), entity) is expected
+
+
+@pytest.mark.parametrize("text", ["n eq", "n like 'x'", "n eq 'unterminated", "n eq 1 )"])
+def test_parse_filter_rejects_unsupported_syntax(text):
+    with pytest.raises(ValueError):
+        parse_filter(text)
@@ -0,0 +1,38 @@
+import pytest
+
+import shared.order_lines as order_lines
+from shared.order_lines import OrderLine, decode_order_lines, encode_order_lines, pack_order_lines, unpack_order_lines
+
+LINES = [
+    OrderLine("m-001", 2, 1250, "Ramen"),
+    OrderLine("m-002", 1, 0, None),
+    OrderLine("m-ñ", 65535, 4294967295, "Crème brûlée 🍮"),
+]
+
+
+def _fields(lines):
+    return [(line.item_id, line.quantity, line.price_cents, line.name) for line in lines]
+
+
+def test_packed_round_trip():
+    assert _fields(unpack_order_lines(pack_order_lines(LINES))) == _fields(LINES)
+    assert unpack_order_lines(pack_order_lines([])) == []
+
+
+def test_packed_rejects_unknown_version():
+    buf = bytearray(pack_order_lines(LINES))
+    buf[0] = 99
+    with pytest.raises(ValueError):
+        unpack_order_lines(bytes(buf))
+
+
+@pytest.mark.parametrize("fmt, prop", [("json", "lines_json"), ("packed", "lines_packed")])
+def test_encode_decode_round_trip(monkeypatch, fmt, prop):
+    monkeypatch.setattr(order_lines, "ORDER_LINES_FORMAT", fmt)
+    ent = encode_order_lines(LINES, "v1")
+    assert prop in ent and ent["menu_version"] == "v1"
+    assert _fields(decode_order_lines(ent)) == _fields(LINES)
+
+
+def test_decode_without_lines_returns_none():
+    assert decode_order_lines({"items_json": "[]"}) is None
@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from utils.response import etag_matches, http_date, if_range_matches, parse_byte_range
+
+LAST_MODIFIED = datetime(2026, 3, 1, 12, 30, 45, 123456, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=999-999", (999, 999)),
+])
+def test_parse_byte_range(header, expected):
+    assert parse_byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [None, "", "bytes=-", "bytes=0-9,20-29", "items=0-9", "bytes=a-b"])
+def test_parse_byte_range_ignores_what_it_does_not_serve(header):
+    assert parse_byte_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1000-1100", "bytes=50-10", "bytes=-0"])
+def test_parse_byte_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_byte_range(header, 1000)
+
+
+def test_if_range_without_header_always_serves_the_range():
+    assert if_range_matches(None, '"abc"', LAST_MODIFIED)
+
+
+@pytest.mark.parametrize("header, etag, expected", [
+    ('"abc"', '"abc"', True),
+    ('"abc"', '"abd"', False),
+    ('W/"abc"', '"abc"', False),
+    ('"abc"', 'W/"abc"', False),
+    ('"abc"', None, False),
+    ("*", '"abc"', False),
+])
+def test_if_range_etag_uses_strong_comparison(header, etag, expected):
+    assert if_range_matches(header, etag, LAST_MODIFIED) is expected
+
+
+def test_if_range_date_must_equal_last_modified():
+    assert if_range_matches(http_date(LAST_MODIFIED), '"abc"', LAST_MODIFIED)
+    assert if_range_matches(http_date(LAST_MODIFIED.replace(tzinfo=None)), '"abc"', LAST_MODIFIED.replace(tzinfo=None))
+    assert not if_range_matches(http_date(LAST_MODIFIED.replace(second=44)), '"abc"', LAST_MODIFIED)
+    assert not if_range_matches(http_date(LAST_MODIFIED), '"abc"', None)
+    assert not if_range_matches("not a date", '"abc"', LAST_MODIFIED)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", W/"abc"', True),
+    ("*", True),
+    ('"abd"', False),
+    ("", False),
+])
+def test_etag_matches_uses_weak_comparison(header, expected):
+    assert etag_matches(header, 'W/"abc"') is expected
@@ -1,24 +1,179 @@
+import functools
+import gzip
+import hashlib
 import json
+import os
+import re
 import azure.functions as func
-from typing import Any, Optional
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from pydantic import BaseModel
+from shared.cache import LRUCache
+from shared.telemetry import timed
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def json_response(data: Any, status_code: int = 200) -> func.HttpResponse:
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_ENCODER = os.environ.get("JSON_ENCODER", "auto").lower()
+
+COMPRESSION_MIN_BYTES      = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL     = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "5"))
+COMPRESSION_CACHE_ENTRIES  = int(os.environ.get("COMPRESSION_CACHE_ENTRIES", "512"))
+
+NDJSON_MAX_BYTES = int(float(os.environ.get("NDJSON_MAX_MB", "16")) * 1024 * 1024)
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+_JSON_HEADERS = {
+    "Content-Type": "application/json",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, PUT, PATCH, DELETE, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization, If-Match, If-None-Match",
+    "Access-Control-Expose-Headers": "ETag",
+}
+
+_COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+class JSONFragment:
+    # already-serialized JSON, embedded verbatim by encode_json
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def _stdlib_default(obj: Any) -> Any:
+    if isinstance(obj, JSONFragment):
+        return json.loads(obj.data)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    return str(obj)
+
+
+def _encode_stdlib(data: Any) -> bytes:
+    return json.dumps(data, default=_stdlib_default, separators=(",", ":")).encode("utf-8")
+
+
+ENCODERS: Dict[str, Callable[[Any], bytes]] = {"stdlib": _encode_stdlib}
+
+if orjson is not None:
+    # datetimes go through the default hook so output matches the stdlib encoder's str() form
+    _ORJSON_OPTIONS  = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    _ORJSON_FRAGMENT = getattr(orjson, "Fragment", None)
+
+    def _orjson_default(obj: Any) -> Any:
+        if isinstance(obj, JSONFragment):
+            return _ORJSON_FRAGMENT(obj.data) if _ORJSON_FRAGMENT else json.loads(obj.data)
+        if isinstance(obj, BaseModel):
+            return _ORJSON_FRAGMENT(obj.model_dump_json()) if _ORJSON_FRAGMENT else obj.model_dump(mode="json")
+        return str(obj)
+
+    def _encode_orjson(data: Any) -> bytes:
+        try:
+            return orjson.dumps(data, default=_orjson_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # orjson rejects some values the stdlib accepts, e.g. integers wider than 64 bits
+            return _encode_stdlib(data)
+
+    ENCODERS["orjson"] = _encode_orjson
+
+
+def _select_encoder(name: str) -> Callable[[Any], bytes]:
+    if name == "auto":
+        return ENCODERS.get("orjson", _encode_stdlib)
+    if name not in ENCODERS:
+        raise ValueError(f"JSON encoder '{name}' is not available")
+    return ENCODERS[name]
+
+
+_encode = _select_encoder(JSON_ENCODER)
+
+
+def encode_json(data: Any) -> bytes:
+    if isinstance(data, JSONFragment):
+        return data.data
+    with timed("serialize"):
+        if isinstance(data, BaseModel):
+            return data.model_dump_json().encode("utf-8")
+        return _encode(data)
+
+
+def _json_headers(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    return {**_JSON_HEADERS, **headers} if headers else _JSON_HEADERS
+
+
+def json_response(data: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> func.HttpResponse:
     return func.HttpResponse(
-        body=json.dumps(data, default=str),
+        body=encode_json(data),
         status_code=status_code,
         mimetype="application/json",
-        headers={
-            "Content-Type": "application/json",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type, Authorization"
-        }
+        headers=_json_headers(headers),
     )
 
 
-def success_response(data: Any, status_code: int = 200) -> func.HttpResponse:
-    return json_response({"success": True, "data": data}, status_code)
+def _envelope_tail(meta: Optional[Dict[str, Any]]) -> bytes:
+    # top-level envelope fields next to `data`, e.g. next_cursor
+    if not meta:
+        return b"}"
+    return b"," + encode_json(meta)[1:]
+
+
+def success_response(
+    data: Any,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+    meta: Optional[Dict[str, Any]] = None,
+) -> func.HttpResponse:
+    return json_response(JSONFragment(b'{"success":true,"data":' + encode_json(data) + _envelope_tail(meta)), status_code, headers)
+
+
+def success_fragments_response(
+    items: Iterable[bytes],
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+    meta: Optional[Dict[str, Any]] = None,
+) -> func.HttpResponse:
+    # items are already-serialized JSON values; the envelope is assembled around them without re-encoding
+    return json_response(JSONFragment(b'{"success":true,"data":[' + b",".join(items) + b"]" + _envelope_tail(meta)), status_code, headers)
+
+
+def wants_ndjson(req: func.HttpRequest) -> bool:
+    return (req.params.get("format") or "").strip().lower() == "ndjson"
+
+
+def ndjson_response(
+    records: Iterable[Any],
+    next_cursor: Callable[[], Optional[str]],
+    max_bytes: int = NDJSON_MAX_BYTES,
+) -> func.HttpResponse:
+    # the Functions host buffers whole bodies, so records are pulled lazily and the response stops at
+    # max_bytes or when `records` gives up early (a scan cap); X-Next-Cursor (called after the last record
+    # consumed) says where the next request resumes and is absent once the source is exhausted
+    headers = {
+        **_JSON_HEADERS,
+        "Content-Type"                 : "application/x-ndjson",
+        "Access-Control-Expose-Headers": "ETag, X-Next-Cursor",
+    }
+    body = bytearray()
+    for record in records:
+        body += encode_json(record)
+        body += b"\n"
+        if len(body) >= max_bytes:
+            break
+    cursor = next_cursor()
+    if cursor:
+        headers["X-Next-Cursor"] = cursor
+    return func.HttpResponse(body=bytes(body), status_code=200, mimetype="application/x-ndjson", headers=headers)
 
 
 def error_response(message: str, status_code: int = 400, details: Optional[Any] = None) -> func.HttpResponse:
@@ -27,3 +182,210 @@ def error_response(message: str, status_code: int = 400, details: Optional[Any]
         response_data["details"] = details
     return json_response(response_data, status_code)
 
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def etag_matches(header: Optional[str], etag: Optional[str]) -> bool:
+    if not header or not etag:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    # "-0000" and obsolete formats parse as naive datetimes; HTTP dates are always GMT
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def is_not_modified(req: func.HttpRequest, etag: Optional[str], last_modified: Optional[datetime] = None) -> bool:
+    if_none_match = req.headers.get("If-None-Match")
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = req.headers.get("If-Modified-Since")
+    if if_modified_since and last_modified:
+        since = _parse_http_date(if_modified_since)
+        if since is None:
+            return False
+        return _as_utc(last_modified).replace(microsecond=0) <= since
+    return False
+
+
+def if_range_matches(header: Optional[str], etag: Optional[str], last_modified: Optional[datetime] = None) -> bool:
+    # If-Range uses strong comparison: a weak validator, a list or "*" never matches, a date must equal Last-Modified
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith('"'):
+        return bool(etag) and not etag.startswith("W/") and header == etag
+    if header.startswith("W/") or not last_modified:
+        return False
+    since = _parse_http_date(header)
+    return since is not None and _as_utc(last_modified).replace(microsecond=0) == since
+
+
+def etag_for(version: str) -> str:
+    if version.startswith(('W/"', '"')):
+        return version
+    return '"' + version.replace('"', "") + '"'
+
+
+def version_digest(*parts: Any) -> str:
+    digest = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+def conditional_response(
+    req: func.HttpRequest,
+    version: Optional[str],
+    build: Callable[[], func.HttpResponse],
+    cache_control: str = "private, no-cache",
+) -> func.HttpResponse:
+    # `version` must change whenever the body would; the body is only built when the client's copy is stale
+    if not version:
+        return build()
+
+    etag    = etag_for(version)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if req.method in ("GET", "HEAD") and etag_matches(req.headers.get("If-None-Match"), etag):
+        return func.HttpResponse(status_code=304, headers={**_JSON_HEADERS, **headers})
+
+    resp = build()
+    if 200 <= resp.status_code < 300:
+        for key, val in headers.items():
+            resp.headers[key] = val
+    return resp
+
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    # single ranges only; anything else is answered with the full body, which RFC 9110 allows
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end   = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def _compress_gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _compress_brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+
+
+COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {"gzip": _compress_gzip}
+if brotli is not None:
+    COMPRESSORS["br"] = _compress_brotli
+
+# server preference when the client ranks encodings equally
+_ENCODING_PREFERENCE = ("br", "gzip")
+
+# compressed bodies of immutable payloads, keyed by encoding and content digest
+_compressed_cache = LRUCache(maxsize=COMPRESSION_CACHE_ENTRIES, ttl_seconds=3600)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in _ENCODING_PREFERENCE:
+        if encoding not in COMPRESSORS:
+            continue
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress_response(req: func.HttpRequest, resp: func.HttpResponse, cache: bool = False) -> func.HttpResponse:
+    body = resp.get_body()
+    if (
+        resp.status_code not in (200, 201, 206)
+        or "Content-Encoding" in resp.headers
+        or not (resp.mimetype or "").startswith(_COMPRESSIBLE_TYPES)
+        or not body
+    ):
+        return resp
+
+    headers = dict(resp.headers)
+    headers["Vary"] = "Accept-Encoding"
+    encoding = negotiate_encoding(req.headers.get("Accept-Encoding"))
+    if encoding is None or len(body) < COMPRESSION_MIN_BYTES:
+        return func.HttpResponse(body, status_code=resp.status_code, headers=headers, mimetype=resp.mimetype, charset=resp.charset)
+
+    with timed("compress"):
+        if cache:
+            key        = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+            compressed = _compressed_cache.get_or_load(key, lambda: COMPRESSORS[encoding](body))
+        else:
+            compressed = COMPRESSORS[encoding](body)
+
+    headers["Content-Encoding"] = encoding
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        # the encoded bytes differ from the identity representation, so the validator can only be weak
+        headers["ETag"] = f"W/{etag}"
+    return func.HttpResponse(compressed, status_code=resp.status_code, headers=headers, mimetype=resp.mimetype, charset=resp.charset)
+
+
+def compressible(cache: bool = False):
+    # wraps an HTTP handler; set cache=True for payloads that repeat verbatim (versioned menus, catalog pages)
+    def decorator(handler: Callable[..., func.HttpResponse]) -> Callable[..., func.HttpResponse]:
+        @functools.wraps(handler)
+        def wrapper(req: func.HttpRequest, *args, **kwargs) -> func.HttpResponse:
+            return compress_response(req, handler(req, *args, **kwargs), cache=cache)
+        return wrapper
+    return decorator